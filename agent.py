@@ -1,12 +1,15 @@
+import logging
 import math
 import pygame
-from constants import (
-    LEFT_BOUNDARY,
-    RIGHT_BOUNDARY,
-    TOP_BOUNDARY,
-    BOTTOM_BOUNDARY,
-    RED,
-)
+from collision import earliest, sweep_circle_bounds, sweep_circle_circle, sweep_circle_rect
+from constants import DEFAULT_WORLD_BOUNDS, RED
+from profiler import PROFILER
+from sim_logging import event, get_logger
+
+log = get_logger("agent")
+
+# Distance kept from an obstacle after moving up to it, so the next move does not start overlapping it
+CONTACT_SKIN = 1e-6
 
 
 class Agent:
@@ -25,6 +28,8 @@ class Agent:
         walls: list,
         num_lidar_beams: int = 360,
         body_radius=20,
+        bounds: tuple = DEFAULT_WORLD_BOUNDS,
+        collision_response: str = "stop",
     ) -> None:
         """
         Initialize the Agent.
@@ -35,6 +40,10 @@ class Agent:
             direction (float): Initial direction of the agent in degrees.
             walls (list): List of Wall objects in the environment.
             num_lidar_beams (int, optional): Number of LiDAR beams. Defaults to 360.
+            bounds (tuple, optional): (left, top, right, bottom) of the world. Defaults to DEFAULT_WORLD_BOUNDS.
+            collision_response (str, optional): What try_move does when the move hits something:
+                "stop" stays in place, "contact" moves up to the obstacle and "slide" also
+                slides along it. Defaults to "stop".
         """
         self.x = x
         self.y = y
@@ -50,53 +59,86 @@ class Agent:
         self.lidar_visible = False
         self.bump_sensor = False
         self.walls = walls
+        self.bounds = bounds
+        self.agent_index = None  # AgentIndex of the agents sharing the world, set by Simulation
+        self.collision_response = collision_response
 
-    def draw(self, screen: pygame.Surface) -> None:
+    def draw(self, screen: pygame.Surface, camera=None) -> pygame.Rect:
         """
         Draw the agent on the screen.
 
         Args:
             screen (pygame.Surface): The surface to draw on.
+            camera (Camera, optional): View used to map world to screen coordinates.
+
+        Returns:
+            pygame.Rect: The area of the screen that was drawn on.
         """
         # Calculate the end point of the arrow
         end_x = self.x + self.body_radius * math.cos(math.radians(self.direction))
         end_y = self.y - self.body_radius * math.sin(math.radians(self.direction))
 
         # Draw the LiDAR beams if visible
+        drawn = None
         if self.lidar_visible:
-            self.draw_lidar(screen)
+            drawn = self.draw_lidar(screen, camera)
+
+        center = (self.x, self.y)
+        radius = self.body_radius
+        if camera:
+            center = camera.world_to_screen(self.x, self.y)
+            end_x, end_y = camera.world_to_screen(end_x, end_y)
+            radius = max(1, camera.scale(radius))
 
         # Draw the circle
-        pygame.draw.circle(screen, (0, 0, 255), (self.x, self.y), self.body_radius)
+        body = pygame.draw.circle(screen, (0, 0, 255), center, radius)
 
         # Draw the arrow
-        pygame.draw.line(screen, (255, 0, 0), (self.x, self.y), (end_x, end_y), 2)
+        body.union_ip(pygame.draw.line(screen, (255, 0, 0), center, (end_x, end_y), 2))
+
+        return body.union(drawn) if drawn else body
 
-    def draw_lidar(self, screen: pygame.Surface) -> None:
+    def draw_lidar(self, screen: pygame.Surface, camera=None) -> pygame.Rect | None:
         """
         Draw the LiDAR beams on the screen.
 
         Args:
             screen (pygame.Surface): The surface to draw on.
+            camera (Camera, optional): View used to map world to screen coordinates.
+
+        Returns:
+            pygame.Rect | None: The area of the screen that was drawn on, or None if there are no ranges.
         """
+        start = camera.world_to_screen(self.x, self.y) if camera else (self.x, self.y)
+        drawn = []
         for angle, distance in zip(self.lidar_angles, self.lidar_ranges):
             laser_angle = math.radians(self.direction + angle)
             end_x = self.x + distance * math.cos(laser_angle)
             end_y = self.y - distance * math.sin(laser_angle)
-            pygame.draw.line(screen, (0, 255, 0), (self.x, self.y), (end_x, end_y), 1)
+            if camera:
+                end_x, end_y = camera.world_to_screen(end_x, end_y)
+            drawn.append(
+                pygame.draw.line(screen, (0, 255, 0), start, (end_x, end_y), 1)
+            )
             # Debug visualization
-            pygame.draw.circle(
-                screen, RED, (int(end_x), int(end_y)), 3
+            drawn.append(
+                pygame.draw.circle(screen, RED, (int(end_x), int(end_y)), 3)
             )  # Draw the laser endpoint
+        return drawn[0].unionall(drawn) if drawn else None
 
     def scan(self) -> None:
         """
         Perform a LiDAR scan of the environment.
 
-        Updates the lidar_ranges list with the distances to the nearest obstacles.
+        Updates the lidar_ranges list with the distances to the nearest obstacles,
+        including the bodies of other agents sharing the world.
         """
-        self.lidar_ranges = []
         agent_x, agent_y = int(self.x), int(self.y)
+        beams = []  # (end_x, end_y, range) of each beam against the walls and boundaries
+
+        if PROFILER.enabled:
+            PROFILER.count("scan.rays", len(self.lidar_angles))
+            PROFILER.count("scan.edge_tests", len(self.lidar_angles) * len(self.walls) * 4)
 
         for angle in self.lidar_angles:
             laser_angle = math.radians(self.direction + angle)
@@ -124,8 +166,93 @@ class Agent:
             if boundary_collision[2] < min_distance:
                 min_distance = boundary_collision[2]
 
-            # Append the closest distance to the lidar_ranges
-            self.lidar_ranges.append(min_distance)
+            beams.append((end_x, end_y, min_distance))
+
+        # Other agents can only shorten beams, so they are looked for where the
+        # beams end on walls rather than within the whole LiDAR range
+        others = self.agents_in_range(agent_x, agent_y, beams)
+        if others:
+            self.lidar_ranges = [
+                self.beam_hits_agents(agent_x, agent_y, end_x, end_y, others, min_distance)
+                for end_x, end_y, min_distance in beams
+            ]
+        else:
+            self.lidar_ranges = [min_distance for _, _, min_distance in beams]
+
+    def agents_in_range(self, agent_x: int, agent_y: int, beams: list) -> list:
+        """
+        Find the other agents a scan from (agent_x, agent_y) can see.
+
+        Only the box around the scan's origin and the points where its beams
+        end on walls is searched, so the cost depends on the open space around
+        the agent and the agents in it, not on the LiDAR range or the number of agents.
+
+        Args:
+            agent_x (int): X-coordinate of the scan.
+            agent_y (int): Y-coordinate of the scan.
+            beams (list): (end_x, end_y, range) of each beam against the walls and boundaries.
+
+        Returns:
+            list: (distance to centre, x, y, radius) of each agent, nearest first.
+        """
+        if self.agent_index is None:
+            return []
+        left = right = agent_x
+        top = bottom = agent_y
+        reach = 0.0
+        for end_x, end_y, distance in beams:
+            length = math.hypot(end_x - agent_x, end_y - agent_y)
+            if length == 0:
+                continue
+            x = agent_x + (end_x - agent_x) * distance / length
+            y = agent_y + (end_y - agent_y) * distance / length
+            left, right = min(left, x), max(right, x)
+            top, bottom = min(top, y), max(bottom, y)
+            reach = max(reach, distance)
+        others = []
+        # Widened by a unit against rounding in the beam end points
+        for other in self.agent_index.near(self, left - 1, top - 1, right + 1, bottom + 1):
+            distance = math.hypot(other.x - agent_x, other.y - agent_y)
+            if distance - other.body_radius < reach:
+                others.append((distance, other.x, other.y, other.body_radius))
+        others.sort()
+        return others
+
+    def beam_hits_agents(
+        self, start_x: float, start_y: float, end_x: float, end_y: float, others: list, min_distance: float
+    ) -> float:
+        """
+        Shorten a LiDAR beam to the nearest agent body it hits.
+
+        Args:
+            start_x (float): Starting x-coordinate of the LiDAR beam.
+            start_y (float): Starting y-coordinate of the LiDAR beam.
+            end_x (float): Ending x-coordinate of the LiDAR beam.
+            end_y (float): Ending y-coordinate of the LiDAR beam.
+            others (list): Agents from agents_in_range(), nearest first.
+            min_distance (float): Range of the beam so far.
+
+        Returns:
+            float: The new range of the beam.
+        """
+        dx = end_x - start_x
+        dy = end_y - start_y
+        length = math.hypot(dx, dy)
+        if length == 0:
+            return min_distance
+        ux, uy = dx / length, dy / length
+        for distance, x, y, radius in others:
+            if distance - radius >= min(min_distance, length):
+                break  # Sorted by distance, so no later agent can be closer
+            # Distance along the beam to the point closest to the centre, then back to the surface
+            along = (x - start_x) * ux + (y - start_y) * uy
+            offset = distance * distance - along * along
+            if along < 0 or offset > radius * radius:
+                continue
+            hit = along - math.sqrt(radius * radius - offset)
+            if 0 <= hit < min_distance:
+                min_distance = hit
+        return min_distance
 
     def check_lidar_collision_with_boundaries(
         self, start_x: float, start_y: float, end_x: float, end_y: float
@@ -145,33 +272,34 @@ class Agent:
         """
         dx = end_x - start_x
         dy = end_y - start_y
+        left, top, right, bottom = self.bounds
 
         # Check collision with all four boundaries
         collisions = []
 
         # Top boundary
         if dy < 0:
-            t = (TOP_BOUNDARY - start_y) / dy if dy != 0 else float("inf")
+            t = (top - start_y) / dy if dy != 0 else float("inf")
             if 0 <= t <= 1:
-                collisions.append((start_x + t * dx, TOP_BOUNDARY, t))
+                collisions.append((start_x + t * dx, top, t))
 
         # Bottom boundary
         if dy > 0:
-            t = (BOTTOM_BOUNDARY - start_y) / dy if dy != 0 else float("inf")
+            t = (bottom - start_y) / dy if dy != 0 else float("inf")
             if 0 <= t <= 1:
-                collisions.append((start_x + t * dx, BOTTOM_BOUNDARY, t))
+                collisions.append((start_x + t * dx, bottom, t))
 
         # Left boundary
         if dx < 0:
-            t = (LEFT_BOUNDARY - start_x) / dx if dx != 0 else float("inf")
+            t = (left - start_x) / dx if dx != 0 else float("inf")
             if 0 <= t <= 1:
-                collisions.append((LEFT_BOUNDARY, start_y + t * dy, t))
+                collisions.append((left, start_y + t * dy, t))
 
         # Right boundary
         if dx > 0:
-            t = (RIGHT_BOUNDARY - start_x) / dx if dx != 0 else float("inf")
+            t = (right - start_x) / dx if dx != 0 else float("inf")
             if 0 <= t <= 1:
-                collisions.append((RIGHT_BOUNDARY, start_y + t * dy, t))
+                collisions.append((right, start_y + t * dy, t))
 
         if collisions:
             # Sort collisions by distance (represented by t)
@@ -191,7 +319,8 @@ class Agent:
         distance = math.sqrt(direction_x ** 2 + direction_y ** 2)
 
         if distance == 0:
-            print("Agent already at the target position.")
+            if log.isEnabledFor(logging.DEBUG):
+                event(log, logging.DEBUG, "already at target", pose=(self.x, self.y))
             return
 
         # Normalize the direction vector
@@ -200,25 +329,28 @@ class Agent:
 
         # Adaptive speed: slower when close to the target
         speed = min(self.linear_speed, distance)
-        print(f"Moving with speed {speed} towards ({target_x}, {target_y}). Current position: ({self.x}, {self.y})")
 
         # Predict next position
         next_x = self.x + direction_x * speed
         next_y = self.y + direction_y * speed
 
-        # Check for collisions before moving
-        if not self.will_collide(next_x, next_y):
-            print(f"Agent moving from ({self.x}, {self.y}) to ({next_x}, {next_y}).")
+        # Check for collisions along the way before moving
+        if self.sweep(next_x - self.x, next_y - self.y) is None:
+            if log.isEnabledFor(logging.DEBUG):
+                event(log, logging.DEBUG, "moving", pose=(self.x, self.y), next=(next_x, next_y),
+                      target=(target_x, target_y), speed=speed)
             self.x = next_x
             self.y = next_y
-        else:
-            print(f"Movement blocked by obstacle at ({next_x}, {next_y}). Current position remains: ({self.x}, {self.y}).")
+        elif log.isEnabledFor(logging.DEBUG):
+            event(log, logging.DEBUG, "movement blocked", pose=(self.x, self.y), next=(next_x, next_y),
+                  reason="collision")
 
 
     def will_collide(self, next_x, next_y):
         # Check boundary collision
-        if (not (LEFT_BOUNDARY + self.body_radius <= next_x <= RIGHT_BOUNDARY - self.body_radius) or
-            not (TOP_BOUNDARY + self.body_radius <= next_y <= BOTTOM_BOUNDARY - self.body_radius)):
+        left, top, right, bottom = self.bounds
+        if (not (left + self.body_radius <= next_x <= right - self.body_radius) or
+            not (top + self.body_radius <= next_y <= bottom - self.body_radius)):
             return True
 
         # Check wall collisions
@@ -226,11 +358,11 @@ class Agent:
             if wall.is_colliding(next_x, next_y, self.body_radius):
                 return True
 
-        return False
+        return self.agent_index is not None and self.collides_with_agents(next_x, next_y)
 
     def detect_collision(self, move_forward: bool = True) -> bool:
         """
-        Detect if the agent will collide with walls or boundaries in its next move.
+        Detect if the agent will collide with walls, boundaries or other agents anywhere along its next move.
 
         Args:
             move_forward (bool): True if moving forward, False if moving backward.
@@ -238,50 +370,118 @@ class Agent:
         Returns:
             bool: True if a collision is detected, False otherwise.
         """
-        # Calculate the next position
-        if move_forward:
-            next_x = self.x + self.linear_speed * math.cos(math.radians(self.direction))
-            next_y = self.y - self.linear_speed * math.sin(math.radians(self.direction))
-        else:
-            next_x = self.x - self.linear_speed * math.cos(math.radians(self.direction))
-            next_y = self.y + self.linear_speed * math.sin(math.radians(self.direction))
-
-        # Check if the next position is within the boundaries considering the radius of the agent
-        if not (
-            LEFT_BOUNDARY + self.body_radius
-            <= next_x
-            <= RIGHT_BOUNDARY - self.body_radius
-            and TOP_BOUNDARY + self.body_radius
-            <= next_y
-            <= BOTTOM_BOUNDARY - self.body_radius
-        ):
-            return True
+        return self.sweep(*self.move_delta(move_forward)) is not None
+
+    def move_delta(self, move_forward: bool = True, distance: float | None = None) -> tuple[float, float]:
+        """Displacement of one step forward or backward along the heading, linear_speed long unless given."""
+        if distance is None:
+            distance = self.linear_speed
+        dx = distance * math.cos(math.radians(self.direction))
+        dy = -distance * math.sin(math.radians(self.direction))
+        return (dx, dy) if move_forward else (-dx, -dy)
+
+    def sweep(self, dx: float, dy: float):
+        """
+        Sweep the body along a move and find the first obstacle it touches.
 
-        # Check for collision with walls
+        Unlike checking only the end position, this cannot step through thin
+        walls or past corners however large the move is.
+
+        Args:
+            dx (float): Change in x.
+            dy (float): Change in y.
+
+        Returns:
+            tuple | None: (time, normal_x, normal_y) of the first contact, where time is
+                the fraction of the move completed, or None if the move is free.
+        """
+        x, y, radius = self.x, self.y, self.body_radius
+        contact = sweep_circle_bounds(x, y, dx, dy, radius, self.bounds)
+
+        # Only obstacles overlapping the box swept by the body can be hit
+        low_x, high_x = min(x, x + dx) - radius, max(x, x + dx) + radius
+        low_y, high_y = min(y, y + dy) - radius, max(y, y + dy) + radius
         for wall in self.walls:
-            if wall.is_colliding(next_x, next_y, self.body_radius):
-                return True
+            rect = wall.rect
+            if rect.right < low_x or rect.left > high_x or rect.bottom < low_y or rect.top > high_y:
+                continue
+            contact = earliest(
+                contact,
+                sweep_circle_rect(x, y, dx, dy, radius, rect.left, rect.top, rect.right, rect.bottom),
+            )
+
+        if self.agent_index is not None:
+            for other in self.agent_index.near(self, low_x, low_y, high_x, high_y):
+                contact = earliest(
+                    contact, sweep_circle_circle(x, y, dx, dy, radius, other.x, other.y, other.body_radius)
+                )
+        return contact
+
+    def collides_with_agents(self, next_x: float, next_y: float) -> bool:
+        """
+        Check if moving to a position would push into another agent's body.
+
+        Agents that already overlap, e.g. after being placed on top of each
+        other, may still move apart.
+
+        Args:
+            next_x (float): X-coordinate to move to.
+            next_y (float): Y-coordinate to move to.
 
+        Returns:
+            bool: True if the move is blocked by another agent.
+        """
+        radius = self.body_radius
+        for other in self.agent_index.near(
+            self, next_x - radius, next_y - radius, next_x + radius, next_y + radius
+        ):
+            reach = (radius + other.body_radius) ** 2
+            next_distance = (other.x - next_x) ** 2 + (other.y - next_y) ** 2
+            if next_distance < reach and next_distance < (other.x - self.x) ** 2 + (other.y - self.y) ** 2:
+                return True
         return False
 
-    def try_move(self, move_forward: bool = True) -> None:
+    def try_move(self, move_forward: bool = True, distance: float | None = None) -> None:
         """
         Attempt to move the agent. Sets bump sensor if collision is detected.
 
+        What happens on a collision depends on collision_response.
+
         Args:
             move_forward (bool): True if moving forward, False if moving backward.
+            distance (float, optional): Length of the move. Defaults to linear_speed.
         """
-        if self.detect_collision(move_forward):
-            self.bump_sensor = True
+        dx, dy = self.move_delta(move_forward, distance)
+        contact = self.sweep(dx, dy)
+        if contact is None:
+            self.x += dx
+            self.y += dy
+            self.bump_sensor = False
             return
 
-        if move_forward:
-            self.x += self.linear_speed * math.cos(math.radians(self.direction))
-            self.y -= self.linear_speed * math.sin(math.radians(self.direction))
-        else:
-            self.x -= self.linear_speed * math.cos(math.radians(self.direction))
-            self.y += self.linear_speed * math.sin(math.radians(self.direction))
-        self.bump_sensor = False
+        self.bump_sensor = True
+        if self.collision_response == "stop":
+            return
+        time, normal_x, normal_y = contact
+        self.advance(dx, dy, time)
+
+        if self.collision_response == "slide":
+            # Carry on with what is left of the move, minus the part into the obstacle
+            dx *= 1 - time
+            dy *= 1 - time
+            into = dx * normal_x + dy * normal_y
+            dx -= into * normal_x
+            dy -= into * normal_y
+            if abs(dx) + abs(dy) > CONTACT_SKIN:
+                contact = self.sweep(dx, dy)
+                self.advance(dx, dy, 1.0 if contact is None else contact[0])
+
+    def advance(self, dx: float, dy: float, time: float) -> None:
+        """Move a fraction of (dx, dy), stopping CONTACT_SKIN short of an obstacle hit at that fraction."""
+        if time < 1:
+            time = max(0.0, time - CONTACT_SKIN / math.hypot(dx, dy))
+        self.x += dx * time
+        self.y += dy * time
 
     def rotate_left(self) -> None:
         """
@@ -0,0 +1,323 @@
+"""
+Headless benchmark suite for sensing, collision, planning, rendering and observations.
+
+Usage:
+    python benchmark.py                          # run everything, print a table
+    python benchmark.py --output results.json    # also save machine-readable results
+    python benchmark.py --compare baseline.json  # flag regressions against saved results
+    python benchmark.py --filter scan --quick     # run a subset with shorter timings
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+# Render without opening a window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy as np
+import pygame
+
+from agent import Agent
+from camera import Camera
+from constants import DEFAULT_WORLD_BOUNDS, VIEWPORT_RECT
+from controller_astar import ControllerAStar
+from lidar import free_positions, wall_rects
+from observations import ObservationRenderer
+from renderer import SceneRenderer
+from spatial_hash import SpatialHash
+from text_input import TextInput
+from button import Button
+from wall import Wall
+from world import load_world
+
+SCAN_BEAMS = [90, 360]
+SCAN_WALL_COUNTS = [3, 30, 300]
+COLLISION_WALL_COUNTS = [3, 300]
+
+# (world file, start, goal) pairs that need to route around walls
+PLANNING_CASES = [
+    ("worlds/test1.json", (98, 498), (700, 500)),
+    ("worlds/test2.json", (133, 321), (750, 580)),
+]
+
+RENDER_WORLDS = ["worlds/test1.json", "worlds/large1.json"]
+
+OBSERVATION_WORLDS = ["worlds/test1.json", "worlds/large1.json"]
+OBSERVATION_AGENTS = 256
+
+
+def random_walls(count: int, bounds: tuple = DEFAULT_WORLD_BOUNDS, seed: int = 0) -> list:
+    """
+    Generate a repeatable set of walls scattered over the world.
+
+    Args:
+        count (int): Number of walls.
+        bounds (tuple, optional): (left, top, right, bottom) of the world.
+        seed (int, optional): Seed for the wall layout. Defaults to 0.
+
+    Returns:
+        list: Wall objects.
+    """
+    rng = random.Random(seed)
+    left, top, right, bottom = bounds
+    walls = []
+    for _ in range(count):
+        width = rng.randint(10, 60)
+        height = rng.randint(10, 60)
+        x = rng.randint(left, right - width)
+        y = rng.randint(top, bottom - height)
+        walls.append(Wall(x, y, width, height))
+    return walls
+
+
+def measure(function, min_time: float, repeats: int = 3) -> float:
+    """
+    Measure how many times per second a function can be called.
+
+    Args:
+        function (callable): Called with no arguments.
+        min_time (float): Minimum seconds spent in each repeat.
+        repeats (int, optional): Number of repeats; the fastest one is reported. Defaults to 3.
+
+    Returns:
+        float: Calls per second.
+    """
+    best = 0.0
+    for _ in range(repeats):
+        calls = 0
+        start = time.perf_counter()
+        elapsed = 0.0
+        while elapsed < min_time:
+            function()
+            calls += 1
+            elapsed = time.perf_counter() - start
+        best = max(best, calls / elapsed)
+    return best
+
+
+def result(value: float, unit: str, higher_is_better: bool = True) -> dict:
+    return {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+
+
+def bench_scan(min_time: float) -> dict:
+    """Scans per second for each combination of beam count and wall count."""
+    results = {}
+    for walls_count in SCAN_WALL_COUNTS:
+        walls = random_walls(walls_count)
+        for beams in SCAN_BEAMS:
+            agent = Agent(400, 300, 0, walls, num_lidar_beams=beams, body_radius=5)
+            results[f"scan/beams={beams}/walls={walls_count}"] = result(
+                measure(agent.scan, min_time), "scans/s"
+            )
+    return results
+
+
+def bench_collision(min_time: float) -> dict:
+    """will_collide and detect_collision calls per second over random positions."""
+    results = {}
+    rng = random.Random(1)
+    left, top, right, bottom = DEFAULT_WORLD_BOUNDS
+    positions = [(rng.uniform(left, right), rng.uniform(top, bottom)) for _ in range(1000)]
+    directions = [rng.uniform(0, 360) for _ in range(1000)]
+
+    for walls_count in COLLISION_WALL_COUNTS:
+        agent = Agent(400, 300, 0, random_walls(walls_count), body_radius=10)
+
+        def will_collide():
+            for x, y in positions:
+                agent.will_collide(x, y)
+
+        def detect_collision():
+            for (x, y), direction in zip(positions, directions):
+                agent.x, agent.y, agent.direction = x, y, direction
+                agent.detect_collision()
+
+        calls = len(positions)
+        results[f"collision/will_collide/walls={walls_count}"] = result(
+            measure(will_collide, min_time) * calls, "calls/s"
+        )
+        results[f"collision/detect_collision/walls={walls_count}"] = result(
+            measure(detect_collision, min_time) * calls, "calls/s"
+        )
+    return results
+
+
+def bench_planning(min_time: float) -> dict:
+    """Latency of a full blocking A* search for each planning case."""
+    results = {}
+    for filename, start, goal in PLANNING_CASES:
+        walls, agent_data, bounds = load_world(filename)
+        radius = agent_data["radius"] if agent_data else 20
+        agent = Agent(*start, 0, walls, body_radius=radius, bounds=bounds)
+        controller = ControllerAStar(agent, walls)
+        controller.goal = goal
+
+        # Planning is slow, so a single repeat of at least one search is enough
+        rate = measure(controller.find_path, min_time, repeats=1)
+        name = os.path.splitext(os.path.basename(filename))[0]
+        results[f"planning/{name}"] = result(1000 / rate, "ms", higher_is_better=False)
+        results[f"planning/{name}/path_length"] = result(
+            len(controller.path), "points", higher_is_better=False
+        )
+    return results
+
+
+def bench_render(min_time: float) -> dict:
+    """Frames per second of the main.py render pipeline with the dummy video driver."""
+    results = {}
+    pygame.init()
+    screen = pygame.display.set_mode((1200, 600))
+    font = pygame.font.Font(None, 24)
+    buttons = [Button(850, 50 + 60 * i, 100, 50, f"Button {i}", lambda: None) for i in range(6)]
+    text_inputs = [TextInput(960, 230, 50, 50), TextInput(960, 350, 50, 50)]
+    text_surfaces = [font.render(f"Line {i}", True, (0, 0, 0)) for i in range(10)]
+
+    for filename in RENDER_WORLDS:
+        walls, agent_data, bounds = load_world(filename)
+        agent = Agent(agent_data["x"], agent_data["y"], 0, walls, bounds=bounds)
+        agent.lidar_ranges = [200] * len(agent.lidar_angles)
+        camera = Camera(VIEWPORT_RECT, bounds)
+        renderer = SceneRenderer(screen, camera)
+        wall_index = SpatialHash.from_walls(walls)
+        name = os.path.splitext(os.path.basename(filename))[0]
+
+        for lidar_visible in (False, True):
+            agent.lidar_visible = lidar_visible
+
+            def frame():
+                agent.direction = (agent.direction + 1) % 360
+                renderer.render(wall_index, agent, buttons, text_inputs, text_surfaces, (900, 400))
+
+            label = "lidar" if lidar_visible else "no_lidar"
+            results[f"render/{name}/{label}"] = result(measure(frame, min_time), "frames/s")
+
+        # Moving the camera forces the static layer to be rebuilt each frame
+        def panning_frame():
+            camera.pan(1, 0)
+            renderer.render(wall_index, agent, buttons, text_inputs, text_surfaces, (900, 400))
+
+        camera.zoom_at(camera.viewport.center, 0.25)
+        results[f"render/{name}/panning"] = result(measure(panning_frame, min_time), "frames/s")
+
+    pygame.quit()
+    return results
+
+
+def bench_observations(min_time: float) -> dict:
+    """Egocentric top-down crops and depth images per second, rendered in one batch of agents."""
+    results = {}
+    rng = np.random.default_rng(1)
+    for filename in OBSERVATION_WORLDS:
+        walls, _, bounds = load_world(filename)
+        renderer = ObservationRenderer.from_walls(walls, bounds)
+        positions = rng.uniform(bounds[:2], bounds[2:], size=(20 * OBSERVATION_AGENTS, 2))
+        positions = positions[free_positions(positions, 20, wall_rects(walls), bounds)][:OBSERVATION_AGENTS]
+        poses = np.column_stack([positions, rng.uniform(0, 360, len(positions))])
+        name = os.path.splitext(os.path.basename(filename))[0]
+        results[f"observations/{name}/top_down"] = result(
+            measure(lambda: renderer.top_down(poses), min_time) * len(poses), "crops/s"
+        )
+        results[f"observations/{name}/depth"] = result(
+            measure(lambda: renderer.depth(poses), min_time) * len(poses), "images/s"
+        )
+    return results
+
+
+BENCHMARKS = {
+    "scan": bench_scan,
+    "collision": bench_collision,
+    "planning": bench_planning,
+    "render": bench_render,
+    "observations": bench_observations,
+}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Compare results against a baseline run.
+
+    Args:
+        results (dict): Benchmark results of this run.
+        baseline (dict): Benchmark results loaded from a previous run.
+        threshold (float): Relative slowdown that counts as a regression, e.g. 0.1 for 10%.
+
+    Returns:
+        list[str]: Names of the benchmarks that regressed.
+    """
+    regressions = []
+    print(f"\n{'benchmark':55} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None or previous["value"] == 0:
+            continue
+        change = (current["value"] - previous["value"]) / previous["value"]
+        # Express the change so that negative always means slower
+        if not current["higher_is_better"]:
+            change = -change
+        flag = ""
+        if change < -threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(
+            f"{name:55} {previous['value']:12.2f} {current['value']:12.2f} {change:+8.1%}{flag}"
+        )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown flagged as a regression (default 0.1)")
+    parser.add_argument("--filter", default="", help="only run benchmark groups whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.5, help="minimum seconds per measurement (default 0.5)")
+    parser.add_argument("--quick", action="store_true", help="shorthand for --min-time 0.1")
+    args = parser.parse_args()
+
+    min_time = 0.1 if args.quick else args.min_time
+    results = {}
+    for group, benchmark in BENCHMARKS.items():
+        if args.filter not in group:
+            continue
+        print(f"Running {group} benchmarks...", file=sys.stderr)
+        results.update(benchmark(min_time))
+
+    print(f"\n{'benchmark':55} {'value':>12} unit")
+    for name, entry in results.items():
+        print(f"{name:55} {entry['value']:12.2f} {entry['unit']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "metadata": {
+                        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                        "python": platform.python_version(),
+                        "platform": platform.platform(),
+                        "min_time": min_time,
+                    },
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            return 1
+        print("\nNo regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,18 +3,26 @@ from constants import BLACK, WHITE
 
 
 class Button:
+    font = None  # Shared by all buttons, created on first draw
+
     def __init__(self, x, y, width, height, text, action, color=BLACK):
         self.rect = pygame.Rect(x, y, width, height)
         self.text = text
         self.action = action
         self.color = color
+        self.label_surface = None
+        self.label_text = None
 
     def draw(self, screen):
         pygame.draw.rect(screen, self.color, self.rect)
-        font = pygame.font.Font(None, 24)
-        text_surface = font.render(self.text, True, WHITE)
-        text_rect = text_surface.get_rect(center=self.rect.center)
-        screen.blit(text_surface, text_rect)
+        # Only re-render the label when the text changes
+        if self.label_text != self.text:
+            if Button.font is None:
+                Button.font = pygame.font.Font(None, 24)
+            self.label_surface = Button.font.render(self.text, True, WHITE)
+            self.label_text = self.text
+        text_rect = self.label_surface.get_rect(center=self.rect.center)
+        screen.blit(self.label_surface, text_rect)
 
     def is_clicked(self, pos):
         return self.rect.collidepoint(pos)
@@ -0,0 +1,151 @@
+import pygame
+
+
+class Camera:
+    """
+    A pan/zoom view of the world shown inside a rectangular area of the screen.
+
+    World coordinates are mapped to screen coordinates as
+    screen = viewport.topleft + (world - offset) * zoom.
+    """
+
+    MIN_ZOOM = 0.01
+    MAX_ZOOM = 8.0
+
+    def __init__(self, viewport: tuple, bounds: tuple, zoom: float = 1.0) -> None:
+        """
+        Initialize the Camera.
+
+        Args:
+            viewport (tuple): (x, y, width, height) of the screen area used to draw the world.
+            bounds (tuple): (left, top, right, bottom) of the world.
+            zoom (float, optional): Screen pixels per world unit. Defaults to 1.0.
+        """
+        self.viewport = pygame.Rect(viewport)
+        self.bounds = bounds
+        self.zoom = zoom
+        self.offset_x = bounds[0]
+        self.offset_y = bounds[1]
+
+    def set_bounds(self, bounds: tuple) -> None:
+        """Change the world bounds, keeping the current view where possible."""
+        self.bounds = bounds
+        self.clamp()
+
+    def reset(self) -> None:
+        """Reset the view to the top-left corner of the world at 1:1 zoom."""
+        self.zoom = 1.0
+        self.offset_x = self.bounds[0]
+        self.offset_y = self.bounds[1]
+
+    def world_to_screen(self, x: float, y: float) -> tuple[float, float]:
+        """Convert a world position to a screen position."""
+        return (
+            self.viewport.x + (x - self.offset_x) * self.zoom,
+            self.viewport.y + (y - self.offset_y) * self.zoom,
+        )
+
+    def screen_to_world(self, pos: tuple) -> tuple[float, float]:
+        """Convert a screen position to a world position."""
+        return (
+            self.offset_x + (pos[0] - self.viewport.x) / self.zoom,
+            self.offset_y + (pos[1] - self.viewport.y) / self.zoom,
+        )
+
+    def scale(self, length: float) -> float:
+        """Convert a world length to a screen length."""
+        return length * self.zoom
+
+    def world_rect_to_screen(self, rect: pygame.Rect) -> pygame.Rect:
+        """Convert a world-space rect to a screen-space rect."""
+        x, y = self.world_to_screen(rect.x, rect.y)
+        return pygame.Rect(
+            round(x),
+            round(y),
+            max(1, round(rect.width * self.zoom)),
+            max(1, round(rect.height * self.zoom)),
+        )
+
+    def visible_world_rect(self) -> tuple[float, float, float, float]:
+        """
+        Get the part of the world currently shown in the viewport.
+
+        Returns:
+            tuple: (left, top, right, bottom) in world coordinates.
+        """
+        return (
+            self.offset_x,
+            self.offset_y,
+            self.offset_x + self.viewport.width / self.zoom,
+            self.offset_y + self.viewport.height / self.zoom,
+        )
+
+    def contains(self, pos: tuple) -> bool:
+        """Check whether a screen position is inside the viewport."""
+        return self.viewport.collidepoint(pos)
+
+    def pan(self, dx: float, dy: float) -> None:
+        """
+        Move the view by a screen-space delta, e.g. the relative motion of a mouse drag.
+
+        Args:
+            dx (float): Horizontal screen pixels to move the world by.
+            dy (float): Vertical screen pixels to move the world by.
+        """
+        self.offset_x -= dx / self.zoom
+        self.offset_y -= dy / self.zoom
+        self.clamp()
+
+    def zoom_at(self, pos: tuple, factor: float) -> None:
+        """
+        Zoom by a factor while keeping the world point under pos fixed on screen.
+
+        Args:
+            pos (tuple): Screen position to zoom around.
+            factor (float): Multiplier applied to the current zoom.
+        """
+        world_x, world_y = self.screen_to_world(pos)
+        self.zoom = max(self.MIN_ZOOM, min(self.MAX_ZOOM, self.zoom * factor))
+        self.offset_x = world_x - (pos[0] - self.viewport.x) / self.zoom
+        self.offset_y = world_y - (pos[1] - self.viewport.y) / self.zoom
+        self.clamp()
+
+    def center_on(self, x: float, y: float) -> None:
+        """Center the view on a world position."""
+        self.offset_x = x - self.viewport.width / (2 * self.zoom)
+        self.offset_y = y - self.viewport.height / (2 * self.zoom)
+        self.clamp()
+
+    def clamp(self) -> None:
+        """Keep the view from drifting entirely off the world."""
+        left, top, right, bottom = self.bounds
+        view_w = self.viewport.width / self.zoom
+        view_h = self.viewport.height / self.zoom
+        # Allow half a viewport of slack past each edge
+        self.offset_x = max(left - view_w / 2, min(self.offset_x, right - view_w / 2))
+        self.offset_y = max(top - view_h / 2, min(self.offset_y, bottom - view_h / 2))
+
+    def handle_event(self, event: pygame.event.Event) -> bool:
+        """
+        Pan with a right or middle mouse drag and zoom with the mouse wheel.
+
+        Args:
+            event (pygame.event.Event): The Pygame event to handle.
+
+        Returns:
+            bool: True if the event was consumed by the camera.
+        """
+        if event.type == pygame.MOUSEWHEEL:
+            mouse_pos = pygame.mouse.get_pos()
+            if self.contains(mouse_pos):
+                self.zoom_at(mouse_pos, 1.1**event.y)
+                return True
+        elif event.type == pygame.MOUSEMOTION:
+            if (event.buttons[1] or event.buttons[2]) and self.contains(event.pos):
+                self.pan(*event.rel)
+                return True
+        elif event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+            # Middle/right drags and legacy wheel buttons belong to the camera
+            if event.button in (2, 3, 4, 5) and self.contains(event.pos):
+                return True
+        return False
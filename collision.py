@@ -0,0 +1,230 @@
+"""
+Continuous collision detection for the agent's circular body.
+
+Each function sweeps a circle of a given radius from (x, y) by (dx, dy) and
+returns (time, normal_x, normal_y) for the first contact, where time is the
+fraction of the motion completed at contact (0 to 1) and the normal points
+from the obstacle towards the circle, or None if the whole motion is free.
+Touching without overlapping is not a collision, as in Wall.is_colliding.
+A circle that already overlaps an obstacle is only stopped if it moves
+further into it, so it can always get free.
+"""
+
+import math
+
+import numpy as np
+
+# Moves times walls processed per block by free_moves, bounds the size of temporary arrays
+BLOCK_ELEMENTS = 1_000_000
+
+
+def sweep_circle_rect(
+    x: float, y: float, dx: float, dy: float, radius: float,
+    left: float, top: float, right: float, bottom: float,
+):
+    """
+    Sweep a circle against an axis-aligned rectangle.
+
+    The circle hits the rectangle where its centre hits the rectangle grown by
+    the radius, whose corners are quarter circles: the centre's path is
+    clipped against the grown box, and if it enters through a corner region
+    it is tested against that corner's circle instead.
+
+    Returns:
+        tuple | None: (time, normal_x, normal_y) of the first contact.
+    """
+    # Already overlapping: only block motion further in
+    closest_x = min(max(x, left), right)
+    closest_y = min(max(y, top), bottom)
+    away_x, away_y = x - closest_x, y - closest_y
+    if away_x * away_x + away_y * away_y < radius * radius:
+        if away_x == 0 and away_y == 0:
+            # Centre inside the rectangle, push out through the nearest side
+            away_x, away_y = min(
+                ((-1, 0, x - left), (1, 0, right - x), (0, -1, y - top), (0, 1, bottom - y)),
+                key=lambda side: side[2],
+            )[:2]
+        length = math.hypot(away_x, away_y)
+        nx, ny = away_x / length, away_y / length
+        return (0.0, nx, ny) if dx * nx + dy * ny < 0 else None
+
+    # Entry time into the grown box, slab by slab
+    enter, leave = -math.inf, 1.0
+    normal = (0.0, 0.0)
+    for position, delta, low, high, axis_normal in (
+        (x, dx, left - radius, right + radius, (1.0, 0.0)),
+        (y, dy, top - radius, bottom + radius, (0.0, 1.0)),
+    ):
+        if delta == 0:
+            if not low < position < high:
+                return None
+            continue
+        near, far = (low - position) / delta, (high - position) / delta
+        sign = -1.0
+        if near > far:
+            near, far = far, near
+            sign = 1.0
+        if near > enter:
+            enter = near
+            normal = (axis_normal[0] * sign, axis_normal[1] * sign)
+        leave = min(leave, far)
+        if enter >= leave:
+            return None
+    if leave <= 0:
+        return None
+
+    # Starting inside the grown box without overlapping means starting in a corner region
+    enter = max(enter, 0.0)
+    hit_x, hit_y = x + dx * enter, y + dy * enter
+    if left <= hit_x <= right or top <= hit_y <= bottom:
+        return enter, normal[0], normal[1]
+
+    # Entered through a corner region, where the grown rectangle is rounded
+    corner_x = left if hit_x < left else right
+    corner_y = top if hit_y < top else bottom
+    return sweep_circle_circle(x, y, dx, dy, radius, corner_x, corner_y, 0.0)
+
+
+def sweep_circle_circle(
+    x: float, y: float, dx: float, dy: float, radius: float,
+    other_x: float, other_y: float, other_radius: float,
+):
+    """
+    Sweep a circle against a stationary circle, e.g. another agent's body.
+
+    Returns:
+        tuple | None: (time, normal_x, normal_y) of the first contact.
+    """
+    reach = radius + other_radius
+    offset_x, offset_y = x - other_x, y - other_y
+    # Solve |offset + t * d| = reach for the earliest t
+    a = dx * dx + dy * dy
+    b = offset_x * dx + offset_y * dy
+    c = offset_x * offset_x + offset_y * offset_y - reach * reach
+    if c < 0:
+        if b >= 0 or a == 0:
+            return None  # Overlapping but moving apart
+        length = math.sqrt(offset_x * offset_x + offset_y * offset_y)
+        if length == 0:
+            return None
+        return 0.0, offset_x / length, offset_y / length
+    if a == 0 or b >= 0:
+        return None
+    discriminant = b * b - a * c
+    if discriminant <= 0:
+        return None
+    time = (-b - math.sqrt(discriminant)) / a
+    if not 0 <= time < 1:
+        return None
+    contact_x, contact_y = offset_x + dx * time, offset_y + dy * time
+    return time, contact_x / reach, contact_y / reach
+
+
+def sweep_circle_bounds(x: float, y: float, dx: float, dy: float, radius: float, bounds: tuple):
+    """
+    Sweep a circle that must stay inside the world bounds.
+
+    Returns:
+        tuple | None: (time, normal_x, normal_y) of the first contact with a boundary.
+    """
+    left, top, right, bottom = bounds
+    first = None
+    for position, delta, low, high, normal_x, normal_y in (
+        (x, dx, left + radius, right - radius, 1.0, 0.0),
+        (y, dy, top + radius, bottom - radius, 0.0, 1.0),
+    ):
+        if delta < 0:
+            time = (low - position) / delta
+            normal = (normal_x, normal_y)
+        elif delta > 0:
+            time = (high - position) / delta
+            normal = (-normal_x, -normal_y)
+        else:
+            continue
+        if time < 1 and (first is None or max(time, 0.0) < first[0]):
+            first = (max(time, 0.0), *normal)
+    return first
+
+
+def earliest(first, second):
+    """The earlier of two contacts, either of which may be None."""
+    if first is None:
+        return second
+    if second is None or first[0] <= second[0]:
+        return first
+    return second
+
+
+def free_moves(x, y, dx, dy, radius: float, rects: np.ndarray, bounds: tuple) -> np.ndarray:
+    """
+    Check which of many moves a circle can make without touching a wall or leaving the world.
+
+    The batched counterpart of Agent.sweep with free starting positions: a
+    move is blocked if the segment traced by the centre comes closer than the
+    radius to a wall rectangle, so large moves cannot pass through walls.
+
+    Args:
+        x, y (np.ndarray): Start positions, shape (N,).
+        dx, dy (np.ndarray): Moves, shape (N,).
+        radius (float): Body radius.
+        rects (np.ndarray): Wall rectangles (left, top, right, bottom), shape (W, 4).
+        bounds (tuple): (left, top, right, bottom) of the world.
+
+    Returns:
+        np.ndarray: Boolean mask of the free moves, shape (N,).
+    """
+    free = ends_in_bounds(x + dx, y + dy, radius, bounds)
+    block = max(1, BLOCK_ELEMENTS // max(1, len(rects)))
+    for start in range(0, len(x), block):
+        part = slice(start, start + block)
+        hit = moves_hit_rects(x[part, None], y[part, None], dx[part, None], dy[part, None], radius, rects)
+        free[part] &= ~hit.any(axis=1)
+    return free
+
+
+def ends_in_bounds(end_x, end_y, radius: float, bounds: tuple) -> np.ndarray:
+    """Whether moves end inside the world; the bounds are convex, so only the end of a move can leave them."""
+    left, top, right, bottom = bounds
+    return (left + radius <= end_x) & (end_x <= right - radius) & (top + radius <= end_y) & (end_y <= bottom - radius)
+
+
+def moves_hit_rects(x, y, dx, dy, radius: float, rects: np.ndarray) -> np.ndarray:
+    """
+    Check whether moves come closer than the radius to rectangles, elementwise.
+
+    Args:
+        x, y, dx, dy (np.ndarray): Start positions and moves, broadcast against the rectangles.
+        radius (float): Body radius.
+        rects (np.ndarray): Rectangles (left, top, right, bottom), shape (..., 4).
+
+    Returns:
+        np.ndarray: Boolean array of the broadcast shape.
+    """
+    left, top, right, bottom = np.moveaxis(rects, -1, 0)
+    # The centre's path must stay out of the rectangle grown by the radius,
+    # made of two crossed boxes and a circle at each corner
+    hit = _crosses_box(x, y, dx, dy, left - radius, top, right + radius, bottom)
+    hit |= _crosses_box(x, y, dx, dy, left, top - radius, right, bottom + radius)
+    length = dx * dx + dy * dy
+    safe_length = np.where(length > 0, length, 1.0)
+    for corner_x, corner_y in ((left, top), (right, top), (left, bottom), (right, bottom)):
+        time = np.clip(((corner_x - x) * dx + (corner_y - y) * dy) / safe_length, 0.0, 1.0)
+        away_x, away_y = x + dx * time - corner_x, y + dy * time - corner_y
+        hit |= away_x * away_x + away_y * away_y < radius * radius
+    return hit
+
+
+def _crosses_box(x, y, dx, dy, left, top, right, bottom) -> np.ndarray:
+    # Whether segments from (x, y) by (dx, dy) pass through the inside of boxes, by slabs
+    enter = np.zeros(np.broadcast_shapes(np.shape(x), np.shape(y), np.shape(dx), np.shape(dy), np.shape(left)))
+    leave = np.ones_like(enter)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for position, delta, low, high in ((x, dx, left, right), (y, dy, top, bottom)):
+            to_low, to_high = (low - position) / delta, (high - position) / delta
+            # A segment parallel to a slab is in it throughout or never
+            inside = (low < position) & (position < high)
+            near = np.where(delta == 0, np.where(inside, -np.inf, np.inf), np.minimum(to_low, to_high))
+            far = np.where(delta == 0, np.where(inside, np.inf, -np.inf), np.maximum(to_low, to_high))
+            np.maximum(enter, near, out=enter)
+            np.minimum(leave, far, out=leave)
+    return enter < leave
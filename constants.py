@@ -7,6 +7,7 @@ GREEN = (0, 255, 0)  # Corrected
 BLACK = (0, 0, 0)  # Corrected
 BROWN = (138, 69, 19)
 DISABLED_GRAY = (168, 169, 169)
+PURPLE = (128, 0, 128)
 
 # Define the boundaries of the robot area
 LEFT_BOUNDARY = 0
@@ -14,6 +15,12 @@ RIGHT_BOUNDARY = 800
 TOP_BOUNDARY = 0
 BOTTOM_BOUNDARY = 600
 
+# Default world bounds (left, top, right, bottom) for worlds that don't define their own
+DEFAULT_WORLD_BOUNDS = (LEFT_BOUNDARY, TOP_BOUNDARY, RIGHT_BOUNDARY, BOTTOM_BOUNDARY)
+
+# Screen area used to display the world (the left panel of the window)
+VIEWPORT_RECT = (0, 0, 800, 600)
+
 # Movement constants
 MOVE_LEFT = "left"
 MOVE_RIGHT = "right"
@@ -15,3 +15,15 @@ class Controller(ABC):
     def move_agent(self):
         pass
 
+    def update(self):
+        # Called by the simulation once per step
+        self.handle_input()
+        self.move_agent()
+
+    def get_state(self):
+        # Everything update() changes, for Simulation.snapshot()
+        return (self.running,)
+
+    def set_state(self, state):
+        (self.running,) = state
+
@@ -1,6 +1,17 @@
 import heapq
+import logging
 import math
-from constants import LEFT_BOUNDARY, RIGHT_BOUNDARY, TOP_BOUNDARY, BOTTOM_BOUNDARY
+import time
+
+import numpy as np
+
+from collision import moves_hit_rects
+from lidar import wall_rects
+from path_follower import PurePursuit
+from profiler import PROFILER
+from sim_logging import event, get_logger
+
+log = get_logger("astar")
 
 class Node:
     def __init__(self, position, g=0, h=0):
@@ -13,7 +24,127 @@ class Node:
     def __lt__(self, other):
         return self.f < other.f
 
+class PathSearch:
+    """
+    A* search that can be paused and resumed, so planning can be spread over many ticks.
+
+    Each call to step() expands nodes until an expansion or time budget runs out.
+    Between calls the best partial path found so far is available, and the search
+    can simply be dropped to cancel it.
+    """
+
+    def __init__(self, controller, start, goal):
+        self.controller = controller
+        self.start = start
+        self.goal = goal
+        self.open_set = [(0, start)]
+        self.came_from = {}
+        self.g_score = {start: 0}
+        self.expanded = 0
+        self.start_distance = controller.heuristic(start, goal)
+        self.best = start
+        self.best_h = self.start_distance
+        self.done = False
+        self.path = []
+
+    def reconstruct(self, current):
+        path = []
+        while current in self.came_from:
+            path.append(current)
+            current = self.came_from[current]
+        path.reverse()
+        return path
+
+    def step(self, max_expansions=None, time_budget=None):
+        # Returns True once the search has finished, successfully or not
+        if self.done:
+            return True
+        if not PROFILER.enabled:
+            return self._expand(max_expansions, time_budget)
+
+        expanded = self.expanded
+        with PROFILER.scope("plan.search"):
+            done = self._expand(max_expansions, time_budget)
+        PROFILER.count("plan.nodes_expanded", self.expanded - expanded)
+        return done
+
+    def _expand(self, max_expansions, time_budget):
+        controller = self.controller
+        goal = self.goal
+        open_set = self.open_set
+        g_score = self.g_score
+        deadline = time.perf_counter() + time_budget if time_budget else None
+        expansions = 0
+
+        while open_set:
+            if max_expansions is not None and expansions >= max_expansions:
+                return False
+            # Checking the clock is costly, so only do it every so often
+            if deadline and expansions % 64 == 0 and time.perf_counter() >= deadline:
+                return False
+
+            _, current = heapq.heappop(open_set)
+            expansions += 1
+            self.expanded += 1
+
+            # If the goal is reached
+            if controller.is_goal_reached(current, goal):
+                self.path = self.reconstruct(current)
+                self.done = True
+                return True
+
+            # Remember the node closest to the goal for partial paths
+            h = controller.heuristic(current, goal)
+            if h < self.best_h:
+                self.best = current
+                self.best_h = h
+
+            # Explore neighbors
+            for neighbor in controller.get_neighbors(current):
+                tentative_g_score = g_score[current] + 1
+                if neighbor not in g_score or tentative_g_score < g_score[neighbor]:
+                    self.came_from[neighbor] = current
+                    g_score[neighbor] = tentative_g_score
+                    f_score = tentative_g_score + controller.heuristic(neighbor, goal)
+                    heapq.heappush(open_set, (f_score, neighbor))
+
+        self.done = True
+        return True
+
+    def copy(self):
+        # Independent copy to resume from, sharing only immutable nodes
+        search = PathSearch.__new__(PathSearch)
+        search.__dict__.update(self.__dict__)
+        search.open_set = self.open_set.copy()
+        search.came_from = self.came_from.copy()
+        search.g_score = self.g_score.copy()
+        return search
+
+    def run(self):
+        while not self.step():
+            pass
+        return self.path
+
+    def partial_path(self):
+        # Best path so far: the full path once found, otherwise the way to the closest node
+        if self.done:
+            return self.path
+        return self.reconstruct(self.best)
+
+    def progress(self):
+        # Fraction of the straight-line distance to the goal covered by the best node
+        if self.done:
+            return 1.0
+        if self.start_distance == 0:
+            return 0.0
+        return max(0.0, 1 - self.best_h / self.start_distance)
+
+
 class ControllerAStar:
+    REACH_THRESHOLD = 10
+    BUFFER_DISTANCE = 10  # Clearance from walls kept by planned paths
+    SMOOTH_CHUNK = 64  # Waypoints checked at once when smoothing a path
+
     def __init__(self, agent, walls):
         self.agent = agent
         self.walls = walls
@@ -22,6 +153,41 @@ class ControllerAStar:
         self.path = []
         self.current_target_index = 0
         self.running = False
+        self.search = None
+        # Planning budget per tick; the agent follows the best partial path meanwhile
+        self.expansions_per_tick = 500
+        self.time_budget_per_tick = None
+        self.move_while_planning = True
+        self.partial_end = None
+        self.goals_reached = 0  # Counts arrivals, for recordings to flag them
+        # "pursuit" drives along the smoothed path with PurePursuit, "waypoints"
+        # steps to every waypoint in turn, as older recordings did
+        self.path_following = "pursuit"
+        self.follower = PurePursuit(agent)
+        self._wall_rects = None
+        # With an OccupancyMap from use_map(), planning only avoids what has been mapped
+        self.occupancy_map = None
+        self.map_blocked = None
+        self._true_walls = walls
+
+    def get_state(self):
+        # Paths are replaced rather than changed in place, so they are shared;
+        # a search in progress is copied, as it keeps changing
+        return (
+            self.running, self.goal, self.start, self.path, self.current_target_index,
+            self.search.copy() if self.search else None, self.partial_end, self.goals_reached,
+            self.path_following, self.follower.get_state(),
+        )
+
+    def set_state(self, state):
+        (
+            self.running, self.goal, self.start, self.path, self.current_target_index,
+            search, self.partial_end, self.goals_reached,
+            self.path_following, follower,
+        ) = state
+        self.follower.set_state(follower)
+        # The snapshot's search stays untouched, so it can be restored again
+        self.search = search.copy() if search else None
 
     def heuristic(self, a, b):
         dx = abs(b[0] - a[0])
@@ -43,13 +209,19 @@ class ControllerAStar:
 
     def is_valid_position(self, position):
         x, y = position
-        BUFFER_DISTANCE = 10  # Define the buffer distance from walls
+        BUFFER_DISTANCE = self.BUFFER_DISTANCE
 
         # Check boundaries
-        if not (LEFT_BOUNDARY + BUFFER_DISTANCE <= x <= RIGHT_BOUNDARY - BUFFER_DISTANCE and
-                TOP_BOUNDARY + BUFFER_DISTANCE <= y <= BOTTOM_BOUNDARY - BUFFER_DISTANCE):
+        left, top, right, bottom = self.agent.bounds
+        if not (left + BUFFER_DISTANCE <= x <= right - BUFFER_DISTANCE and
+                top + BUFFER_DISTANCE <= y <= bottom - BUFFER_DISTANCE):
             return False
 
+        if self.map_blocked is not None:
+            # Cells too close to a mapped wall, looked up instead of testing every wall
+            row, column = self.occupancy_map.cell(x, y)
+            return not self.map_blocked[row, column]
+
         # Check collision with walls, considering the buffer distance
         for wall in self.walls:
             if wall.is_colliding(x, y, self.agent.body_radius + BUFFER_DISTANCE):
@@ -60,46 +232,84 @@ class ControllerAStar:
 
 
 
-    def find_path(self):
-        start = (int(self.agent.x), int(self.agent.y))
+    def use_map(self, occupancy_map):
+        # Plan on an OccupancyMap's current walls instead of the true ones, treating
+        # unknown space as free; call again as the map grows, or with None to go back
+        self.occupancy_map = occupancy_map
+        self._wall_rects = None
+        if occupancy_map is None:
+            self.walls = self._true_walls
+            self.map_blocked = None
+            return
+        occupied = occupancy_map.occupied()
+        self.map_blocked = occupancy_map.inflate(self.agent.body_radius + self.BUFFER_DISTANCE, occupied)
+        self.walls = occupancy_map.walls()
+
+    def start_search(self, start=None):
+        # Planning from another start than the agent, e.g. a free spot next to it
+        start = (int(self.agent.x), int(self.agent.y)) if start is None else start
         goal = (int(self.goal[0]), int(self.goal[1]))
 
         if not self.is_valid_position(start) or not self.is_valid_position(goal):
-            print(f"Start {start} or goal {goal} is invalid.")
-            return []
+            event(log, logging.WARNING, "invalid start or goal", start=start, goal=goal)
+            return None
 
-        open_set = []
-        heapq.heappush(open_set, (0, start))
-        came_from = {}
-        g_score = {start: 0}
-        f_score = {start: self.heuristic(start, goal)}
+        return PathSearch(self, start, goal)
 
-        while open_set:
-            _, current = heapq.heappop(open_set)
+    def find_path(self):
+        # Blocking search, run to completion
+        search = self.start_search()
+        path = search.run() if search else []
 
-            # If the goal is reached
-            if self.is_goal_reached(current, goal):
-                path = []
-                while current in came_from:
-                    path.append(current)
-                    current = came_from[current]
-                path.reverse()
-                print(f"Path found with {len(path)} points.")
-                self.path = path
-                return path
+        if path:
+            event(log, logging.INFO, "path found", points=len(path), expanded=search.expanded)
+        else:
+            event(log, logging.INFO, "no path found", goal=self.goal)
+        self.path = path
+        return path
 
-            # Explore neighbors
-            for neighbor in self.get_neighbors(current):
-                tentative_g_score = g_score[current] + 1
-                if neighbor not in g_score or tentative_g_score < g_score[neighbor]:
-                    came_from[neighbor] = current
-                    g_score[neighbor] = tentative_g_score
-                    f_score[neighbor] = tentative_g_score + self.heuristic(neighbor, goal)
-                    heapq.heappush(open_set, (f_score[neighbor], neighbor))
+    def planning_progress(self):
+        return self.search.progress() if self.search else None
 
-        print("No path found.")
-        self.path = []
-        return []
+    def set_path(self, path):
+        # Continue from the point of the new path closest to the agent,
+        # skipping points that already count as reached
+        self.path = path
+        self.current_target_index = 0
+        if path:
+            x, y = self.agent.x, self.agent.y
+            distances = [(px - x) ** 2 + (py - y) ** 2 for px, py in path]
+            index = min(range(len(path)), key=distances.__getitem__)
+            while (
+                index < len(path) - 1
+                and distances[index] <= self.REACH_THRESHOLD**2
+            ):
+                index += 1
+            self.current_target_index = index
+        if self.path_following == "pursuit":
+            self.follower.set_path(path[self.current_target_index:], (self.agent.x, self.agent.y))
+
+    def advance_search(self):
+        search = self.search
+        search.step(self.expansions_per_tick, self.time_budget_per_tick)
+
+        if not search.done:
+            # Only re-route when the best partial path has changed
+            if self.move_while_planning and search.best != self.partial_end:
+                self.partial_end = search.best
+                self.set_path(search.partial_path())
+            return
+
+        self.search = None
+        if search.path:
+            path = self.smooth_path(search.path) if self.path_following == "pursuit" else search.path
+            event(log, logging.INFO, "path found", points=len(search.path), waypoints=len(path),
+                  expanded=search.expanded)
+            self.set_path(path)
+        else:
+            event(log, logging.WARNING, "no path found, stopping", goal=search.goal, expanded=search.expanded)
+            self.path = []
+            self.running = False
 
 
     def move_towards(self, target_x, target_y):
@@ -108,7 +318,8 @@ class ControllerAStar:
         distance = math.sqrt(direction_x ** 2 + direction_y ** 2)
 
         if distance == 0:
-            print("Agent already at the target position.")
+            if log.isEnabledFor(logging.DEBUG):
+                event(log, logging.DEBUG, "already at target", pose=(self.agent.x, self.agent.y))
             return
 
         direction_x /= distance
@@ -118,34 +329,55 @@ class ControllerAStar:
         next_x = self.agent.x + direction_x * speed
         next_y = self.agent.y + direction_y * speed
 
-        if not self.agent.will_collide(next_x, next_y):
+        # Swept along the move, so large steps cannot pass through walls
+        if self.agent.sweep(next_x - self.agent.x, next_y - self.agent.y) is None:
             self.agent.x = next_x
             self.agent.y = next_y
-        else:
-            print(f"Movement blocked at ({next_x}, {next_y}).")
+        elif log.isEnabledFor(logging.DEBUG):
+            event(log, logging.DEBUG, "movement blocked", pose=(self.agent.x, self.agent.y),
+                  next=(next_x, next_y), reason="collision")
 
     def is_goal_reached(self, current_pos, goal_pos, tolerance=1):
         return (abs(current_pos[0] - goal_pos[0]) <= tolerance and
                 abs(current_pos[1] - goal_pos[1]) <= tolerance)
         
-    def set_goal(self, goal):
+    def set_goal(self, goal, start=None):
+        # Starting a new search cancels any search still in progress
         self.goal = goal
-        self.find_path()
+        self.follower.reset_errors()
+        self.path = []
         self.current_target_index = 0
+        self.partial_end = None
+        self.search = self.start_search(start)
 
-        if not self.path:
-            print("No valid path found. Cannot start navigation.")
+        if self.search is None:
+            event(log, logging.WARNING, "cannot start navigation", goal=goal, reason="invalid start or goal")
             self.running = False
         else:
             self.running = True
 
     def update(self):
+        if self.running and self.search:
+            self.advance_search()
+
         if not self.running or not self.path:
-            print("Agent is not running or no valid path to follow.")
+            if not self.search and log.isEnabledFor(logging.DEBUG):
+                event(log, logging.DEBUG, "idle", running=self.running, path_points=len(self.path))
+            return
+
+        if self.path_following == "pursuit":
+            if self.follower.step() and not self.search:
+                event(log, logging.INFO, "path completed", pose=(self.agent.x, self.agent.y), goal=self.goal,
+                      **self.follower.errors())
+                self.goals_reached += 1
+                self.running = False
             return
 
         if self.current_target_index >= len(self.path):
-            print("Agent reached the goal.")
+            if self.search:
+                return  # Reached the end of a partial path, wait for the planner
+            event(log, logging.INFO, "goal reached", pose=(self.agent.x, self.agent.y), goal=self.goal)
+            self.goals_reached += 1
             self.running = False
             return
 
@@ -157,15 +389,78 @@ class ControllerAStar:
         dx = target_x - self.agent.x
         dy = target_y - self.agent.y
         distance = math.sqrt(dx**2 + dy**2)
-        REACH_THRESHOLD = 10
 
-        if distance <= REACH_THRESHOLD:
+        if distance <= self.REACH_THRESHOLD:
             self.current_target_index += 1
 
-            if self.current_target_index >= len(self.path):
-                print("Path completed.")
+            if self.current_target_index >= len(self.path) and not self.search:
+                event(log, logging.INFO, "path completed", pose=(self.agent.x, self.agent.y), goal=self.goal)
+                self.goals_reached += 1
                 self.running = False
 
+    def remaining_path(self):
+        # The part of the path still ahead, starting from the agent
+        if self.path_following == "pursuit":
+            points = self.follower.points[self.follower.segment + 1:]
+        else:
+            points = self.path[self.current_target_index:]
+        return [(self.agent.x, self.agent.y), *points]
+
+    def path_blocked(self, radius=None):
+        # Whether a body of the given radius, by default the agent's without the
+        # planner's clearance, would now hit a wall somewhere along the rest of
+        # the path, e.g. one mapped since planning
+        radius = self.agent.body_radius if radius is None else radius
+        points = np.asarray(self.remaining_path(), dtype=np.float64)
+        if len(points) < 2 or not self.walls:
+            return False
+        if self._wall_rects is None or len(self._wall_rects) != len(self.walls):
+            self._wall_rects = wall_rects(self.walls)
+        starts, moves = points[:-1], np.diff(points, axis=0)
+        return bool(moves_hit_rects(
+            starts[:, :1], starts[:, 1:], moves[:, :1], moves[:, 1:], radius, self._wall_rects
+        ).any())
+
+    @property
+    def cross_track_error(self):
+        # Distance from the agent to the path it follows
+        return self.follower.cross_track_error
+
+    def smooth_path(self, path):
+        # Keep only the waypoints needed to get around walls: from each kept
+        # waypoint, go straight to the last one that the body, with the
+        # planner's clearance, can reach in a straight line
+        if len(path) < 3:
+            return path
+        if self._wall_rects is None or len(self._wall_rects) != len(self.walls):
+            self._wall_rects = wall_rects(self.walls)
+        rects = self._wall_rects
+        radius = self.agent.body_radius + self.BUFFER_DISTANCE
+        points = np.asarray(path, dtype=np.float64)
+
+        smoothed = [path[0]]
+        anchor = 0
+        while anchor < len(path) - 1:
+            x, y = points[anchor]
+            furthest = anchor + 1
+            for start in range(anchor + 2, len(path), self.SMOOTH_CHUNK):
+                ends = points[start:start + self.SMOOTH_CHUNK]
+                # Only walls near the chunk's straight runs can be in the way
+                low = np.minimum(ends.min(axis=0), (x, y)) - radius
+                high = np.maximum(ends.max(axis=0), (x, y)) + radius
+                near = rects[
+                    (rects[:, 0] < high[0]) & (rects[:, 2] > low[0]) & (rects[:, 1] < high[1]) & (rects[:, 3] > low[1])
+                ]
+                hit = moves_hit_rects(x, y, ends[:, :1] - x, ends[:, 1:] - y, radius, near).any(axis=1)
+                blocked = np.flatnonzero(hit)
+                if len(blocked):
+                    furthest = start + int(blocked[0]) - 1
+                    break
+                furthest = start + len(ends) - 1
+            smoothed.append(path[furthest])
+            anchor = furthest
+        return smoothed
+
     def simplify_path(self, path):
         if len(path) < 3:
             return path  # No simplification needed for short paths
@@ -220,8 +515,8 @@ class ControllerAStar:
         snapped_pos = (round(mouse_pos[0]), round(mouse_pos[1]))
 
         if self.is_valid_position(snapped_pos):
-            print(f"Goal set to: {snapped_pos}")
+            event(log, logging.INFO, "goal set", goal=snapped_pos)
             self.set_goal(snapped_pos)
         else:
-            print(f"Invalid goal position: {mouse_pos}")
+            event(log, logging.WARNING, "invalid goal", goal=mouse_pos, reason="not a valid position")
             self.running = False
\ No newline at end of file
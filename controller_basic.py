@@ -16,6 +16,12 @@ class ControllerBasic(Controller):
         else:
             self.move = "forward"
 
+    def get_state(self):
+        return self.running, self.move
+
+    def set_state(self, state):
+        self.running, self.move = state
+
     def move_agent(self):
         if not self.running:
             return
@@ -0,0 +1,270 @@
+import logging
+import math
+
+import numpy as np
+
+from controller_astar import ControllerAStar
+from occupancy_map import OccupancyMap
+from sim_logging import event, get_logger
+
+log = get_logger("frontier")
+
+
+class ControllerFrontier:
+    """
+    Explores an unknown world by driving to the frontiers of what it has mapped.
+
+    Every new LiDAR scan goes into an OccupancyMap. Frontier cells are free
+    cells next to cells never observed. They are kept in a set that is
+    updated incrementally: after each scan only the cells the scan changed
+    and their neighbours are checked again, never the whole grid. Frontier
+    cells are grouped into square blocks. Each block is worth its number of
+    frontier cells, in world units, minus the distance to it. The agent heads
+    for the frontier cell of the most valuable block, using a ControllerAStar
+    that plans on the map, with unknown space counting as free. A new target
+    is chosen when the agent arrives, when the target stops being a frontier
+    cell, or when the target turns out to be out of reach. The path is
+    planned again when a newly mapped wall blocks it.
+    """
+
+    CLUSTER_SIZE = 8  # Side, in map cells, of the blocks frontier cells are grouped into
+    MIN_CLUSTER = 3  # Frontier cells a block needs to be worth exploring
+    MAP_INTERVAL = 30  # Updates between handing the planner the grown map
+    STUCK_UPDATES = 60  # Updates without real progress before giving up on a target
+    STUCK_DISTANCE = 20
+
+    def __init__(
+        self,
+        agent,
+        walls,
+        resolution: float = 10.0,
+        max_range: float | None = None,
+        distance_weight: float = 1.0,
+    ) -> None:
+        """
+        Initialize the ControllerFrontier.
+
+        Args:
+            agent (Agent): The agent to drive.
+            walls (list): Wall objects of the world, only used if the planner is taken off the map.
+            resolution (float, optional): Cell size of the occupancy map. Defaults to 10.
+            max_range (float, optional): How far from the agent scans are mapped. A short range
+                makes the agent go near every part of the world instead of only seeing it, e.g. to
+                collect place-cell data. Defaults to the range at which neighbouring beams are a
+                cell apart, so that far-away gaps between beams do not show up as frontiers.
+            distance_weight (float, optional): How much the distance to a block counts against
+                its frontier length. Defaults to 1.
+        """
+        self.agent = agent
+        self.map = OccupancyMap(agent.bounds, resolution)
+        spacing = math.radians(360 / max(1, len(agent.lidar_angles)))
+        self.max_range = min(agent.lidar_max_range, resolution / spacing) if max_range is None else max_range
+        self.distance_weight = distance_weight
+        self.planner = ControllerAStar(agent, walls)
+        self.planner.use_map(self.map)
+        self.frontier = set()  # Flat indices of the frontier cells
+        self.rejected = set()  # Blocks whose targets could not be reached
+        self.target = None
+        self.running = False
+        self.goals_reached = 0
+        self.updates = 0
+        self._last_scan = None
+        self._map_updated = 0  # Update at which the planner last got the map
+        self._progress = (0, agent.x, agent.y)  # Update and position at the last real progress
+        self._planner_goals = 0
+
+    @property
+    def path(self):
+        return self.planner.path
+
+    def planning_progress(self):
+        return self.planner.planning_progress()
+
+    def get_state(self):
+        # The map's tiles change in place, so they are copied, which costs as
+        # much as the explored area; the planner's map views are replaced, not changed
+        planner = self.planner
+        return (
+            self.running, self.target, self.goals_reached, self.updates, self._last_scan,
+            self._map_updated, self._progress, self._planner_goals,
+            {key: tile.copy() for key, tile in self.map.tiles.items()}, self.map.scans,
+            set(self.frontier), set(self.rejected),
+            planner.get_state(), planner.map_blocked, planner.walls,
+        )
+
+    def set_state(self, state):
+        (
+            self.running, self.target, self.goals_reached, self.updates, self._last_scan,
+            self._map_updated, self._progress, self._planner_goals,
+            tiles, self.map.scans, frontier, rejected,
+            planner, self.planner.map_blocked, self.planner.walls,
+        ) = state
+        self.map.tiles = {key: tile.copy() for key, tile in tiles.items()}
+        self.frontier = set(frontier)
+        self.rejected = set(rejected)
+        self.planner.set_state(planner)
+        self.planner._wall_rects = None
+
+    def add_scan(self):
+        # Map the agent's latest scan and update the frontier around the cells it changed
+        changed = self.map.update_from_agent(self.agent, self.max_range)
+        if not len(changed):
+            return
+        columns = self.map.columns
+        # A cell's status depends on it and its four neighbours; stepping over
+        # the end of a row only adds a cell that is checked needlessly
+        candidates = np.unique(np.concatenate([changed, changed - 1, changed + 1, changed - columns, changed + columns]))
+        candidates = candidates[(candidates >= 0) & (candidates < self.map.rows * columns)]
+        frontier = self.map.is_frontier(candidates)
+        self.frontier.difference_update(candidates[~frontier].tolist())
+        self.frontier.update(candidates[frontier].tolist())
+
+    def cell_center(self, cell):
+        row, column = divmod(cell, self.map.columns)
+        left, top, _, _ = self.map.bounds
+        return (
+            int(left + (column + 0.5) * self.map.resolution),
+            int(top + (row + 0.5) * self.map.resolution),
+        )
+
+    def block_of(self, position):
+        row, column = self.map.cell(*position)
+        return row // self.CLUSTER_SIZE, column // self.CLUSTER_SIZE
+
+    def choose_target(self):
+        # The frontier cell closest to the middle of the most valuable block the planner can reach
+        if not self.frontier:
+            return None
+        resolution = self.map.resolution
+        cells = np.fromiter(self.frontier, dtype=np.intp, count=len(self.frontier))
+        cells.sort()  # Sets have no stable order; keep choices repeatable
+        rows, columns = np.divmod(cells, self.map.columns)
+        left, top, right, bottom = self.map.bounds
+        xs = left + (columns + 0.5) * resolution
+        ys = top + (rows + 0.5) * resolution
+
+        block_columns = -(-self.map.columns // self.CLUSTER_SIZE)
+        blocks, inverse, sizes = np.unique(
+            (rows // self.CLUSTER_SIZE) * block_columns + columns // self.CLUSTER_SIZE,
+            return_inverse=True, return_counts=True,
+        )
+        center_x = np.bincount(inverse, weights=xs) / sizes
+        center_y = np.bincount(inverse, weights=ys) / sizes
+
+        # Cells the body can get to: clear of mapped walls and of the world's edge,
+        # which scans do not map as it lies outside the grid
+        clearance = self.agent.body_radius + self.planner.BUFFER_DISTANCE
+        candidate = ~self.planner.map_blocked[rows, columns]
+        candidate &= (xs >= left + clearance) & (xs <= right - clearance)
+        candidate &= (ys >= top + clearance) & (ys <= bottom - clearance)
+        candidate &= sizes[inverse] >= self.MIN_CLUSTER
+        # Cells the agent is already at are seen with the next scan
+        candidate &= np.hypot(xs - self.agent.x, ys - self.agent.y) > self.planner.REACH_THRESHOLD
+        if self.rejected:
+            rejected = np.fromiter((row * block_columns + column for row, column in self.rejected), dtype=np.intp)
+            candidate &= ~np.isin(blocks[inverse], rejected)
+        indices = np.flatnonzero(candidate)
+        if not len(indices):
+            return None
+
+        # Closest candidate to the middle of each block
+        offset = (xs[indices] - center_x[inverse[indices]]) ** 2 + (ys[indices] - center_y[inverse[indices]]) ** 2
+        order = np.lexsort((offset, inverse[indices]))
+        indices = indices[order]
+        first = np.r_[True, inverse[indices[1:]] != inverse[indices[:-1]]]
+        indices = indices[first]
+
+        # The cost of a block is the time to get there, as the distance the agent
+        # could drive in it: turning to face the target takes time too
+        agent = self.agent
+        dx, dy = xs[indices] - agent.x, ys[indices] - agent.y
+        turn = np.abs((np.degrees(np.arctan2(-dy, dx)) - agent.direction + 180) % 360 - 180)
+        cost = np.hypot(dx, dy) + turn / agent.angular_speed * agent.linear_speed
+        utility = sizes[inverse[indices]] * resolution - self.distance_weight * cost
+        best = indices[int(np.argmax(utility))]
+        return self.cell_center(int(cells[best])), float(utility.max())
+
+    def open_start(self):
+        # A free spot next to the agent to plan from, for when the agent is
+        # closer to a mapped wall than the planner's clearance allows
+        if self.planner.is_valid_position((int(self.agent.x), int(self.agent.y))):
+            return None
+        row, column = self.map.cell(self.agent.x, self.agent.y)
+        blocked = self.planner.map_blocked
+        for reach in range(1, self.CLUSTER_SIZE + 1):
+            top, left = max(0, row - reach), max(0, column - reach)
+            open_rows, open_columns = np.nonzero(~blocked[top:row + reach + 1, left:column + reach + 1])
+            order = np.argsort((open_rows + top - row) ** 2 + (open_columns + left - column) ** 2, kind="stable")
+            for index in order:
+                start = self.cell_center(int((open_rows[index] + top) * self.map.columns + open_columns[index] + left))
+                if self.planner.is_valid_position(start):
+                    return start
+        return None
+
+    def refresh_map(self):
+        self.planner.use_map(self.map)
+        self._map_updated = self.updates
+
+    def next_target(self):
+        # Head for the best frontier, or stop once there is none left to reach
+        self.refresh_map()
+        while True:
+            choice = self.choose_target()
+            if choice is None:
+                event(log, logging.INFO, "exploration finished", coverage=round(self.map.coverage(), 1),
+                      targets=self.goals_reached, updates=self.updates)
+                self.target = None
+                self.running = False
+                return
+            target, utility = choice
+            self.target = target
+            self._progress = (self.updates, self.agent.x, self.agent.y)
+            self._planner_goals = self.planner.goals_reached
+            self.planner.set_goal(target, self.open_start())
+            if self.planner.running:
+                event(log, logging.INFO, "frontier target", target=target, utility=round(utility, 1),
+                      frontier=len(self.frontier))
+                return
+            self.rejected.add(self.block_of(target))
+
+    def update(self):
+        if self.agent.lidar_ranges is not self._last_scan:
+            # A new scan, as scans replace the list
+            self._last_scan = self.agent.lidar_ranges
+            self.add_scan()
+        if not self.running:
+            return
+        self.updates += 1
+
+        planner = self.planner
+        if self.target is not None:
+            target_cell = self.map.cell(*self.target)
+            arrived = math.hypot(self.target[0] - self.agent.x, self.target[1] - self.agent.y) <= planner.REACH_THRESHOLD
+            if arrived or not planner.running:
+                # Close enough counts too, as A* finds no path from a start next to the goal
+                if arrived or planner.goals_reached > self._planner_goals:
+                    self.goals_reached += 1
+                else:
+                    # No path, e.g. the target lies in a pocket closed off since it was chosen
+                    self.rejected.add(self.block_of(self.target))
+                self.target = None
+            elif target_cell[0] * self.map.columns + target_cell[1] not in self.frontier:
+                # Seen before getting there; the agent moves on without stopping
+                self.target = None
+            else:
+                since, x, y = self._progress
+                if math.hypot(self.agent.x - x, self.agent.y - y) >= self.STUCK_DISTANCE:
+                    self._progress = (self.updates, self.agent.x, self.agent.y)
+                elif self.updates - since >= self.STUCK_UPDATES:
+                    event(log, logging.INFO, "frontier target abandoned", target=self.target, reason="no progress")
+                    self.rejected.add(self.block_of(self.target))
+                    self.target = None
+                elif self.updates - self._map_updated >= self.MAP_INTERVAL:
+                    self.refresh_map()
+                    if not planner.search and planner.path_blocked(self.agent.body_radius - self.map.resolution):
+                        planner.set_goal(self.target, self.open_start())
+
+        if self.target is None:
+            self.next_target()
+        if self.running:
+            planner.update()
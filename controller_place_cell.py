@@ -0,0 +1,105 @@
+import math
+
+import numpy as np
+
+from controller import Controller
+from agent import Agent
+from place_cells import PlaceCellPopulation, RateMap
+
+
+class ControllerPlaceCell(Controller):
+    def __init__(
+        self,
+        model: PlaceCellPopulation,
+        agent: Agent,
+        rate_map: RateMap | None = None,
+        dt: float = 1 / 60,
+    ):
+        super().__init__(model, agent)
+        self.rate_map = rate_map
+        self.dt = dt
+        self.use_lidar = model.lidar_weights is not None
+        self.rates = np.zeros(len(model))
+        self.goal = None
+        self.goal_rates = None
+        self.goal_position = None
+        self.goal_similarity = 0.95  # Fraction of the goal's own activity that counts as arrived
+        self.escape_steps = 10  # Steps to move straight on after turning away from a wall
+        self.escaping = 0
+
+    def set_goal(self, goal):
+        # The goal is represented by the population activity at that position
+        self.goal = goal
+        self.goal_rates = self.model.rates_at(*goal)
+        self.goal_rates /= np.linalg.norm(self.goal_rates) or 1.0
+        self.goal_position = self.model.decode(self.goal_rates)
+        self.running = True
+
+    def get_state(self):
+        # Rate arrays are replaced, never changed in place, so they can be shared;
+        # the rate map is a record of the run and is not part of the state
+        return (
+            self.running, self.rates, self.goal, self.goal_rates, self.goal_position, self.escaping
+        )
+
+    def set_state(self, state):
+        (
+            self.running, self.rates, self.goal, self.goal_rates, self.goal_position, self.escaping
+        ) = state
+
+    def handle_input(self):
+        lidar = self.agent.lidar_ranges if self.use_lidar and self.agent.lidar_ranges else None
+        self.rates = self.model.rates_at(self.agent.x, self.agent.y, lidar)
+        if self.rate_map is not None:
+            self.rate_map.add(self.agent.x, self.agent.y, self.rates, self.dt)
+
+    def similarity(self, rates):
+        # Cosine similarity between activity and the goal activity
+        norms = np.linalg.norm(rates, axis=-1)
+        return (rates @ self.goal_rates) / np.where(norms > 0, norms, 1.0)
+
+    def move_agent(self):
+        if not self.running:
+            return
+
+        agent = self.agent
+        if agent.bump_sensor:
+            agent.rotate_left()
+            self.escaping = self.escape_steps
+            return
+
+        if self.escaping:
+            # Get clear of the wall before following the activity again
+            self.escaping -= 1
+            agent.try_move(move_forward=True)
+            return
+
+        if self.goal_rates is None:
+            # Nothing to navigate to, just explore
+            agent.try_move(move_forward=True)
+            return
+
+        if self.similarity(self.rates) >= self.goal_similarity:
+            self.goal = None
+            self.goal_rates = None
+            self.goal_position = None
+            self.running = False
+            return
+
+        if not self.rates.any():
+            # Outside every field, so there is no position estimate to steer by
+            agent.try_move(move_forward=True)
+            return
+
+        # Head from where the population says the agent is to where it says the goal is
+        here_x, here_y = self.model.decode(self.rates)
+        goal_x, goal_y = self.goal_position
+        heading = math.degrees(math.atan2(here_y - goal_y, goal_x - here_x))
+        turn = (heading - agent.direction + 180) % 360 - 180
+
+        if turn > agent.angular_speed / 2:
+            agent.rotate_left()
+        elif turn < -agent.angular_speed / 2:
+            agent.rotate_right()
+        if abs(turn) < 45:
+            agent.try_move(move_forward=True)
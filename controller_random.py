@@ -1,11 +1,14 @@
+import numpy as np
+
 from controller import Controller
 from agent import Agent
-import random
 
 
 class ControllerRandom(Controller):
-    def __init__(self, model, agent: Agent):
+    def __init__(self, model, agent: Agent, rng: np.random.Generator | None = None):
         super().__init__(model, agent)
+        # Own random stream, see rng.stream; unseeded if none is given
+        self.rng = rng if rng is not None else np.random.default_rng()
         self.move = "same"
         self.choices = [direction for direction in range(0, 360, 45)]
         self.goal_direction = None
@@ -25,11 +28,11 @@ class ControllerRandom(Controller):
             return "same"
 
     def change_course(self, epsilon=0.05):
-        if random.random() > epsilon:
+        if self.rng.random() > epsilon:
             return
 
         direction = self.agent.direction
-        if random.random() > 0.5:
+        if self.rng.random() > 0.5:
             goal = self.choices[self.choices.index(direction) - 1]
         else:
             goal = self.choices[self.choices.index(direction) - 7]
@@ -37,10 +40,16 @@ class ControllerRandom(Controller):
         self.goal_direction = goal
         self.move = self.turn_direction(direction, goal)
 
+    def get_state(self):
+        return self.running, self.move, self.goal_direction, self.rng.bit_generator.state
+
+    def set_state(self, state):
+        self.running, self.move, self.goal_direction, self.rng.bit_generator.state = state
+
     def handle_input(self):
         if self.agent.bump_sensor:
             direction = self.agent.direction
-            goal = random.choice(self.choices)
+            goal = self.choices[self.rng.integers(len(self.choices))]
             self.goal_direction = goal
             self.move = self.turn_direction(direction, goal)
         else:
@@ -0,0 +1,209 @@
+import math
+
+import numpy as np
+
+from collision import ends_in_bounds, moves_hit_rects
+from lidar import wall_rects
+from shared_world import build_grids
+
+
+class ControllerRandomBatch:
+    """
+    The random walk of ControllerRandom for many independent agents at once.
+
+    Poses, bump sensors, goal directions and course changes of N walkers are
+    held in arrays and all advanced by one vectorized update(), which follows
+    ControllerRandom step for step: after a bump the walker turns towards a
+    random multiple of 45 degrees, otherwise it moves forward and, with
+    probability epsilon, sets off on a turn of 45 degrees left or right.
+    Moves are checked as in collision.free_moves, the batched form of
+    Agent.sweep, but only for walkers near a wall and only against the walls
+    near them: grids built once mark the cells from which no move can reach a
+    wall or the boundary, and list the walls a move from each other cell can
+    reach. Walkers do not collide with each other.
+
+    Turns never overshoot the goal direction, so headings that are not
+    multiples of the angular speed still settle on their goal.
+    """
+
+    CHOICES = np.arange(0, 360, 45, dtype=np.float64)
+
+    def __init__(
+        self,
+        poses,
+        rects: np.ndarray,
+        bounds: tuple,
+        body_radius: float = 20,
+        rng: np.random.Generator | None = None,
+        epsilon: float = 0.05,
+        resolution: float = 10.0,
+    ) -> None:
+        """
+        Initialize the ControllerRandomBatch.
+
+        Args:
+            poses (array-like): Starting poses (x, y, direction), shape (N, 3), free of walls.
+            rects (np.ndarray): Wall rectangles from lidar.wall_rects(), shape (W, 4).
+            bounds (tuple): (left, top, right, bottom) of the world.
+            body_radius (float, optional): Body radius of every walker. Defaults to 20.
+            rng (np.random.Generator, optional): Random stream, see rng.stream. Defaults to unseeded.
+            epsilon (float, optional): Chance per forward step of changing course. Defaults to 0.05.
+            resolution (float, optional): Cell size of the grid of cells clear of walls. Defaults to 10.
+        """
+        poses = np.asarray(poses, dtype=np.float64).reshape(-1, 3)
+        self.x = poses[:, 0].copy()
+        self.y = poses[:, 1].copy()
+        self.direction = poses[:, 2] % 360
+        self.bump_sensor = np.zeros(len(poses), dtype=bool)
+        self.goal_direction = np.zeros(len(poses))
+        self.has_goal = np.zeros(len(poses), dtype=bool)
+        self.rects = rects
+        self.bounds = bounds
+        self.body_radius = body_radius
+        self.linear_speed = 10  # As Agent
+        self.angular_speed = 5
+        self.epsilon = epsilon
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.running = True
+
+        # Cells where a body anywhere in the cell can make a full move without reaching a wall
+        reach = body_radius + self.linear_speed
+        _, distance = build_grids(rects, bounds, resolution, max_distance=2 * reach)
+        self.clear = distance > reach + resolution * math.sqrt(0.5)
+        self.resolution = resolution
+        self.cell_offsets, self.cell_walls = self.candidate_walls(reach)
+
+    @classmethod
+    def from_walls(cls, poses, walls: list, bounds: tuple, **kwargs) -> "ControllerRandomBatch":
+        """Create a batch for a world given as Wall objects."""
+        return cls(poses, wall_rects(walls), bounds, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    @property
+    def poses(self) -> np.ndarray:
+        """Current poses (x, y, direction), shape (N, 3)."""
+        return np.column_stack([self.x, self.y, self.direction])
+
+    def update(self) -> None:
+        """Advance every walker by one step."""
+        # A bump sets a new goal direction, as in ControllerRandom.handle_input
+        bumped = np.flatnonzero(self.bump_sensor)
+        if len(bumped):
+            self.goal_direction[bumped] = self.CHOICES[self.rng.integers(len(self.CHOICES), size=len(bumped))]
+            self.has_goal[bumped] = True
+        if not self.running:
+            return
+
+        # Walkers that bumped or have not reached their goal direction turn towards it
+        difference = (self.goal_direction - self.direction) % 360
+        difference[difference > 180] -= 360
+        turning = self.bump_sensor | (self.has_goal & (difference != 0))
+        turn = np.where(turning, np.clip(difference, -self.angular_speed, self.angular_speed), 0.0)
+        rotated = turn != 0
+        self.direction = (self.direction + turn) % 360
+        self.bump_sensor[rotated] = False
+        self.has_goal[turning & (difference == 0)] = False
+
+        # The others move forward, stopping with a bump if the move is blocked
+        forward = np.flatnonzero(~turning)
+        if not len(forward):
+            return
+        radians = np.radians(self.direction[forward])
+        dx = self.linear_speed * np.cos(radians)
+        dy = -self.linear_speed * np.sin(radians)
+        x, y = self.x[forward], self.y[forward]
+        cells = self.cells_at(x, y)
+        free = self.clear.ravel()[cells]
+        near = np.flatnonzero(~free)
+        if len(near):
+            free[near] = self.free_near(x[near], y[near], dx[near], dy[near], cells[near])
+        self.x[forward] = np.where(free, x + dx, x)
+        self.y[forward] = np.where(free, y + dy, y)
+        self.bump_sensor[forward] = ~free
+
+        # Chance to deviate direction, as in ControllerRandom.change_course
+        draws = self.rng.random((2, len(forward)))
+        change = forward[draws[0] <= self.epsilon]
+        if len(change):
+            side = np.where(draws[1][draws[0] <= self.epsilon] > 0.5, -45.0, 45.0)
+            self.goal_direction[change] = (self.direction[change] + side) % 360
+            self.has_goal[change] = True
+
+    def cells_at(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Flat index of the grid cell of each position, clamped to the grid."""
+        left, top, _, _ = self.bounds
+        rows, columns = self.clear.shape
+        column = np.clip(((x - left) // self.resolution).astype(np.intp), 0, columns - 1)
+        row = np.clip(((y - top) // self.resolution).astype(np.intp), 0, rows - 1)
+        return row * columns + column
+
+    def candidate_walls(self, reach: float) -> tuple[np.ndarray, np.ndarray]:
+        """
+        List the walls within reach of each cell that is not clear.
+
+        Returns:
+            tuple: Offsets, shape (cells + 1,), and wall indices, so the walls of
+                cell i are walls[offsets[i]:offsets[i + 1]].
+        """
+        left, top, _, _ = self.bounds
+        rows, columns = self.clear.shape
+        cells, walls = [], []
+        for index, (wall_left, wall_top, wall_right, wall_bottom) in enumerate(self.rects):
+            first_row = max(0, int((wall_top - reach - top) // self.resolution))
+            last_row = min(rows, math.ceil((wall_bottom + reach - top) / self.resolution))
+            first_column = max(0, int((wall_left - reach - left) // self.resolution))
+            last_column = min(columns, math.ceil((wall_right + reach - left) / self.resolution))
+            window = np.arange(first_row, last_row)[:, None] * columns + np.arange(first_column, last_column)
+            window = window[~self.clear.ravel()[window]]
+            cells.append(window)
+            walls.append(np.full(len(window), index, dtype=np.intp))
+        cells = np.concatenate(cells) if cells else np.empty(0, dtype=np.intp)
+        walls = np.concatenate(walls) if walls else np.empty(0, dtype=np.intp)
+        order = np.argsort(cells, kind="stable")
+        offsets = np.zeros(rows * columns + 1, dtype=np.intp)
+        np.cumsum(np.bincount(cells, minlength=rows * columns), out=offsets[1:])
+        return offsets, walls[order]
+
+    def free_near(self, x, y, dx, dy, cells) -> np.ndarray:
+        """Check moves from cells that are not clear against the bounds and the walls listed for their cells."""
+        free = ends_in_bounds(x + dx, y + dy, self.body_radius, self.bounds)
+        starts = self.cell_offsets[cells]
+        counts = self.cell_offsets[cells + 1] - starts
+        total = int(counts.sum())
+        if total:
+            # One (walker, wall) pair per candidate wall of each walker's cell
+            walker = np.repeat(np.arange(len(x)), counts)
+            wall = self.cell_walls[np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)]
+            hit = moves_hit_rects(x[walker], y[walker], dx[walker], dy[walker], self.body_radius, self.rects[wall])
+            free &= np.bincount(walker[hit], minlength=len(x)) == 0
+        return free
+
+    def run(self, steps: int) -> np.ndarray:
+        """
+        Advance every walker for a number of steps, recording their poses.
+
+        Returns:
+            np.ndarray: Pose of every walker after each step, shape (steps, N, 3).
+        """
+        poses = np.empty((steps, len(self), 3))
+        for step in range(steps):
+            self.update()
+            poses[step, :, 0] = self.x
+            poses[step, :, 1] = self.y
+            poses[step, :, 2] = self.direction
+        return poses
+
+    def get_state(self):
+        return (
+            self.running, self.x.copy(), self.y.copy(), self.direction.copy(), self.bump_sensor.copy(),
+            self.goal_direction.copy(), self.has_goal.copy(), self.rng.bit_generator.state,
+        )
+
+    def set_state(self, state):
+        running, x, y, direction, bump_sensor, goal_direction, has_goal, rng_state = state
+        self.running = running
+        self.x, self.y, self.direction = x.copy(), y.copy(), direction.copy()
+        self.bump_sensor, self.goal_direction, self.has_goal = bump_sensor.copy(), goal_direction.copy(), has_goal.copy()
+        self.rng.bit_generator.state = rng_state
@@ -0,0 +1,309 @@
+import math
+
+import numpy as np
+
+DEFAULT_SENSORS = ("lidar_mean", "lidar_min", "bump")
+
+
+class ArenaGrid:
+    """Divides the world into square bins, numbered row by row."""
+
+    def __init__(self, bounds: tuple, bin_size: float = 20.0) -> None:
+        """
+        Initialize the ArenaGrid.
+
+        Args:
+            bounds (tuple): (left, top, right, bottom) of the world.
+            bin_size (float, optional): Side of a square bin in world units. Defaults to 20.
+        """
+        self.bounds = tuple(bounds)
+        self.bin_size = bin_size
+        left, top, right, bottom = self.bounds
+        self.columns = max(1, math.ceil((right - left) / bin_size))
+        self.rows = max(1, math.ceil((bottom - top) / bin_size))
+        self.size = self.rows * self.columns
+
+    def bin_index(self, x: float, y: float) -> int:
+        """Flat bin index of one position; positions outside the world are clamped."""
+        left, top, _, _ = self.bounds
+        column = min(max(int((x - left) // self.bin_size), 0), self.columns - 1)
+        row = min(max(int((y - top) // self.bin_size), 0), self.rows - 1)
+        return row * self.columns + column
+
+    def bin_indices(self, positions) -> np.ndarray:
+        """Flat bin index of each position, shape (M,); positions outside the world are clamped."""
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        left, top, _, _ = self.bounds
+        columns = ((positions[:, 0] - left) // self.bin_size).astype(np.intp)
+        rows = ((positions[:, 1] - top) // self.bin_size).astype(np.intp)
+        np.clip(columns, 0, self.columns - 1, out=columns)
+        np.clip(rows, 0, self.rows - 1, out=rows)
+        return rows * self.columns + columns
+
+    def bin_centers(self) -> np.ndarray:
+        """World position of every bin centre, shape (size, 2)."""
+        left, top, _, _ = self.bounds
+        xs = left + (np.arange(self.columns) + 0.5) * self.bin_size
+        ys = top + (np.arange(self.rows) + 0.5) * self.bin_size
+        grid_x, grid_y = np.meshgrid(xs, ys)
+        return np.column_stack([grid_x.ravel(), grid_y.ravel()])
+
+    def wall_mask(self, walls: list) -> np.ndarray:
+        """Boolean mask of the bins whose centre lies inside a wall, shape (size,)."""
+        centers = self.bin_centers()
+        mask = np.zeros(self.size, dtype=bool)
+        for wall in walls:
+            rect = wall.rect
+            mask |= (
+                (centers[:, 0] >= rect.left)
+                & (centers[:, 0] < rect.right)
+                & (centers[:, 1] >= rect.top)
+                & (centers[:, 1] < rect.bottom)
+            )
+        return mask
+
+    def same_as(self, other: "ArenaGrid") -> bool:
+        return (self.bounds, self.bin_size) == (other.bounds, other.bin_size)
+
+
+class CoverageGrid:
+    """
+    Accumulates where agents have been over long runs.
+
+    For every bin it keeps the number of visits (entries into the bin), the
+    time spent there and the sums of per-step sensor readings, so the mean
+    reading in each bin can be mapped. A single step costs O(1) work, and
+    batches of steps or of many agents are added with np.bincount. LiDAR
+    statistics are worked out once per scan rather than once per step.
+    Grids filled in different processes can be saved and merged.
+    """
+
+    def __init__(self, bounds: tuple, bin_size: float = 20.0, sensors: tuple = DEFAULT_SENSORS) -> None:
+        """
+        Initialize the CoverageGrid.
+
+        Args:
+            bounds (tuple): (left, top, right, bottom) of the world.
+            bin_size (float, optional): Side of a square bin in world units. Defaults to 20.
+            sensors (tuple, optional): Names of the sensor readings averaged per bin.
+                Defaults to ("lidar_mean", "lidar_min", "bump").
+        """
+        self.grid = ArenaGrid(bounds, bin_size)
+        self.sensors = tuple(sensors)
+        self.visits = np.zeros(self.grid.size, dtype=np.int64)
+        self.dwell = np.zeros(self.grid.size)
+        self.samples = np.zeros(self.grid.size, dtype=np.int64)
+        self.sensor_sums = np.zeros((self.grid.size, len(self.sensors)))
+        self.reachable = np.ones(self.grid.size, dtype=bool)
+        self.last_bins: dict = {}  # Bin each agent was last seen in, to count entries
+        self.last_scans: dict = {}  # (ranges, mean, minimum) of each agent's latest scan
+
+    def exclude_walls(self, walls: list) -> None:
+        """Leave bins covered by walls out of the coverage and entropy figures."""
+        self.reachable &= ~self.grid.wall_mask(walls)
+
+    def read_sensors(self, agent, key=0) -> tuple:
+        """
+        The default sensor readings of an agent: mean and minimum LiDAR range and bump state.
+
+        Scans replace the agent's list of ranges, so the LiDAR statistics are
+        only worked out again when the list changes, not on every step.
+
+        Args:
+            agent (Agent): The agent to read.
+            key (optional): Identifies the agent, as in add(). Defaults to 0.
+
+        Returns:
+            tuple | None: One reading per default sensor, or None if the agent has not scanned yet.
+        """
+        ranges = agent.lidar_ranges
+        if not ranges:
+            # Nothing to read before the first scan, e.g. for an agent added between scans
+            return None
+        scan = self.last_scans.get(key)
+        if scan is None or scan[0] is not ranges:
+            scan = (ranges, sum(ranges) / len(ranges), min(ranges))
+            self.last_scans[key] = scan
+        return scan[1], scan[2], float(agent.bump_sensor)
+
+    def add(self, x: float, y: float, dt: float = 1.0, sensors=None, agent=0) -> None:
+        """
+        Add one step of one agent.
+
+        Args:
+            x (float): X-coordinate.
+            y (float): Y-coordinate.
+            dt (float, optional): Time spent at the position. Defaults to 1.
+            sensors (sequence, optional): One reading per sensor name.
+            agent (optional): Identifies the agent, so entries are counted per agent. Defaults to 0.
+        """
+        index = self.grid.bin_index(x, y)
+        if self.last_bins.get(agent) != index:
+            self.visits[index] += 1
+            self.last_bins[agent] = index
+        self.dwell[index] += dt
+        if sensors is not None:
+            self.samples[index] += 1
+            self.sensor_sums[index] += sensors
+
+    def add_agent(self, agent, dt: float = 1.0, key=0) -> None:
+        """Add one step at an agent's pose with its default sensor readings, if it has scanned."""
+        self.add(agent.x, agent.y, dt, self.read_sensors(agent, key), key)
+
+    def add_batch(self, positions, dt: float = 1.0, sensors=None, agents=None) -> None:
+        """
+        Add one step of many agents at once.
+
+        Args:
+            positions (array-like): Position of each agent, shape (M, 2).
+            dt (float, optional): Time spent at each position. Defaults to 1.
+            sensors (array-like, optional): Readings of each agent, shape (M, number of sensors).
+            agents (sequence, optional): Key of each agent. Defaults to 0..M-1.
+        """
+        indices = self.grid.bin_indices(positions)
+        agents = range(len(indices)) if agents is None else agents
+        previous = np.fromiter(
+            (self.last_bins.get(agent, -1) for agent in agents), dtype=np.intp, count=len(indices)
+        )
+        entered = indices[indices != previous]
+        self.visits += np.bincount(entered, minlength=self.grid.size)
+        self.last_bins.update(zip(agents, indices.tolist()))
+        self._add_samples(indices, dt, sensors)
+
+    def add_trajectory(self, positions, dt: float = 1.0, sensors=None, agent=0) -> None:
+        """
+        Add consecutive steps of one agent, e.g. a chunk of a recording.
+
+        Args:
+            positions (array-like): Positions in step order, shape (M, 2).
+            dt (float, optional): Time spent at each position. Defaults to 1.
+            sensors (array-like, optional): Readings at each step, shape (M, number of sensors).
+            agent (optional): Identifies the agent. Defaults to 0.
+        """
+        indices = self.grid.bin_indices(positions)
+        if not len(indices):
+            return
+        # A step enters a bin when it is in a different bin than the step before
+        previous = np.empty_like(indices)
+        previous[0] = self.last_bins.get(agent, -1)
+        previous[1:] = indices[:-1]
+        self.visits += np.bincount(indices[indices != previous], minlength=self.grid.size)
+        self.last_bins[agent] = int(indices[-1])
+        self._add_samples(indices, dt, sensors)
+
+    def _add_samples(self, indices, dt, sensors) -> None:
+        self.dwell += np.bincount(indices, minlength=self.grid.size) * dt
+        if sensors is None:
+            return
+        sensors = np.asarray(sensors, dtype=np.float64).reshape(len(indices), -1)
+        self.samples += np.bincount(indices, minlength=self.grid.size)
+        for channel in range(sensors.shape[1]):
+            self.sensor_sums[:, channel] += np.bincount(
+                indices, weights=sensors[:, channel], minlength=self.grid.size
+            )
+
+    def coverage(self) -> float:
+        """Percentage of the reachable bins that have been visited."""
+        reachable = self.reachable.sum()
+        if not reachable:
+            return 0.0
+        return 100.0 * np.count_nonzero(self.dwell[self.reachable]) / reachable
+
+    def entropy(self, normalized: bool = True) -> float:
+        """
+        Shannon entropy of the distribution of time over the reachable bins.
+
+        Args:
+            normalized (bool, optional): Divide by the entropy of a perfectly even
+                distribution, giving 0 (one bin) to 1 (all bins equally). Defaults to True.
+
+        Returns:
+            float: Entropy, in bits unless normalized.
+        """
+        dwell = self.dwell[self.reachable]
+        total = dwell.sum()
+        if total <= 0:
+            return 0.0
+        p = dwell[dwell > 0] / total
+        entropy = float(-(p * np.log2(p)).sum())
+        if normalized:
+            bins = len(dwell)
+            return entropy / math.log2(bins) if bins > 1 else 0.0
+        return entropy
+
+    def _as_map(self, values) -> np.ndarray:
+        return values.reshape(self.grid.rows, self.grid.columns)
+
+    def visit_map(self) -> np.ndarray:
+        """Entries into each bin, shape (rows, columns)."""
+        return self._as_map(self.visits)
+
+    def dwell_map(self) -> np.ndarray:
+        """Time spent in each bin, shape (rows, columns)."""
+        return self._as_map(self.dwell)
+
+    def sensor_map(self, name: str) -> np.ndarray:
+        """Mean reading of a sensor in each bin, NaN where it was never read, shape (rows, columns)."""
+        channel = self.sensors.index(name)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = self.sensor_sums[:, channel] / self.samples
+        return self._as_map(means)
+
+    def merge(self, other: "CoverageGrid") -> None:
+        """Add in the data accumulated by another grid over the same world and bins."""
+        if not self.grid.same_as(other.grid) or self.sensors != other.sensors:
+            raise ValueError("Coverage grids must have the same bounds, bins and sensors to merge")
+        self.visits += other.visits
+        self.dwell += other.dwell
+        self.samples += other.samples
+        self.sensor_sums += other.sensor_sums
+        self.reachable &= other.reachable
+
+    def save(self, filename: str) -> None:
+        """Save the accumulated data to an .npz file, e.g. from a worker process."""
+        np.savez_compressed(
+            filename,
+            bounds=np.asarray(self.grid.bounds, dtype=np.float64),
+            bin_size=self.grid.bin_size,
+            sensors=np.asarray(self.sensors),
+            visits=self.visits,
+            dwell=self.dwell,
+            samples=self.samples,
+            sensor_sums=self.sensor_sums,
+            reachable=self.reachable,
+        )
+
+    @classmethod
+    def load(cls, filename: str) -> "CoverageGrid":
+        """Load a grid saved with save()."""
+        with np.load(filename) as data:
+            bounds = tuple(value.item() for value in data["bounds"])
+            grid = cls(bounds, data["bin_size"].item(), tuple(str(name) for name in data["sensors"]))
+            grid.visits[:] = data["visits"]
+            grid.dwell[:] = data["dwell"]
+            grid.samples[:] = data["samples"]
+            grid.sensor_sums[:] = data["sensor_sums"]
+            grid.reachable[:] = data["reachable"]
+        return grid
+
+    @classmethod
+    def merge_files(cls, filenames: list) -> "CoverageGrid":
+        """
+        Combine grids saved by several processes into one.
+
+        Args:
+            filenames (list): Files written by save(), all over the same grid.
+
+        Returns:
+            CoverageGrid: The merged grid.
+        """
+        merged = None
+        for filename in filenames:
+            grid = cls.load(filename)
+            if merged is None:
+                merged = grid
+            else:
+                merged.merge(grid)
+        if merged is None:
+            raise ValueError("No coverage files to merge")
+        return merged
@@ -0,0 +1,331 @@
+"""
+Build datasets of (pose, LiDAR scan) samples over a world, in parallel.
+
+Usage:
+    python dataset_builder.py worlds/test1.json datasets/test1 --samples 1000000
+    python dataset_builder.py worlds/test1.json datasets/test1_walks --mode trajectory --workers 8
+
+Samples are written in shards of --shard-size samples as shard_<index>.npz,
+each holding "poses" (x, y, direction) and "scans" arrays, and listed in
+manifest.json. Running the same command again skips shards that are already
+complete, so an interrupted build resumes where it stopped. The world is
+published once in shared memory (see shared_world.py) and every worker
+attaches to it, instead of each one loading the world file again.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from controller_random_batch import ControllerRandomBatch
+from lidar import LidarModel, free_positions
+from shared_world import SharedWorld
+from world import load_world
+
+MODES = ("uniform", "stratified", "trajectory")
+MANIFEST = "manifest.json"
+
+
+def sample_uniform(rng, count: int, radius: float, rects, bounds: tuple) -> np.ndarray:
+    """
+    Draw collision-free poses uniformly over the world by rejection sampling.
+
+    Returns:
+        np.ndarray: Poses (x, y, direction), shape (count, 3).
+    """
+    left, top, right, bottom = bounds
+    poses = []
+    found = 0
+    while found < count:
+        batch = max(1024, 2 * (count - found))
+        positions = rng.uniform((left, top), (right, bottom), size=(batch, 2))
+        positions = positions[free_positions(positions, radius, rects, bounds)][: count - found]
+        directions = rng.uniform(0, 360, size=len(positions))
+        poses.append(np.column_stack([positions, directions]))
+        found += len(positions)
+    return np.concatenate(poses)
+
+
+def sample_stratified(rng, count: int, radius: float, rects, bounds: tuple) -> np.ndarray:
+    """
+    Draw collision-free poses spread evenly over free space.
+
+    The world is split into a grid of about count cells and one jittered
+    position is drawn per cell, so samples cover the free space more evenly
+    than uniform sampling. Cells that turn out to be blocked are topped up
+    with uniform samples.
+
+    Returns:
+        np.ndarray: Poses (x, y, direction), shape (count, 3).
+    """
+    left, top, right, bottom = bounds
+    width, height = right - left, bottom - top
+    cell = np.sqrt(width * height / count)
+    columns = max(1, int(np.ceil(width / cell)))
+    rows = max(1, int(np.ceil(height / cell)))
+    grid_x, grid_y = np.meshgrid(np.arange(columns), np.arange(rows))
+    corners = np.column_stack([grid_x.ravel(), grid_y.ravel()])
+    positions = (corners + rng.uniform(size=corners.shape)) * (width / columns, height / rows)
+    positions += (left, top)
+    positions = positions[free_positions(positions, radius, rects, bounds)]
+    rng.shuffle(positions)
+    positions = positions[:count]
+
+    # Stratified directions as well, shuffled independently of the positions
+    directions = (np.arange(len(positions)) + rng.uniform(size=len(positions))) * (360 / max(1, len(positions)))
+    rng.shuffle(directions)
+    poses = np.column_stack([positions, directions])
+    if len(poses) < count:
+        poses = np.concatenate([poses, sample_uniform(rng, count - len(poses), radius, rects, bounds)])
+    return poses
+
+
+def sample_trajectory(
+    rng, count: int, radius: float, rects, bounds: tuple, walk_length: int = 1000
+) -> np.ndarray:
+    """
+    Record poses along random-walk trajectories driven by ControllerRandomBatch.
+
+    Each walk starts at a random collision-free pose and runs for walk_length
+    steps, and all walks of the shard run side by side. The walk only uses
+    the bump sensor, so it needs no scans; those are computed in batches afterwards.
+
+    Returns:
+        np.ndarray: Poses (x, y, direction), shape (count, 3), one walk after another.
+    """
+    num_walks = -(-count // walk_length)
+    starts = sample_uniform(rng, num_walks, radius, rects, bounds)
+    # Headings on the walk's 45 degree choices, as ControllerRandom starts out
+    starts[:, 2] = 45 * rng.integers(8, size=num_walks)
+    # Walks draw from the shard's stream, so shards are the same in any worker
+    controller = ControllerRandomBatch(starts, rects, bounds, body_radius=radius, rng=rng)
+    poses = controller.run(min(walk_length, count))
+    return poses.transpose(1, 0, 2).reshape(-1, 3)[:count]
+
+
+def build_shard(world_info: dict, options: dict, index: int, seed_state: list, count: int) -> dict:
+    """
+    Generate one shard of samples and write it to disk. Runs in a worker process.
+
+    Args:
+        world_info (dict): Info of the SharedWorld the world was published in.
+        options (dict): Build options: output, mode, radius, num_beams, max_range, batch_size.
+        index (int): Shard index.
+        seed_state (list): Entropy of the shard's SeedSequence, so shards are reproducible.
+        count (int): Number of samples in the shard.
+
+    Returns:
+        dict: Manifest entry of the shard.
+    """
+    started = time.perf_counter()
+    world = SharedWorld.attach(world_info)
+    rects = world.rects
+    bounds = world.bounds
+    lidar = LidarModel(world.segments, num_beams=options["num_beams"], max_range=options["max_range"])
+    rng = np.random.default_rng(np.random.SeedSequence(seed_state))
+    radius = options["radius"]
+
+    mode = options["mode"]
+    if mode == "uniform":
+        poses = sample_uniform(rng, count, radius, rects, bounds)
+    elif mode == "stratified":
+        poses = sample_stratified(rng, count, radius, rects, bounds)
+    else:
+        poses = sample_trajectory(rng, count, radius, rects, bounds, options["walk_length"])
+
+    scans = np.empty((count, options["num_beams"]), dtype=np.float32)
+    batch_size = options["batch_size"]
+    for start in range(0, count, batch_size):
+        scans[start : start + batch_size] = lidar.scan_batch(poses[start : start + batch_size])
+
+    # Write under a temporary name first, so a shard file on disk is always complete
+    name = f"shard_{index:05d}.npz"
+    path = os.path.join(options["output"], name)
+    temporary = path + ".tmp.npz"
+    np.savez(temporary, poses=poses.astype(np.float32), scans=scans)
+    os.replace(temporary, path)
+    return {"file": name, "count": count, "seconds": time.perf_counter() - started}
+
+
+def write_manifest(output: str, manifest: dict) -> None:
+    """Write the manifest atomically, so an interrupted build never leaves it half written."""
+    path = os.path.join(output, MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def load_manifest(output: str, settings: dict) -> dict:
+    """
+    Load the manifest of a previous build with the same settings, or start a new one.
+
+    Raises:
+        ValueError: If the output directory holds a build with different settings.
+    """
+    path = os.path.join(output, MANIFEST)
+    if not os.path.exists(path):
+        return {**settings, "shards": {}}
+    with open(path, "r") as f:
+        manifest = json.load(f)
+    previous = {key: manifest.get(key) for key in settings}
+    if previous != settings:
+        raise ValueError(f"{output} holds a dataset built with different settings: {previous}")
+    # Only trust shards whose files are still there
+    manifest["shards"] = {
+        index: entry
+        for index, entry in manifest["shards"].items()
+        if os.path.exists(os.path.join(output, entry["file"]))
+    }
+    return manifest
+
+
+def build_dataset(
+    world_file: str,
+    output: str,
+    samples: int,
+    shard_size: int = 10000,
+    mode: str = "uniform",
+    workers: int | None = None,
+    seed: int = 0,
+    num_beams: int = 360,
+    max_range: float = 2000.0,
+    radius: float | None = None,
+    walk_length: int = 1000,
+    batch_size: int = 256,
+) -> dict:
+    """
+    Build a sharded dataset of poses and LiDAR scans, resuming a previous build if there is one.
+
+    Args:
+        world_file (str): World JSON file.
+        output (str): Directory for the shards and manifest.
+        samples (int): Total number of samples.
+        shard_size (int, optional): Samples per shard. Defaults to 10000.
+        mode (str, optional): "uniform", "stratified" or "trajectory". Defaults to "uniform".
+        workers (int, optional): Worker processes. Defaults to the number of CPUs.
+        seed (int, optional): Seed of the whole build; every shard gets its own stream. Defaults to 0.
+        num_beams (int, optional): LiDAR beams per scan. Defaults to 360.
+        max_range (float, optional): LiDAR range. Defaults to 2000.
+        radius (float, optional): Agent body radius. Defaults to the world's agent radius.
+        walk_length (int, optional): Steps per random walk in trajectory mode. Defaults to 1000.
+        batch_size (int, optional): Poses scanned per vectorized batch. Defaults to 256.
+
+    Returns:
+        dict: The manifest.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode {mode!r}, expected one of {MODES}")
+    if radius is None:
+        _, agent_data, _ = load_world(world_file)
+        radius = agent_data.get("radius", 20) if agent_data else 20
+
+    os.makedirs(output, exist_ok=True)
+    settings = {
+        "world": world_file,
+        "mode": mode,
+        "samples": samples,
+        "shard_size": shard_size,
+        "seed": seed,
+        "num_beams": num_beams,
+        "max_range": max_range,
+        "radius": radius,
+        "walk_length": walk_length,
+    }
+    manifest = load_manifest(output, settings)
+    options = {
+        "output": output,
+        "mode": mode,
+        "radius": radius,
+        "num_beams": num_beams,
+        "max_range": max_range,
+        "walk_length": walk_length,
+        "batch_size": batch_size,
+    }
+
+    num_shards = -(-samples // shard_size)
+    seeds = np.random.SeedSequence(seed).spawn(num_shards)
+    pending = [index for index in range(num_shards) if str(index) not in manifest["shards"]]
+    if not pending:
+        return manifest
+    print(f"Building {len(pending)} of {num_shards} shards", file=sys.stderr)
+
+    with SharedWorld.from_file(world_file) as world, ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(
+                build_shard,
+                world.info,
+                options,
+                index,
+                seeds[index].generate_state(4).tolist(),
+                min(shard_size, samples - index * shard_size),
+            ): index
+            for index in pending
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            index = futures[future]
+            manifest["shards"][str(index)] = future.result()
+            write_manifest(output, manifest)
+            print(f"\rShard {done}/{len(pending)} done", end="", file=sys.stderr)
+    print(file=sys.stderr)
+    return manifest
+
+
+def load_dataset(output: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Load every shard of a dataset into memory, in shard order.
+
+    Returns:
+        tuple: (poses, scans) arrays.
+    """
+    with open(os.path.join(output, MANIFEST), "r") as f:
+        manifest = json.load(f)
+    poses, scans = [], []
+    for index in sorted(manifest["shards"], key=int):
+        with np.load(os.path.join(output, manifest["shards"][index]["file"])) as shard:
+            poses.append(shard["poses"])
+            scans.append(shard["scans"])
+    return np.concatenate(poses), np.concatenate(scans)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("world", help="world JSON file")
+    parser.add_argument("output", help="output directory")
+    parser.add_argument("--samples", type=int, default=100000)
+    parser.add_argument("--shard-size", type=int, default=10000)
+    parser.add_argument("--mode", choices=MODES, default="uniform")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all CPUs)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--beams", type=int, default=360)
+    parser.add_argument("--max-range", type=float, default=2000.0)
+    parser.add_argument("--radius", type=float, default=None, help="agent radius (default: the world's agent)")
+    parser.add_argument("--walk-length", type=int, default=1000, help="steps per walk in trajectory mode")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    manifest = build_dataset(
+        args.world,
+        args.output,
+        args.samples,
+        shard_size=args.shard_size,
+        mode=args.mode,
+        workers=args.workers,
+        seed=args.seed,
+        num_beams=args.beams,
+        max_range=args.max_range,
+        radius=args.radius,
+        walk_length=args.walk_length,
+    )
+    elapsed = time.perf_counter() - started
+    total = sum(entry["count"] for entry in manifest["shards"].values())
+    print(f"{total} samples in {len(manifest['shards'])} shards, {elapsed:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,16 @@
 # %%
 import pygame
-import json
 import math
 import sys
 from tkinter import Tk, filedialog
 from wall import Wall
 from button import Button
+from camera import Camera
 from constants import *
+from spatial_hash import SpatialHash
 from text_input import TextInput
 from agent import Agent
+from world import load_world, save_world
 
 pygame.init()
 
@@ -24,6 +26,12 @@ text_inputs = {
     "height": TextInput(1000, 260, 150, 30, ""),
 }
 
+# Create text inputs for the world size
+bounds_inputs = {
+    "width": TextInput(1000, 420, 150, 30, ""),
+    "height": TextInput(1000, 490, 150, 30, ""),
+}
+
 
 def apply_wall_properties():
     global selected_wall, selected_agent
@@ -49,16 +57,18 @@ def apply_wall_properties():
             selected_wall.rect.height = height
 
             # Check boundaries
+            left, top, right, bottom = world_bounds
             if (
-                selected_wall.rect.left < LEFT_BOUNDARY
-                or selected_wall.rect.right > RIGHT_BOUNDARY
-                or selected_wall.rect.top < TOP_BOUNDARY
-                or selected_wall.rect.bottom > BOTTOM_BOUNDARY
+                selected_wall.rect.left < left
+                or selected_wall.rect.right > right
+                or selected_wall.rect.top < top
+                or selected_wall.rect.bottom > bottom
                 or width < 10
                 or height < 10
             ):  # Minimum size constraints
                 # Revert if outside boundaries
                 selected_wall.rect = original_rect
+            wall_index.update_rect(selected_wall, selected_wall.rect)
         except ValueError:
             pass  # Handle invalid input gracefully
     elif selected_agent:
@@ -77,9 +87,10 @@ def apply_wall_properties():
             )  # Using height field for rotation
 
             # Validate and apply new values
+            left, top, right, bottom = world_bounds
             if (
-                LEFT_BOUNDARY + radius <= x <= RIGHT_BOUNDARY - radius
-                and TOP_BOUNDARY + radius <= y <= BOTTOM_BOUNDARY - radius
+                left + radius <= x <= right - radius
+                and top + radius <= y <= bottom - radius
                 and radius >= 10
             ):  # Minimum radius constraint
 
@@ -102,13 +113,47 @@ def apply_wall_properties():
             pass  # Handle invalid input gracefully
 
 
+def apply_world_size():
+    global world_bounds
+    try:
+        width = int(bounds_inputs["width"].text)
+        height = int(bounds_inputs["height"].text)
+    except ValueError:
+        return  # Handle invalid input gracefully
+
+    left, top = world_bounds[0], world_bounds[1]
+    new_bounds = (left, top, left + width, top + height)
+    if width < 100 or height < 100:
+        return
+
+    # Only resize if everything still fits inside the new bounds
+    for wall in walls:
+        if wall.rect.right > new_bounds[2] or wall.rect.bottom > new_bounds[3]:
+            return
+    if agent and (
+        agent.x + agent.body_radius > new_bounds[2]
+        or agent.y + agent.body_radius > new_bounds[3]
+    ):
+        return
+
+    world_bounds = new_bounds
+    camera.set_bounds(world_bounds)
+    if agent:
+        agent.bounds = world_bounds
+
+
 # Screen setup
 screen = pygame.display.set_mode((1200, 600))
 pygame.display.set_caption("World Editor")
 selected_wall = None
 copied_wall = None
 is_dragging = False
+drag_offset = (0, 0)
 walls = []
+world_bounds = DEFAULT_WORLD_BOUNDS
+wall_index = SpatialHash()
+camera = Camera(VIEWPORT_RECT, world_bounds)
+shown_world_size = None
 
 
 def save_environment():
@@ -118,60 +163,55 @@ def save_environment():
         defaultextension=".json", filetypes=[("JSON files", "*.json")]
     )
     if filename:
-        world_data = {
-            "walls": [{"wall": wall.to_dict()} for wall in walls],
-            "agent": (
-                {
-                    "agent": {
-                        "x": agent.x,
-                        "y": agent.y,
-                        "direction": agent.direction,
-                        "radius": agent.body_radius,
-                    }
-                }
-                if agent
-                else None
-            ),
-        }
-        with open(filename, "w") as f:
-            json.dump(world_data, f)
+        save_world(filename, walls, agent, world_bounds)
     root.destroy()
 
 
 def load_environment():
-    global walls, agent
+    global walls, agent, world_bounds, wall_index, selected_wall, selected_agent
     root = Tk()
     root.withdraw()
     filename = filedialog.askopenfilename(
         defaultextension=".json", filetypes=[("JSON files", "*.json")]
     )
     if filename:
-        with open(filename, "r") as f:
-            world_data = json.load(f)
-            # Load walls
-            walls = [
-                Wall.from_dict(wall_data["wall"]) for wall_data in world_data["walls"]
-            ]
-            # Load agent if it exists
-            if world_data["agent"]:
-                agent_data = world_data["agent"]["agent"]
-                agent = Agent(
-                    agent_data["x"],
-                    agent_data["y"],
-                    agent_data["direction"],
-                    walls,
-                    body_radius=agent_data["radius"],
-                )
-            else:
-                agent = None
+        walls, agent_data, world_bounds = load_world(filename)
+        wall_index = SpatialHash.from_walls(walls)
+        camera.set_bounds(world_bounds)
+        camera.reset()
+        selected_wall = None
+        selected_agent = None
+        # Load agent if it exists
+        if agent_data:
+            agent = Agent(
+                agent_data["x"],
+                agent_data["y"],
+                agent_data["direction"],
+                walls,
+                body_radius=agent_data["radius"],
+                bounds=world_bounds,
+            )
+        else:
+            agent = None
     root.destroy()
 
 
 def reset_world():
-    global walls, agent, selected_agent
+    global walls, agent, selected_agent, selected_wall
     walls = []
+    wall_index.clear()
     agent = None
     selected_agent = None
+    selected_wall = None
+
+
+def view_origin():
+    """Top-left corner of the visible part of the world, clamped into the world."""
+    view_left, view_top, _, _ = camera.visible_world_rect()
+    return (
+        max(world_bounds[0], min(int(view_left), world_bounds[2] - 100)),
+        max(world_bounds[1], min(int(view_top), world_bounds[3] - 100)),
+    )
 
 
 def delete_agent():
@@ -184,13 +224,19 @@ def delete_selected_wall():
     global walls, selected_wall
     if selected_wall:
         walls.remove(selected_wall)
+        wall_index.remove(selected_wall)
         selected_wall = None
 
 
 def spawn_agent():
     global agent, selected_agent
     if agent is None:
-        agent = Agent(400, 300, 0, walls)
+        # Spawn in the middle of the current view
+        view_left, view_top, view_right, view_bottom = camera.visible_world_rect()
+        left, top, right, bottom = world_bounds
+        x = max(left + 20, min((view_left + view_right) / 2, right - 20))
+        y = max(top + 20, min((view_top + view_bottom) / 2, bottom - 20))
+        agent = Agent(x, y, 0, walls, bounds=world_bounds)
         selected_agent = None  # Reset selected agent when spawning new one
 
 
@@ -198,7 +244,13 @@ def handle_mouse_events(event):
     # Handle text input events
     for text_input in text_inputs.values():
         text_input.handle_event(event)
-    global selected_wall, copied_wall, is_dragging, selected_agent, agent
+    for text_input in bounds_inputs.values():
+        text_input.handle_event(event)
+    global selected_wall, copied_wall, is_dragging, selected_agent, agent, drag_offset
+    if camera.handle_event(event):
+        return
+    # Handle sizes are in screen pixels, so convert them into world units
+    handle_scale = 1 / camera.zoom
     if event.type == pygame.MOUSEBUTTONDOWN:
         is_dragging = False
         for button in buttons:
@@ -206,9 +258,13 @@ def handle_mouse_events(event):
                 button.action()
                 return
 
+        if not camera.contains(event.pos):
+            return
+        world_pos = camera.screen_to_world(event.pos)
+
         # Check for agent selection and handles
         if agent:
-            mouse_x, mouse_y = event.pos
+            mouse_x, mouse_y = world_pos
 
             # Check if clicking on agent body
             distance = math.sqrt((mouse_x - agent.x) ** 2 + (mouse_y - agent.y) ** 2)
@@ -224,7 +280,7 @@ def handle_mouse_events(event):
                     (agent.x, agent.y - agent.body_radius),  # Top
                 ]
                 for point in resize_points:
-                    if math.dist((mouse_x, mouse_y), point) < 8:
+                    if math.dist((mouse_x, mouse_y), point) < 8 * handle_scale:
                         clicking_handle = True
                         break
 
@@ -236,7 +292,10 @@ def handle_mouse_events(event):
                 rotation_y = agent.y + rotation_length * math.sin(
                     math.radians(agent.direction - 90)
                 )
-                if math.dist((mouse_x, mouse_y), (rotation_x, rotation_y)) < 11:
+                if (
+                    math.dist((mouse_x, mouse_y), (rotation_x, rotation_y))
+                    < 11 * handle_scale
+                ):
                     clicking_handle = True
 
             # Select or deselect based on where we clicked
@@ -249,11 +308,12 @@ def handle_mouse_events(event):
             else:
                 selected_agent = None
         for wall in walls:
-            if wall.rect.collidepoint(event.pos):
+            if wall.rect.collidepoint(world_pos):
                 wall.selected = True
                 selected_wall = wall
+                drag_offset = (world_pos[0] - wall.rect.x, world_pos[1] - wall.rect.y)
                 for handle, direction in zip(
-                    wall.get_handles(),
+                    wall.get_handles(camera),
                     [
                         "top-left",
                         "top-right",
@@ -281,10 +341,12 @@ def handle_mouse_events(event):
             agent.is_rotating = False
         is_dragging = False
     elif event.type == pygame.MOUSEMOTION:
+        world_pos = camera.screen_to_world(event.pos)
         if selected_wall and selected_wall.resizing:
-            selected_wall.handle_resize(event.pos)
+            selected_wall.handle_resize(world_pos, world_bounds)
+            wall_index.update_rect(selected_wall, selected_wall.rect)
         elif selected_agent and event.buttons[0]:
-            mouse_x, mouse_y = event.pos
+            mouse_x, mouse_y = world_pos
 
             # Check for rotation handle
             rotation_length = agent.body_radius + 40
@@ -310,10 +372,12 @@ def handle_mouse_events(event):
 
             # Track if we're near any special handles
             near_rotation_handle = (
-                math.dist((mouse_x, mouse_y), (rotation_x, rotation_y)) < 11
+                math.dist((mouse_x, mouse_y), (rotation_x, rotation_y))
+                < 11 * handle_scale
             )
             near_resize_handle = any(
-                math.dist((mouse_x, mouse_y), point) < 8 for point in resize_points
+                math.dist((mouse_x, mouse_y), point) < 8 * handle_scale
+                for point in resize_points
             )
 
             # If we're near the rotation handle or already rotating
@@ -327,19 +391,18 @@ def handle_mouse_events(event):
                 agent.direction = angle % 360
 
             # If near resize handles
-            elif any(
-                math.dist((mouse_x, mouse_y), point) < 8 for point in resize_points
-            ):
+            elif near_resize_handle:
                 # Calculate distance from agent center to mouse
                 new_radius = math.dist((mouse_x, mouse_y), (agent.x, agent.y))
                 new_radius = max(10, min(new_radius, 50))  # Clamp between 10 and 50
 
                 # Check if new radius would cause collision or go out of bounds
+                left, top, right, bottom = world_bounds
                 if (
-                    agent.x - new_radius >= LEFT_BOUNDARY
-                    and agent.x + new_radius <= RIGHT_BOUNDARY
-                    and agent.y - new_radius >= TOP_BOUNDARY
-                    and agent.y + new_radius <= BOTTOM_BOUNDARY
+                    agent.x - new_radius >= left
+                    and agent.x + new_radius <= right
+                    and agent.y - new_radius >= top
+                    and agent.y + new_radius <= bottom
                 ):
                     # Check for wall collisions with new radius
                     can_resize = True
@@ -358,13 +421,14 @@ def handle_mouse_events(event):
                 new_y = mouse_y
 
                 # Ensure agent stays within boundaries
+                left, top, right, bottom = world_bounds
                 new_x = max(
-                    LEFT_BOUNDARY + agent.body_radius,
-                    min(RIGHT_BOUNDARY - agent.body_radius, new_x),
+                    left + agent.body_radius,
+                    min(right - agent.body_radius, new_x),
                 )
                 new_y = max(
-                    TOP_BOUNDARY + agent.body_radius,
-                    min(BOTTOM_BOUNDARY - agent.body_radius, new_y),
+                    top + agent.body_radius,
+                    min(bottom - agent.body_radius, new_y),
                 )
 
             # Check for wall collisions
@@ -386,20 +450,22 @@ def handle_mouse_events(event):
             original_x = selected_wall.rect.x
             original_y = selected_wall.rect.y
 
-            # Try to move
-            selected_wall.rect.x += event.rel[0]
-            selected_wall.rect.y += event.rel[1]
+            # Try to move, keeping the point that was grabbed under the mouse
+            selected_wall.rect.x = round(world_pos[0] - drag_offset[0])
+            selected_wall.rect.y = round(world_pos[1] - drag_offset[1])
 
             # Check boundaries
+            left, top, right, bottom = world_bounds
             if (
-                selected_wall.rect.left < LEFT_BOUNDARY
-                or selected_wall.rect.right > RIGHT_BOUNDARY
-                or selected_wall.rect.top < TOP_BOUNDARY
-                or selected_wall.rect.bottom > BOTTOM_BOUNDARY
+                selected_wall.rect.left < left
+                or selected_wall.rect.right > right
+                or selected_wall.rect.top < top
+                or selected_wall.rect.bottom > bottom
             ):
                 # Revert if outside boundaries
                 selected_wall.rect.x = original_x
                 selected_wall.rect.y = original_y
+            wall_index.update_rect(selected_wall, selected_wall.rect)
 
 
 def handle_keyboard_events(event):
@@ -413,8 +479,7 @@ def handle_keyboard_events(event):
                 selected_wall.rect.height,
             )
         elif event.key == pygame.K_v and copied_wall:
-            new_wall = Wall(0, 0, copied_wall.rect.width, copied_wall.rect.height)
-            walls.append(new_wall)
+            paste_wall()
         elif event.key == pygame.K_s:
             save_environment()
         elif event.key == pygame.K_l:
@@ -422,14 +487,18 @@ def handle_keyboard_events(event):
 
 
 def spawn_wall():
-    new_wall = Wall(100, 100, 50, 50)
+    x, y = view_origin()
+    new_wall = Wall(x + 100, y + 100, 50, 50)
     walls.append(new_wall)
+    wall_index.insert_rect(new_wall, new_wall.rect)
 
 
 def paste_wall():
     if copied_wall:
-        new_wall = Wall(0, 0, copied_wall.rect.width, copied_wall.rect.height)
+        x, y = view_origin()
+        new_wall = Wall(x, y, copied_wall.rect.width, copied_wall.rect.height)
         walls.append(new_wall)
+        wall_index.insert_rect(new_wall, new_wall.rect)
 
 
 def copy_wall():
@@ -465,6 +534,7 @@ buttons = [
     Button(850, 410, 120, 50, "Load World", load_environment),
     Button(850, 470, 120, 50, "Spawn Agent", spawn_agent),
     Button(850, 530, 120, 50, "Delete Agent", delete_agent),
+    Button(1000, 540, 150, 50, "Set World Size", apply_world_size),
 ]
 
 # Main game loop
@@ -479,25 +549,24 @@ while running:
     # Fill the screen with a white color
     screen.fill(WHITE)
 
-    # Draw the left half as the navigation area
+    # Keep world drawing inside the left panel
+    screen.set_clip(camera.viewport)
+
+    # Draw the world bounds as the navigation area
+    left, top, right, bottom = world_bounds
     pygame.draw.rect(
         screen,
         GRAY,
-        (
-            LEFT_BOUNDARY,
-            TOP_BOUNDARY,
-            RIGHT_BOUNDARY - LEFT_BOUNDARY,
-            BOTTOM_BOUNDARY - TOP_BOUNDARY,
-        ),
+        camera.world_rect_to_screen(pygame.Rect(left, top, right - left, bottom - top)),
     )
 
-    # Draw the walls
-    for wall in walls:
-        wall.draw(screen, draw_center=True)
+    # Draw only the walls inside the visible part of the world
+    for wall in wall_index.query(*camera.visible_world_rect()):
+        wall.draw(screen, draw_center=True, camera=camera)
 
     # Draw the agent if it exists
     if agent:
-        agent.draw(screen)
+        agent.draw(screen, camera)
         # Draw resize and rotation handles if selected
         if selected_agent:
             # Draw resize circles at cardinal points
@@ -508,6 +577,7 @@ while running:
                 (agent.x, agent.y - agent.body_radius),  # Top
             ]
             for point in resize_points:
+                point = camera.world_to_screen(*point)
                 pygame.draw.circle(screen, BLACK, (int(point[0]), int(point[1])), 5)
                 # Draw a slightly larger highlight circle
                 pygame.draw.circle(screen, BLACK, (int(point[0]), int(point[1])), 8, 1)
@@ -520,14 +590,21 @@ while running:
             rotation_y = agent.y - rotation_length * math.cos(
                 math.radians(agent.direction)
             )
+            rotation_x, rotation_y = camera.world_to_screen(rotation_x, rotation_y)
             # Draw line from agent center to rotation handle
             pygame.draw.line(
-                screen, BLACK, (agent.x, agent.y), (rotation_x, rotation_y), 2
+                screen,
+                BLACK,
+                camera.world_to_screen(agent.x, agent.y),
+                (rotation_x, rotation_y),
+                2,
             )
             # Draw rotation handle circle with highlight
             pygame.draw.circle(screen, BLACK, (int(rotation_x), int(rotation_y)), 8)
             pygame.draw.circle(screen, BLACK, (int(rotation_x), int(rotation_y)), 11, 1)
 
+    screen.set_clip(None)
+
     # Draw the buttons
     for button in buttons:
         if button.text == "Paste Wall":
@@ -551,6 +628,22 @@ while running:
         text_surface = font.render(label, True, BLACK)
         screen.blit(text_surface, (1000, y_pos))
 
+    # Draw world size labels and keep the inputs in sync when not being edited
+    for label, y_pos in zip(["World Width:", "World Height:"], [400, 470]):
+        text_surface = font.render(label, True, BLACK)
+        screen.blit(text_surface, (1000, y_pos))
+    world_size = {
+        "width": world_bounds[2] - world_bounds[0],
+        "height": world_bounds[3] - world_bounds[1],
+    }
+    if world_size != shown_world_size:
+        shown_world_size = world_size
+        for key, text_input in bounds_inputs.items():
+            text_input.text = str(world_size[key])
+            text_input.txt_surface = text_input.font.render(
+                text_input.text, True, text_input.color
+            )
+
     # Update text inputs with wall properties only when not active
     if selected_wall:
         for key, text_input in text_inputs.items():
@@ -576,7 +669,7 @@ while running:
                 )
 
     # Draw text inputs
-    for text_input in text_inputs.values():
+    for text_input in list(text_inputs.values()) + list(bounds_inputs.values()):
         text_input.draw(screen)
 
     # Update the display
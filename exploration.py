@@ -0,0 +1,147 @@
+"""
+Compare how fast exploration controllers cover a world.
+
+Usage:
+    python exploration.py worlds/test1.json
+    python exploration.py worlds/test2.json --steps 20000 --range 40 --output curves.json
+
+Each controller drives the world's agent headless from the same start for
+--steps ticks. Every --interval ticks two coverage figures are taken:
+"visited", the percentage of reachable bins of a CoverageGrid the agent's
+centre has been in, with bins as wide as the agent, and "mapped", the
+percentage of the world observed by its LiDAR, from an OccupancyMap fed with
+every scan. Both controllers are measured the same way, so the curves can be
+compared directly.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+# Run without opening a window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+from agent import Agent
+from controller_frontier import ControllerFrontier
+from controller_random import ControllerRandom
+from coverage_grid import CoverageGrid
+from occupancy_map import OccupancyMap
+from simulation import Simulation
+from world import load_world
+
+CONTROLLERS = ("frontier", "random")
+
+
+def coverage_curve(
+    filename: str,
+    controller: str,
+    steps: int,
+    interval: int = 100,
+    seed: int = 0,
+    sensor_rate: float | None = 10,
+    max_range: float | None = None,
+) -> dict:
+    """
+    Run one controller on a world and record its coverage over time.
+
+    Args:
+        filename (str): World file.
+        controller (str): "frontier" or "random".
+        steps (int): Simulation ticks to run.
+        interval (int, optional): Ticks between coverage samples. Defaults to 100.
+        seed (int, optional): Root seed of the simulation. Defaults to 0.
+        sensor_rate (float, optional): LiDAR scans per simulated second. Defaults to 10.
+        max_range (float, optional): Mapping range of the frontier controller. Defaults to its own.
+
+    Returns:
+        dict: "steps", "visited" and "mapped" lists, one entry per sample, and the
+            "seconds" of wall-clock time the run took.
+    """
+    walls, agent_data, bounds = load_world(filename)
+    agent_data = agent_data or {"x": 200, "y": 200, "direction": 0, "radius": 20}
+    radius = agent_data.get("radius", 20)
+    # ControllerRandom only turns in steps of 45 degrees, so start on one
+    direction = 45 * round(agent_data["direction"] / 45) % 360
+    agent = Agent(agent_data["x"], agent_data["y"], direction, walls, body_radius=radius, bounds=bounds)
+    if controller == "frontier":
+        driver = ControllerFrontier(agent, walls, max_range=max_range)
+    elif controller == "random":
+        driver = ControllerRandom(None, agent)
+    else:
+        raise ValueError(f"Unknown controller {controller!r}")
+    simulation = Simulation(agent, driver, walls, sensor_rate=sensor_rate, seed=seed)
+    if controller == "random":
+        driver.rng = simulation.agent_rng(0)
+    driver.running = True
+
+    simulation.coverage = CoverageGrid(bounds, bin_size=2 * radius)
+    simulation.coverage.exclude_walls(walls)
+    mapped = OccupancyMap(bounds)
+    last_scan = None
+    curve = {"steps": [], "visited": [], "mapped": []}
+    started = time.perf_counter()
+    for step in range(1, steps + 1):
+        simulation.step()
+        if agent.lidar_ranges is not last_scan:
+            last_scan = agent.lidar_ranges
+            mapped.update_from_agent(agent)
+        if step % interval == 0 or step == steps:
+            curve["steps"].append(step)
+            curve["visited"].append(round(float(simulation.coverage.coverage()), 2))
+            curve["mapped"].append(round(mapped.coverage(), 2))
+    curve["seconds"] = time.perf_counter() - started
+    return curve
+
+
+def steps_to(curve: dict, key: str, percent: float) -> int | None:
+    """First sampled step at which a coverage figure reached a percentage, or None."""
+    for step, value in zip(curve["steps"], curve[key]):
+        if value >= percent:
+            return step
+    return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("world", help="world JSON file")
+    parser.add_argument("--steps", type=int, default=6000)
+    parser.add_argument("--interval", type=int, default=500, help="ticks between coverage samples")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sensor-rate", type=float, default=10, help="LiDAR scans per simulated second")
+    parser.add_argument("--range", type=float, default=None, help="mapping range of the frontier controller")
+    parser.add_argument("--controllers", nargs="+", choices=CONTROLLERS, default=list(CONTROLLERS))
+    parser.add_argument("--output", help="write the curves to this JSON file")
+    args = parser.parse_args()
+
+    curves = {}
+    for controller in args.controllers:
+        print(f"Running {controller}...", file=sys.stderr)
+        curves[controller] = coverage_curve(
+            args.world, controller, args.steps, args.interval, args.seed, args.sensor_rate, args.range
+        )
+
+    for key in ("visited", "mapped"):
+        print(f"\n{key} %")
+        print(f"{'step':>8}" + "".join(f"{controller:>10}" for controller in curves))
+        for index, step in enumerate(next(iter(curves.values()))["steps"]):
+            print(f"{step:8d}" + "".join(f"{curve[key][index]:10.1f}" for curve in curves.values()))
+
+    print()
+    for controller, curve in curves.items():
+        final = curve["mapped"][-1]
+        reached = steps_to(curve, "mapped", 0.9 * final)
+        print(
+            f"{controller}: visited {curve['visited'][-1]:.1f}%, mapped {final:.1f}%, "
+            f"90% of that by step {reached}, {curve['seconds']:.1f}s"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"world": args.world, "arguments": vars(args), "curves": curves}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+import numpy as np
+
+# Rays times segments processed per block, bounds the size of temporary arrays
+BLOCK_ELEMENTS = 2_000_000
+
+
+def wall_segments(walls: list, bounds: tuple | None = None) -> np.ndarray:
+    """
+    Collect the edges of walls, and optionally the world boundary, as line segments.
+
+    Args:
+        walls (list): Wall objects.
+        bounds (tuple, optional): (left, top, right, bottom) of the world, added as four segments.
+
+    Returns:
+        np.ndarray: Segments (x1, y1, x2, y2), shape (E, 4).
+    """
+    segments = [
+        (x1, y1, x2, y2) for wall in walls for (x1, y1), (x2, y2) in wall.edges
+    ]
+    if bounds is not None:
+        segments.extend(boundary_segments(bounds))
+    return np.asarray(segments, dtype=np.float64).reshape(-1, 4)
+
+
+def boundary_segments(bounds: tuple) -> list:
+    """The four edges of the world boundary as (x1, y1, x2, y2) segments."""
+    left, top, right, bottom = bounds
+    return [
+        (left, top, right, top),
+        (right, top, right, bottom),
+        (right, bottom, left, bottom),
+        (left, bottom, left, top),
+    ]
+
+
+def wall_rects(walls: list) -> np.ndarray:
+    """Wall rectangles as (left, top, right, bottom), shape (W, 4)."""
+    return np.asarray(
+        [(w.rect.left, w.rect.top, w.rect.right, w.rect.bottom) for w in walls], dtype=np.float64
+    ).reshape(-1, 4)
+
+
+def free_positions(positions, radius: float, rects: np.ndarray, bounds: tuple) -> np.ndarray:
+    """
+    Check which positions a circular agent can occupy without touching walls or leaving the world.
+
+    Uses the same tests as Agent.will_collide, for many positions at once.
+
+    Args:
+        positions (array-like): Positions, shape (M, 2).
+        radius (float): Agent body radius.
+        rects (np.ndarray): Wall rectangles from wall_rects(), shape (W, 4).
+        bounds (tuple): (left, top, right, bottom) of the world.
+
+    Returns:
+        np.ndarray: Boolean mask, shape (M,).
+    """
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+    x = positions[:, 0]
+    y = positions[:, 1]
+    left, top, right, bottom = bounds
+    free = (left + radius <= x) & (x <= right - radius) & (top + radius <= y) & (y <= bottom - radius)
+
+    block = max(1, BLOCK_ELEMENTS // max(1, len(rects)))
+    for start in range(0, len(positions), block):
+        bx = x[start : start + block, None]
+        by = y[start : start + block, None]
+        # Distance from each position to the closest point of each wall
+        dx = bx - np.clip(bx, rects[:, 0], rects[:, 2])
+        dy = by - np.clip(by, rects[:, 1], rects[:, 3])
+        touching = (dx * dx + dy * dy < radius * radius).any(axis=1)
+        free[start : start + block] &= ~touching
+    return free
+
+
+class LidarModel:
+    """
+    Vectorized LiDAR that reproduces Agent.scan for many poses at once.
+
+    Each beam is cast from the agent's truncated integer position to a
+    truncated integer end point at max_range, as Agent.scan does, and
+    intersected with every wall edge and boundary segment in one NumPy pass.
+    """
+
+    def __init__(self, segments: np.ndarray, num_beams: int = 360, max_range: float = 2000.0) -> None:
+        """
+        Initialize the LidarModel.
+
+        Args:
+            segments (np.ndarray): Obstacle segments from wall_segments(), shape (E, 4).
+            num_beams (int, optional): Number of beams spread evenly around the agent. Defaults to 360.
+            max_range (float, optional): Range reported when a beam hits nothing. Defaults to 2000.
+        """
+        self.segments = np.asarray(segments, dtype=np.float64).reshape(-1, 4)
+        self.num_beams = num_beams
+        self.max_range = max_range
+        self.beam_angles = np.arange(num_beams) * (360 / num_beams)
+
+    @classmethod
+    def from_walls(cls, walls: list, bounds: tuple, **kwargs) -> "LidarModel":
+        """Build a model from Wall objects and the world bounds."""
+        return cls(wall_segments(walls, bounds), **kwargs)
+
+    def scan(self, x: float, y: float, direction: float) -> np.ndarray:
+        """
+        Scan from one pose.
+
+        Returns:
+            np.ndarray: Range of each beam, shape (num_beams,).
+        """
+        return self.scan_batch(((x, y, direction),))[0]
+
+    def scan_batch(self, poses) -> np.ndarray:
+        """
+        Scan from many poses.
+
+        Args:
+            poses (array-like): Poses (x, y, direction in degrees), shape (M, 3).
+
+        Returns:
+            np.ndarray: Range of each beam, shape (M, num_beams).
+        """
+        poses = np.asarray(poses, dtype=np.float64).reshape(-1, 3)
+        ranges = np.empty((len(poses), self.num_beams))
+        block = max(1, BLOCK_ELEMENTS // (self.num_beams * max(1, len(self.segments))))
+        for start in range(0, len(poses), block):
+            ranges[start : start + block] = self._scan_block(poses[start : start + block])
+        return ranges
+
+    def _scan_block(self, poses: np.ndarray) -> np.ndarray:
+        # Integer start and end points, as in Agent.scan
+        x1 = np.trunc(poses[:, 0])[:, None]
+        y1 = np.trunc(poses[:, 1])[:, None]
+        angles = np.radians(poses[:, 2:3] + self.beam_angles[None, :])
+        x2 = np.trunc(x1 + self.max_range * np.cos(angles))
+        y2 = np.trunc(y1 - self.max_range * np.sin(angles))
+        shape = x2.shape
+
+        # Rays along the first axis, segments along the second
+        x1 = np.broadcast_to(x1, shape).reshape(-1, 1)
+        y1 = np.broadcast_to(y1, shape).reshape(-1, 1)
+        x2 = x2.reshape(-1, 1)
+        y2 = y2.reshape(-1, 1)
+        x3, y3, x4, y4 = (self.segments[:, i][None, :] for i in range(4))
+
+        ray_dx = x1 - x2
+        ray_dy = y1 - y2
+        denom = ray_dx * (y3 - y4) - ray_dy * (x3 - x4)
+        parallel = np.abs(denom) < 1e-10
+        denom = np.where(parallel, 1.0, denom)
+        t = ((x1 - x3) * (y3 - y4) - (y1 - y3) * (x3 - x4)) / denom
+        u = -(ray_dx * (y1 - y3) - ray_dy * (x1 - x3)) / denom
+        hit = ~parallel & (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+
+        length = np.hypot(ray_dx, ray_dy)
+        distances = np.where(hit, t * length, self.max_range)
+        ranges = distances.min(axis=1) if distances.shape[1] else np.full(len(x1), self.max_range)
+        return np.minimum(ranges, self.max_range).reshape(shape)
@@ -1,19 +1,35 @@
+import logging
+import math
 import pygame
+import os
 import sys
-import json
+import time
 from tkinter import W, Tk, filedialog
 
 # Window dimensions
 WINDOW_WIDTH = 1200
 WINDOW_HEIGHT = 600
+
+# Maximum rendered frames per second, independent of the simulation rate
+RENDER_RATE = 60
 from agent import Agent
-from wall import Wall
 from button import Button
+from camera import Camera
+from coverage_grid import CoverageGrid
+from profiler import PROFILER
+from renderer import SceneRenderer
+from replay import Replay
+from scheduler import FrameScheduler
+import rng
+import sim_logging
+from sim_logging import get_logger
+from sim_worker import DoubleBuffer, SimulationWorker
+from simulation import Simulation
+from spatial_hash import SpatialHash
+from world import load_world
 from constants import (
-    LEFT_BOUNDARY,
-    RIGHT_BOUNDARY,
-    TOP_BOUNDARY,
-    BOTTOM_BOUNDARY,
+    DEFAULT_WORLD_BOUNDS,
+    VIEWPORT_RECT,
     GREEN,
     RED,
     BLACK,
@@ -31,12 +47,28 @@ def load_environment_file_dialogue():
     global root
     root = Tk()
     root.withdraw()
-    load_environment(
-        filedialog.askopenfilename(
-            defaultextension=".json", filetypes=[("JSON files", "*.json")]
-        )
+    filename = filedialog.askopenfilename(
+        defaultextension=".json", filetypes=[("JSON files", "*.json")]
     )
     root.destroy()
+    if filename:
+        set_environment(*load_environment(filename))
+
+
+def load_replay_file_dialogue():
+    """
+    Uses the tkinter file dialogue to select a recording to replay.
+    Calls start_replay after file selected.
+    """
+    global root
+    root = Tk()
+    root.withdraw()
+    filename = filedialog.askopenfilename(
+        defaultextension=".traj", filetypes=[("Trajectory recordings", "*.traj")]
+    )
+    root.destroy()
+    if filename:
+        start_replay(filename)
 
 
 def load_environment(filename):
@@ -44,54 +76,311 @@ def load_environment(filename):
     Takes the file name and loads the environment.
     Puts all wall objects into the wall object and updates agent's internal memory.
     """
+    global world_file
     walls = []
     agent = None
+    bounds = DEFAULT_WORLD_BOUNDS
+    world_file = filename
 
     if filename:
-        with open(filename, "r") as f:
-            world_data = json.load(f)
-
-            # Load walls safely
-            if "walls" in world_data:
-                walls = [
-                    Wall.from_dict(wall_data["wall"])
-                    for wall_data in world_data["walls"]
-                ]
-
-            # Load agent safely
-            if "agent" in world_data and world_data["agent"]:
-                agent_data = world_data["agent"]["agent"]
-                agent = Agent(
-                    x=agent_data.get("x", 200),  # Default position if missing
-                    y=agent_data.get("y", 200),
-                    direction=agent_data.get("direction", 0),
-                    walls=walls,
-                    body_radius=agent_data.get("radius", 20),
-                )
-            else:
-                # Default agent creation if no agent is defined
-                agent = Agent(x=200, y=200, direction=0, walls=walls, body_radius=20)
-
-    return walls, agent
+        walls, agent_data, bounds = load_world(filename)
+
+        # Load agent safely
+        if agent_data:
+            agent = Agent(
+                x=agent_data.get("x", 200),  # Default position if missing
+                y=agent_data.get("y", 200),
+                direction=agent_data.get("direction", 0),
+                walls=walls,
+                body_radius=agent_data.get("radius", 20),
+                bounds=bounds,
+            )
+        else:
+            # Default agent creation if no agent is defined
+            agent = Agent(
+                x=200, y=200, direction=0, walls=walls, body_radius=20, bounds=bounds
+            )
+
+    return walls, agent, bounds
+
+
+def set_environment(new_walls, new_agent, bounds):
+    """
+    Makes a loaded environment the active one and resets the view and controller.
+    The simulation is handed to a background worker and only drawn from its snapshots.
+    """
+    global walls, wall_index, worker, view_agent
+    was_running = worker.latest().controller_running if worker else False
+    lidar_visible = view_agent.lidar_visible if view_agent else False
+    if worker:
+        worker.stop()
+        stop_recording(worker.simulation)
+
+    walls = new_walls
+    wall_index = SpatialHash.from_walls(walls)
+    renderer.invalidate_world()
+    camera.set_bounds(bounds)
+    camera.reset()
+    left, top, right, bottom = bounds
+    if right - left > camera.viewport.width or bottom - top > camera.viewport.height:
+        # Worlds larger than the screen start with the agent in view
+        camera.center_on(new_agent.x, new_agent.y)
+
+    controller = ControllerAStar(new_agent, walls)
+    controller.running = was_running
+    # SIM_SEED repeats the random agents of an earlier run; the seed is logged and recorded
+    seed = os.environ.get("SIM_SEED")
+    simulation = Simulation(new_agent, controller, walls, seed=int(seed) if seed else None)
+    sim_logging.event(log, logging.INFO, "simulation created", seed=simulation.seed)
+    # Track coverage with bins small enough to show detail but at most ~500 across
+    simulation.coverage = CoverageGrid(
+        bounds, bin_size=max(20, math.ceil(max(right - left, bottom - top) / 500))
+    )
+    simulation.coverage.exclude_walls(walls)
+    worker = SimulationWorker(
+        simulation,
+        FrameScheduler(
+            sim_rate=clock_rate,
+            render_rate=RENDER_RATE,
+            steps_per_frame=steps_per_frame,
+        ),
+    )
+    worker.start()
+
+    # A copy of the agent that is only used for drawing snapshots
+    view_agent = Agent(
+        new_agent.x,
+        new_agent.y,
+        new_agent.direction,
+        [],
+        num_lidar_beams=len(new_agent.lidar_angles),
+        body_radius=new_agent.body_radius,
+        bounds=bounds,
+    )
+    view_agent.lidar_visible = lidar_visible
+
+
+def toggle_camera_follow():
+    """Thin wrapper to update whether the camera follows the agent."""
+    global follow_agent
+    follow_agent = not follow_agent
 
 
 
 def toggle_laser():
     """Thin wrapper to update whether to render LiDAR laser beams."""
-    global agent
-    agent.lidar_visible = not agent.lidar_visible
+    view_agent.lidar_visible = not view_agent.lidar_visible
 
 
 def toggle_controller_running():
     """Thin wrapper to update whether the controller is running or not."""
-    global controller, text_surfaces
-    controller.running = not controller.running
-    text_surfaces[4] = font.render(
-        "Controller ENABLED" if controller.running else "Controller DISABLED",
-        True,
-        GREEN if controller.running else RED,
+
+    def toggle(simulation):
+        simulation.apply_command("running", not simulation.controller.running)
+        sim_logging.event(log, logging.INFO, "controller toggled", running=simulation.controller.running)
+
+    worker.submit(toggle)
+
+
+def add_random_agent():
+    """Adds a randomly walking agent at a free spot, sharing the world with the others."""
+
+    def add(simulation):
+        primary = simulation.agent
+        left, top, right, bottom = primary.bounds
+        radius = primary.body_radius
+        # Extra agents only need their bump sensor, so they scan with few beams
+        # The spot is drawn from a stream of its own, and the controller gets the
+        # agent's stream fresh, so re-simulating the add_agent command repeats the walk
+        index = len(simulation.agents)
+        placement = rng.stream(simulation.seed, index, 1)
+        agent = Agent(0, 0, 45 * int(placement.integers(8)), simulation.walls, num_lidar_beams=36,
+                      body_radius=radius, bounds=primary.bounds)
+        for _ in range(1000):
+            agent.x = placement.uniform(left + radius, right - radius)
+            agent.y = placement.uniform(top + radius, bottom - radius)
+            if not agent.will_collide(agent.x, agent.y) and not any(
+                math.hypot(other.x - agent.x, other.y - agent.y) < radius + other.body_radius
+                for other in simulation.agents
+            ):
+                break
+        else:
+            sim_logging.event(log, logging.WARNING, "no free spot for a new agent")
+            return
+        simulation.apply_command("add_agent", agent.x, agent.y, agent.direction, index, 36, radius)
+        sim_logging.event(log, logging.INFO, "agent added", pose=(agent.x, agent.y), agents=len(simulation.agents))
+
+    worker.submit(add)
+
+
+def stop_recording(simulation):
+    """Closes the simulation's trajectory recording, if any."""
+    global recording
+    recorder = simulation.stop_recording()
+    if recorder is not None:
+        sim_logging.event(
+            log, logging.INFO, "recording saved", file=recorder.filename, steps=recorder.recorded
+        )
+    recording = False
+
+
+def toggle_recording():
+    """Starts recording every simulation step to recordings/, or stops the current recording."""
+    global recording
+    recording = not recording
+    text_surfaces[2] = render_shortcut_text()
+    if not recording:
+        worker.submit(stop_recording)
+        return
+
+    os.makedirs("recordings", exist_ok=True)
+    filename = os.path.join("recordings", time.strftime("run_%Y%m%d_%H%M%S.traj"))
+
+    worker.submit(lambda simulation: simulation.start_recording(filename, {"world": world_file}))
+
+
+def start_replay(filename):
+    """
+    Switches the viewer to playing back a recording instead of the live simulation.
+    The recording's world is loaded so its walls are drawn.
+    """
+    global replay
+    new_replay = Replay(filename)
+    world = new_replay.metadata.get("world")
+    if world and os.path.exists(world):
+        set_environment(*load_environment(world))
+    replay = new_replay
+    text_surfaces[5] = font.render("Replay: space, arrows, n/g, b, esc", True, BLACK)
+
+
+def stop_replay():
+    """Returns the viewer to the live simulation."""
+    global replay, shown_replay_state
+    replay = None
+    shown_replay_state = None
+    text_surfaces[4] = render_controller_text(*shown_controller_state)
+    text_surfaces[5] = font.render("Move agent: Arrow Keys, Add agent: a", True, BLACK)
+
+
+def seek_replay_time():
+    """Jumps the replay to the simulated time, in seconds, in the seek input field."""
+    if replay is None:
+        return
+    try:
+        replay.seek_time(float(seek_input.get_text()))
+    except ValueError:
+        pass
+
+
+def handle_replay_key(event):
+    """
+    Playback controls while replaying: space plays or pauses, left and right step
+    one frame, up and down double or halve the speed, b reverses, n and g jump
+    to the next bump or goal arrival (with shift, the previous one), escape exits.
+    """
+    shift = event.mod & pygame.KMOD_SHIFT
+    if event.key == pygame.K_SPACE:
+        replay.paused = not replay.paused
+    elif event.key == pygame.K_RIGHT:
+        replay.step_frames(1)
+    elif event.key == pygame.K_LEFT:
+        replay.step_frames(-1)
+    elif event.key == pygame.K_UP:
+        replay.speed *= 2
+    elif event.key == pygame.K_DOWN:
+        replay.speed /= 2
+    elif event.key == pygame.K_b:
+        replay.speed = -replay.speed
+    elif event.key in (pygame.K_n, pygame.K_g):
+        name = "bump" if event.key == pygame.K_n else "goal"
+        if shift:
+            replay.previous_event(name)
+        else:
+            replay.next_event(name)
+    elif event.key == pygame.K_ESCAPE:
+        stop_replay()
+
+
+def render_replay_text():
+    """Renders the replay position line of the text block."""
+    state = "paused" if replay.paused else f"x{replay.speed:g}"
+    return font.render(
+        f"Replay {replay.frame_index + 1}/{len(replay)} t={replay.time:.2f}s {state}", True, GREEN
     )
-    print(f"Controller running: {controller.running}")  # Print state after toggling
+
+
+def render_shortcut_text():
+    """Renders the shortcut line that also shows whether a recording is in progress."""
+    if recording:
+        return font.render("Quit: q, Profiler: p, REC (r to stop)", True, RED)
+    return font.render("Quit: q, Profiler: p, Record: r", True, BLACK)
+
+
+def toggle_heatmap():
+    """Thin wrapper to show or hide the coverage heatmap and statistics."""
+    global show_heatmap, heatmap_updated, heatmap_shown
+    show_heatmap = not show_heatmap
+    heatmap_updated = 0
+    heatmap_shown = None
+    if not show_heatmap:
+        renderer.set_heatmap(None)
+        text_surfaces[9] = font.render("Pan: right drag, Zoom: wheel, Follow: f", True, BLACK)
+
+
+def request_heatmap():
+    """Asks the worker for a copy of the time spent in each bin and the coverage statistics."""
+
+    def copy_coverage(simulation):
+        coverage = simulation.coverage
+        heatmap_data.publish(
+            (
+                coverage.dwell_map().copy(),
+                coverage.grid.bounds,
+                coverage.grid.bin_size,
+                coverage.coverage(),
+                coverage.entropy(),
+            )
+        )
+
+    worker.submit(copy_coverage)
+
+
+def update_heatmap(data):
+    """Redraws the heatmap and the coverage statistics from a copy the worker published."""
+    global heatmap_shown
+    heatmap_shown = data
+    dwell, bounds, bin_size, coverage, entropy = data
+    renderer.set_heatmap(SceneRenderer.render_heatmap(dwell), bounds, bin_size)
+    text_surfaces[9] = font.render(f"Coverage: {coverage:.1f}%, entropy {entropy:.2f}", True, BLACK)
+
+
+def toggle_profiler():
+    """Thin wrapper to turn profiling and its overlay on or off."""
+    PROFILER.enabled = not PROFILER.enabled
+
+
+def export_profile():
+    """Writes the profiler summary to CSV and JSON files if anything was profiled."""
+    if not PROFILER.samples and not PROFILER.counters:
+        return
+    os.makedirs("profiles", exist_ok=True)
+    name = os.path.join("profiles", time.strftime("profile_%Y%m%d_%H%M%S"))
+    PROFILER.export_csv(name + ".csv")
+    PROFILER.export_json(name + ".json")
+    print(f"Profile written to {name}.csv and {name}.json")
+
+
+def render_controller_text(controller_running, planning_progress=None):
+    """Renders the controller state line of the text block."""
+    text = "Controller ENABLED" if controller_running else "Controller DISABLED"
+    if planning_progress is not None:
+        text += f" (planning {int(planning_progress * 100)}%)"
+    return font.render(text, True, GREEN if controller_running else RED)
+
+
+def set_goal(goal):
+    """Forwards a goal in world coordinates to the controller on the worker thread."""
+    worker.submit(lambda simulation: simulation.apply_command("goal", goal))
 
 
 def set_clock_rate():
@@ -99,11 +388,34 @@ def set_clock_rate():
     global clock_rate, clock, text_surfaces
     try:
         clock_rate = int(clock_rate_input.get_text())
-        text_surfaces[6] = font.render(f"Clock Rate: {clock_rate}", True, BLACK)
+        text_surfaces[6] = render_clock_rate_text()
+        worker.set_rates(clock_rate, steps_per_frame)
+    except ValueError:
+        pass
+
+
+def set_steps_per_frame():
+    """Sets how many sim steps run per frame at max speed, 0 to fill the frame budget."""
+    global text_surfaces, steps_per_frame
+    try:
+        steps_per_frame = max(0, int(steps_per_frame_input.get_text()))
+        text_surfaces[6] = render_clock_rate_text()
+        worker.set_rates(clock_rate, steps_per_frame)
     except ValueError:
         pass
 
 
+def render_clock_rate_text():
+    """Renders the clock rate line of the text block."""
+    if clock_rate > 0:
+        return font.render(f"Clock Rate: {clock_rate}", True, BLACK)
+    if steps_per_frame > 0:
+        return font.render(
+            f"Clock Rate: MAX ({steps_per_frame} steps/frame)", True, BLACK
+        )
+    return font.render("Clock Rate: MAX (frame budget)", True, BLACK)
+
+
 def set_max_speed():
     """Sets the clock rate to 0 (max speed) or back to the previous clock rate."""
     global clock_rate, clock, max_speed, text_surfaces, previous_clock_rate
@@ -113,14 +425,19 @@ def set_max_speed():
             clock_rate = previous_clock_rate
         else:
             clock_rate = 60  # Default to 60 if no valid previous rate
-        text_surfaces[6] = font.render(f"Clock Rate: {clock_rate}", True, BLACK)
     else:
         max_speed = True
         if clock_rate > 0:  # Only save the previous rate if it's valid
             previous_clock_rate = clock_rate
         clock_rate = 0
-        text_surfaces[6] = font.render("Clock Rate: MAX", True, BLACK)
+    text_surfaces[6] = render_clock_rate_text()
+    worker.set_rates(clock_rate, steps_per_frame)
+
 
+# Log through a background-flushed buffer; levels come from SIM_LOG, e.g. "INFO,astar=DEBUG"
+levels = sim_logging.parse_levels(os.environ.get("SIM_LOG", ""))
+sim_logging.configure(levels.pop("", "WARNING"), levels, os.environ.get("SIM_LOG_FILE"))
+log = get_logger("main")
 
 # Initialize pygame
 pygame.init()
@@ -132,19 +449,25 @@ clock = pygame.time.Clock()
 screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
 pygame.display.set_caption("Simulation Window")
 
-# Load in walls and agent
-walls, agent = load_environment("worlds/test1.json")
-# Assuming walls are loaded and you have a grid representation
-grid_size = 20  # Define the size of the grid (adjust as necessary)
-grid = [[0 for _ in range(grid_size)] for _ in range(grid_size)]
-
-
-controller = ControllerAStar(agent, walls)
-
-# Define clock rate variable
+# Define clock rate variable, the number of simulation steps per second
 clock_rate = 60
 previous_clock_rate = clock_rate
 max_speed = False
+steps_per_frame = 0
+
+# Load in walls and agent, and set up the view of the world
+camera = Camera(VIEWPORT_RECT, DEFAULT_WORLD_BOUNDS)
+renderer = SceneRenderer(screen, camera)
+follow_agent = False
+recording = False
+show_heatmap = False
+heatmap_updated = 0
+heatmap_data = DoubleBuffer()  # Coverage copied on the worker thread, read by the render loop
+heatmap_shown = None
+replay = None
+worker = None
+view_agent = None
+set_environment(*load_environment("worlds/test1.json"))
 
 # Define buttons
 buttons = [
@@ -153,115 +476,171 @@ buttons = [
     Button(850, 170, 100, 50, "Controller", toggle_controller_running),
     Button(850, 230, 100, 50, "Set Clock Rate", set_clock_rate),
     Button(850, 290, 100, 50, "Max Speed", set_max_speed),
+    Button(850, 350, 100, 50, "Steps/Frame", set_steps_per_frame),
+    Button(1030, 50, 100, 50, "Replay", load_replay_file_dialogue),
+    Button(1030, 110, 100, 50, "Seek Time", seek_replay_time),
 ]
 
 clock_rate_input = TextInput(x=960, y=230, width=50, height=50)
+steps_per_frame_input = TextInput(x=960, y=350, width=50, height=50)
+seek_input = TextInput(x=1000, y=170, width=50, height=50)
 
 # Define on-screen text that renders in a block
 font = pygame.font.Font(None, 24)
+overlay_font = pygame.font.Font(None, 20)
 text_surfaces = [
     font.render("Load World Shortcut: u", True, BLACK),
     font.render("See LiDAR Shortcut: i", True, BLACK),
-    font.render("Quit sim shortcut: q", True, BLACK),
-    font.render("Toggle Controller: c", True, BLACK),
-    font.render(
-        "Controller ENABLED" if controller.running else "Controller DISABLED",
-        True,
-        GREEN if controller.running else RED,
-    ),
-    font.render("Move agent manually: Arrow Keys", True, BLACK),
-    font.render(f"Clock Rate: {clock_rate}", True, BLACK),
-    font.render("Actual Speed: Calculating...", True, BLACK),
+    render_shortcut_text(),
+    font.render("Toggle Controller: c, Heatmap: h", True, BLACK),
+    render_controller_text(worker.latest().controller_running),
+    font.render("Move agent: Arrow Keys, Add agent: a", True, BLACK),
+    render_clock_rate_text(),
+    font.render("Sim Speed: Calculating...", True, BLACK),
+    font.render("Render Speed: Calculating...", True, BLACK),
+    font.render("Pan: right drag, Zoom: wheel, Follow: f", True, BLACK),
 ]
 
 # Main game loop
+shown_controller_state = (worker.latest().controller_running, None)
+shown_replay_state = None
+shown_sim_speed = None
+shown_render_speed = None
+overlay = None
+overlay_updated = 0
 running = True
 while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_q:
+    with PROFILER.scope("frame.events"):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
                 running = False
-            if event.key == pygame.K_u:
-                buttons[0].action()
-            if event.key == pygame.K_i:
-                buttons[1].action()
-            if event.key == pygame.K_c:
-                buttons[2].action()
-            if event.key == pygame.K_m:
-                buttons[4].action()
-        elif event.type == pygame.MOUSEBUTTONDOWN:
-            for button in buttons:
-                if button.is_clicked(event.pos):
-                    button.action()
-                print(f"Controller running: {controller.running}")
-                mouse_pos = pygame.mouse.get_pos()
-                controller.handle_input(mouse_pos)
-                controller.set_goal(mouse_pos)
-
-        clock_rate_input.handle_event(event)
-
-    # Get the state of all keyboard buttons
-    keys = pygame.key.get_pressed()
-
-    # Handle agent's movement
-    agent.handle_move_keys(keys)
-
-    # Fill the screen with a white color
-    screen.fill((255, 255, 255))
-
-    # Draw the left half as the navigation area
-    pygame.draw.rect(
-        screen,
-        (200, 200, 200),
-        (
-            LEFT_BOUNDARY,
-            TOP_BOUNDARY,
-            RIGHT_BOUNDARY - LEFT_BOUNDARY,
-            BOTTOM_BOUNDARY - TOP_BOUNDARY,
-        ),
-    )
-
-    # Agent scans environment
-    agent.scan()
-
-    # Controller does its work
-    controller.update()
-
-    # Draw the walls
-    for wall in walls:
-        wall.draw(screen)
-
-    # Draw the agent
-    agent.draw(screen)
-
-    # Draw the buttons
-    for button in buttons:
-        button.draw(screen)
-
-    # Draw text input
-    clock_rate_input.update()
-    clock_rate_input.draw(screen)
-
-    # Draw text
-    x, y = WINDOW_WIDTH - 300, WINDOW_HEIGHT - 200
-    for surface in text_surfaces:
-        screen.blit(surface, (x, y))
-        y += 20
-
-    # Update the display
-    pygame.display.flip()
-
-    # Control the frame rate and measure actual frame rate if at max speed
-    if clock_rate > 0:
-        clock.tick(clock_rate)
-        actual_speed = clock_rate
+            elif event.type == pygame.KEYDOWN and replay is not None and event.key != pygame.K_q:
+                handle_replay_key(event)
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_q:
+                    running = False
+                if event.key == pygame.K_u:
+                    buttons[0].action()
+                if event.key == pygame.K_i:
+                    buttons[1].action()
+                if event.key == pygame.K_c:
+                    buttons[2].action()
+                if event.key == pygame.K_m:
+                    buttons[4].action()
+                if event.key == pygame.K_f:
+                    toggle_camera_follow()
+                if event.key == pygame.K_p:
+                    toggle_profiler()
+                if event.key == pygame.K_r:
+                    toggle_recording()
+                if event.key == pygame.K_h:
+                    toggle_heatmap()
+                if event.key == pygame.K_a:
+                    add_random_agent()
+            elif camera.handle_event(event):
+                continue
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                button_clicked = False
+                for button in buttons:
+                    if button.is_clicked(event.pos):
+                        button.action()
+                        button_clicked = True
+                if (
+                    not button_clicked
+                    and replay is None
+                    and event.button == 1
+                    and camera.contains(event.pos)
+                ):
+                    # Goals are set in world coordinates
+                    set_goal(camera.screen_to_world(event.pos))
+
+            clock_rate_input.handle_event(event)
+            steps_per_frame_input.handle_event(event)
+            seek_input.handle_event(event)
+
+        # Forward the state of all keyboard buttons to the simulation
+        if replay is None:
+            worker.set_keys(pygame.key.get_pressed())
+
+    # Draw whatever the simulation published last, without waiting on it,
+    # or the current frame of the recording being replayed
+    snapshot = worker.latest()
+    path = snapshot.path
+    if replay is not None:
+        replay.advance(clock.get_time() / 1000)
+        replay.apply_to(view_agent)
+        path = ()
     else:
-        actual_speed = int(clock.get_fps())
-        text_surfaces[7] = font.render(f"Actual Speed: {actual_speed} FPS", True, BLACK)
-        clock.tick()
+        snapshot.apply_to(view_agent)
+
+    if follow_agent:
+        camera.center_on(view_agent.x, view_agent.y)
+
+    # Refresh the coverage heatmap twice a second; it is part of the cached world layer.
+    # The worker copies the coverage between ticks, and it is drawn once the copy arrives
+    if show_heatmap and time.perf_counter() - heatmap_updated > 0.5:
+        heatmap_updated = time.perf_counter()
+        request_heatmap()
+    heatmap = heatmap_data.read()
+    if show_heatmap and heatmap is not None and heatmap is not heatmap_shown:
+        update_heatmap(heatmap)
+
+    # Refresh the profiler overlay a few times a second
+    if not PROFILER.enabled:
+        overlay = None
+    elif time.perf_counter() - overlay_updated > 0.25:
+        overlay_updated = time.perf_counter()
+        PROFILER.update_rates()
+        overlay = SceneRenderer.render_overlay(PROFILER.overlay_lines(), overlay_font)
+
+    # Draw the frame; the arena, walls and UI come from a cached layer and
+    # only the areas that changed are pushed to the display
+    with PROFILER.scope("frame.render"):
+        renderer.render(
+            wall_index,
+            view_agent,
+            buttons,
+            [clock_rate_input, steps_per_frame_input, seek_input],
+            text_surfaces,
+            (WINDOW_WIDTH - 300, WINDOW_HEIGHT - 200),
+            path,
+            overlay,
+            snapshot.others if replay is None else (),
+        )
 
-# Quit pygame
+    # Update text that depends on the simulation, re-rendering only on change
+    controller_state = (
+        snapshot.controller_running,
+        None
+        if snapshot.planning_progress is None
+        else int(snapshot.planning_progress * 100) / 100,
+    )
+    if replay is not None:
+        replay_state = (replay.frame_index, replay.paused, replay.speed)
+        if replay_state != shown_replay_state:
+            shown_replay_state = replay_state
+            text_surfaces[4] = render_replay_text()
+    elif controller_state != shown_controller_state:
+        shown_controller_state = controller_state
+        text_surfaces[4] = render_controller_text(*controller_state)
+
+    # Report sim and render rates separately
+    sim_speed = int(snapshot.sim_steps_per_second)
+    if sim_speed != shown_sim_speed:
+        shown_sim_speed = sim_speed
+        text_surfaces[7] = font.render(f"Sim Speed: {sim_speed} steps/s", True, BLACK)
+    render_speed = int(clock.get_fps())
+    if render_speed != shown_render_speed:
+        shown_render_speed = render_speed
+        text_surfaces[8] = font.render(f"Render Speed: {render_speed} FPS", True, BLACK)
+
+    # Cap the display rate
+    with PROFILER.scope("frame.wait"):
+        clock.tick(RENDER_RATE)
+
+# Stop the simulation, save any profile and quit pygame
+worker.stop()
+stop_recording(worker.simulation)
+export_profile()
 pygame.quit()
 sys.exit()
\ No newline at end of file
@@ -0,0 +1,282 @@
+import math
+
+import numpy as np
+
+from lidar import wall_rects
+from shared_world import build_grids
+
+# Agents rendered together, bounds the size of temporary arrays
+BLOCK_AGENTS = 256
+
+
+class ObservationRenderer:
+    """
+    Renders egocentric observations of many agents at once, without a window.
+
+    The walls are rasterized once into an occupancy grid and a distance
+    field, padded with walls on every side so views that reach past the edge
+    of the world see it as a wall. Views only read from these cached grids,
+    so their cost depends on the size of the views and not on the size of
+    the world or its number of walls. Everything is plain NumPy, so it runs
+    headless and in worker processes.
+
+    Two kinds of views are rendered into buffers that are reused from call
+    to call, one per batch size:
+
+    - top_down(): a square crop of the occupancy grid around each agent,
+      rotated so the agent faces up, 1 for walls and 0 for free space.
+    - depth(): a first-person 1D depth image, the distance along evenly
+      spread rays across the field of view, like LiDAR ranges. Rays step
+      through the distance field, and on entering a wall cell are tested
+      against the few walls listed for that cell, so depths are exact.
+    """
+
+    def __init__(
+        self,
+        rects: np.ndarray,
+        bounds: tuple,
+        resolution: float = 10.0,
+        occupancy: np.ndarray | None = None,
+        distance: np.ndarray | None = None,
+        crop_size: int = 64,
+        crop_resolution: float | None = None,
+        depth_width: int = 64,
+        field_of_view: float = 90.0,
+        max_range: float = 2000.0,
+    ) -> None:
+        """
+        Initialize the ObservationRenderer.
+
+        Args:
+            rects (np.ndarray): Wall rectangles from lidar.wall_rects(), shape (W, 4).
+            bounds (tuple): (left, top, right, bottom) of the world.
+            resolution (float, optional): Side of a grid cell in world units. Defaults to 10.
+            occupancy (np.ndarray, optional): Occupancy grid of the walls at this resolution, as
+                from shared_world.build_grids. Defaults to building it.
+            distance (np.ndarray, optional): The matching distance field. Defaults to building it.
+            crop_size (int, optional): Side of the top-down crops in pixels. Defaults to 64.
+            crop_resolution (float, optional): World units per crop pixel. Defaults to resolution.
+            depth_width (int, optional): Pixels, i.e. rays, of the depth images. Defaults to 64.
+            field_of_view (float, optional): Angle covered by the depth images, in degrees. Defaults to 90.
+            max_range (float, optional): Depth reported when a ray hits nothing. Defaults to 2000.
+        """
+        self.rects = np.asarray(rects, dtype=np.float64).reshape(-1, 4)
+        self.bounds = tuple(bounds)
+        self.resolution = resolution
+        self.crop_size = crop_size
+        self.crop_resolution = resolution if crop_resolution is None else crop_resolution
+        self.depth_width = depth_width
+        self.field_of_view = field_of_view
+        self.max_range = max_range
+
+        # Pad far enough that no crop pixel lands outside the grid
+        half_diagonal = crop_size * self.crop_resolution * math.sqrt(0.5)
+        self.padding = math.ceil(half_diagonal / resolution) + 1
+        if occupancy is None or distance is None:
+            occupancy, distance = build_grids(self.rects, self.bounds, resolution)
+        self.occupancy = np.pad(occupancy.astype(np.uint8), self.padding, constant_values=1)
+        self.distance = np.pad(distance.astype(np.float32), self.padding, constant_values=0)
+        self.cell_offsets, self.cell_walls = self.walls_by_cell()
+
+        # Crop pixel centres in the agent's frame: rows run from ahead to behind, columns from left to right
+        offsets = (np.arange(crop_size) - crop_size / 2 + 0.5) * self.crop_resolution
+        self.crop_ahead = np.ascontiguousarray(np.broadcast_to(-offsets[:, None], (crop_size, crop_size)))
+        self.crop_right = np.ascontiguousarray(np.broadcast_to(offsets[None, :], (crop_size, crop_size)))
+        # Ray angles relative to the heading, from the left edge of the view to the right
+        self.ray_angles = field_of_view * (0.5 - (np.arange(depth_width) + 0.5) / depth_width)
+        self._buffers = {}
+
+    @classmethod
+    def from_walls(cls, walls: list, bounds: tuple, **kwargs) -> "ObservationRenderer":
+        """Create a renderer for a world given as Wall objects."""
+        return cls(wall_rects(walls), bounds, **kwargs)
+
+    @classmethod
+    def from_shared(cls, world, **kwargs) -> "ObservationRenderer":
+        """Render from the walls and grids of a SharedWorld, e.g. in a dataset worker."""
+        return cls(world.rects, world.bounds, world.resolution, world.occupancy, world.distance, **kwargs)
+
+    @staticmethod
+    def poses_of(agents) -> np.ndarray:
+        """Poses (x, y, direction) of Agent objects, shape (N, 3)."""
+        return np.array([(agent.x, agent.y, agent.direction) for agent in agents], dtype=np.float64).reshape(-1, 3)
+
+    def walls_by_cell(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        List the walls overlapping each cell of the padded grids.
+
+        Returns:
+            tuple: Offsets, shape (cells + 1,), and wall indices, so the walls of
+                cell i are walls[offsets[i]:offsets[i + 1]].
+        """
+        left, top, _, _ = self.bounds
+        rows, columns = self.occupancy.shape
+        cells, walls = [], []
+        for index, (wall_left, wall_top, wall_right, wall_bottom) in enumerate(self.rects):
+            # The same cells as build_grids marks as occupied
+            first_row = max(0, int((wall_top - top) // self.resolution) + self.padding)
+            last_row = min(rows, math.ceil((wall_bottom - top) / self.resolution) + self.padding)
+            first_column = max(0, int((wall_left - left) // self.resolution) + self.padding)
+            last_column = min(columns, math.ceil((wall_right - left) / self.resolution) + self.padding)
+            window = (np.arange(first_row, last_row)[:, None] * columns + np.arange(first_column, last_column)).ravel()
+            cells.append(window)
+            walls.append(np.full(len(window), index, dtype=np.intp))
+        cells = np.concatenate(cells) if cells else np.empty(0, dtype=np.intp)
+        walls = np.concatenate(walls) if walls else np.empty(0, dtype=np.intp)
+        order = np.argsort(cells, kind="stable")
+        offsets = np.zeros(rows * columns + 1, dtype=np.intp)
+        np.cumsum(np.bincount(cells, minlength=rows * columns), out=offsets[1:])
+        return offsets, walls[order]
+
+    def _buffer(self, name: str, shape: tuple, dtype) -> np.ndarray:
+        key = (name, shape)
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = self._buffers[key] = np.empty(shape, dtype=dtype)
+        return buffer
+
+    def _cells(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        # Flat index into the padded grids of the cell of each position
+        left, top, _, _ = self.bounds
+        columns = self.occupancy.shape[1]
+        column = np.floor((x - left) / self.resolution).astype(np.intp)
+        row = np.floor((y - top) / self.resolution).astype(np.intp)
+        column += self.padding
+        row += self.padding
+        np.clip(column, 0, columns - 1, out=column)
+        np.clip(row, 0, self.occupancy.shape[0] - 1, out=row)
+        row *= columns
+        row += column
+        return row
+
+    def top_down(self, poses, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Render top-down crops centred on each agent, with the agent facing up.
+
+        Args:
+            poses (array-like): Poses (x, y, direction in degrees), shape (N, 3).
+            out (np.ndarray, optional): uint8 array of shape (N, crop_size, crop_size) to render
+                into. Defaults to a buffer kept for this batch size.
+
+        Returns:
+            np.ndarray: The crops, 1 for walls and 0 for free space; the default buffer
+                is overwritten by the next call with as many poses.
+        """
+        poses = np.asarray(poses, dtype=np.float64).reshape(-1, 3)
+        size = self.crop_size
+        if out is None:
+            out = self._buffer("top_down", (len(poses), size, size), np.uint8)
+        grid = self.occupancy.ravel()
+        for start in range(0, len(poses), BLOCK_AGENTS):
+            block = poses[start : start + BLOCK_AGENTS]
+            radians = np.radians(block[:, 2])[:, None, None]
+            cos, sin = np.cos(radians), np.sin(radians)
+            # Ahead is (cos, -sin) on screen, as in Agent, and right is (sin, cos)
+            x = block[:, 0, None, None] + self.crop_ahead * cos + self.crop_right * sin
+            y = block[:, 1, None, None] - self.crop_ahead * sin + self.crop_right * cos
+            np.take(grid, self._cells(x, y), out=out[start : start + BLOCK_AGENTS])
+        return out
+
+    def depth(self, poses, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Render first-person 1D depth images.
+
+        Every ray steps through the distance field, by the distance to the
+        nearest wall less the error of the field, which cannot reach a wall,
+        and at least to the next cell it crosses. In a cell overlapped by
+        walls it is intersected with those walls exactly; it ends at the
+        first one it meets, at the edge of the world or at max_range.
+
+        Args:
+            poses (array-like): Poses (x, y, direction in degrees), shape (N, 3).
+            out (np.ndarray, optional): float32 array of shape (N, depth_width) to render into.
+                Defaults to a buffer kept for this batch size.
+
+        Returns:
+            np.ndarray: Distance along each ray, from the left edge of the view to the right;
+                the default buffer is overwritten by the next call with as many poses.
+        """
+        poses = np.asarray(poses, dtype=np.float64).reshape(-1, 3)
+        if out is None:
+            out = self._buffer("depth", (len(poses), self.depth_width), np.float32)
+        for start in range(0, len(poses), BLOCK_AGENTS):
+            block = poses[start : start + BLOCK_AGENTS]
+            out[start : start + BLOCK_AGENTS] = self._trace(block).reshape(len(block), self.depth_width)
+        return out
+
+    def _trace(self, poses: np.ndarray) -> np.ndarray:
+        # Depth of every ray of every pose, flattened
+        occupancy = self.occupancy.ravel()
+        distance = self.distance.ravel()
+        resolution = self.resolution
+        margin = resolution * math.sqrt(0.5)  # Furthest a cell centre is from a point in the cell
+        nudge = resolution * 1e-6  # Past a cell's edge, into the next cell
+
+        radians = np.radians(poses[:, 2:3] + self.ray_angles[None, :]).ravel()
+        x, y = np.repeat(poses[:, 0], self.depth_width), np.repeat(poses[:, 1], self.depth_width)
+        dx, dy = np.cos(radians), -np.sin(radians)
+        # Rays end at the edge of the world at the latest
+        left, top, right, bottom = self.bounds
+        with np.errstate(divide="ignore", invalid="ignore"):
+            to_x = np.where(dx > 0, (right - x) / dx, np.where(dx < 0, (left - x) / dx, np.inf))
+            to_y = np.where(dy > 0, (bottom - y) / dy, np.where(dy < 0, (top - y) / dy, np.inf))
+        limit = np.minimum(np.minimum(to_x, to_y), self.max_range)
+        np.maximum(limit, 0.0, out=limit)
+
+        depth = limit.copy()
+        travelled = np.zeros(len(radians))
+        # Only rays still travelling are stepped, so the work shrinks as they end
+        active = np.flatnonzero(limit > 0)
+        while len(active):
+            t = travelled[active]
+            ray_dx, ray_dy = dx[active], dy[active]
+            at_x, at_y = x[active] + ray_dx * t, y[active] + ray_dy * t
+            cells = self._cells(at_x, at_y)
+            # Distance to where the ray leaves its cell
+            with np.errstate(divide="ignore", invalid="ignore"):
+                edge_x = left + (np.floor((at_x - left) / resolution) + (ray_dx > 0)) * resolution
+                edge_y = top + (np.floor((at_y - top) / resolution) + (ray_dy > 0)) * resolution
+                to_edge = np.minimum(
+                    np.where(ray_dx != 0, (edge_x - at_x) / ray_dx, np.inf),
+                    np.where(ray_dy != 0, (edge_y - at_y) / ray_dy, np.inf),
+                )
+            going = t < limit[active]
+            in_walls = np.flatnonzero(going & (occupancy[cells] == 1))
+            if len(in_walls):
+                rays = active[in_walls]
+                hit = self._enter_walls(x[rays], y[rays], dx[rays], dy[rays], cells[in_walls])
+                # Only a hit inside this cell is the first: walls listed for later cells may be closer
+                stop = (hit <= t[in_walls] + to_edge[in_walls] + nudge) | (t[in_walls] + to_edge[in_walls] >= limit[rays])
+                depth[rays[stop]] = np.minimum(hit[stop], limit[rays[stop]])
+                going[in_walls[stop]] = False
+            active, t, cells, to_edge = active[going], t[going], cells[going], to_edge[going]
+            # Near walls, step into the next cell the ray crosses, so no wall cell is skipped, even at a corner
+            travelled[active] = t + np.maximum(distance[cells] - margin, to_edge + nudge)
+        return depth
+
+    def _enter_walls(self, x, y, dx, dy, cells) -> np.ndarray:
+        # Distance along each ray to the first of the walls listed for its cell, inf if it misses them all
+        starts = self.cell_offsets[cells]
+        counts = self.cell_offsets[cells + 1] - starts
+        total = int(counts.sum())
+        hits = np.full(len(x), np.inf)
+        if not total:
+            return hits
+        # One (ray, wall) pair per wall of each ray's cell, by the slab test
+        ray = np.repeat(np.arange(len(x)), counts)
+        wall = self.cell_walls[np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)]
+        rects = self.rects[wall]
+        enter = np.zeros(total)
+        leave = np.full(total, np.inf)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for position, delta, low, high in ((x[ray], dx[ray], rects[:, 0], rects[:, 2]), (y[ray], dy[ray], rects[:, 1], rects[:, 3])):
+                to_low, to_high = (low - position) / delta, (high - position) / delta
+                # A ray parallel to a slab is in it throughout or never
+                inside = (low <= position) & (position <= high)
+                near = np.where(delta == 0, np.where(inside, -np.inf, np.inf), np.minimum(to_low, to_high))
+                far = np.where(delta == 0, np.where(inside, np.inf, -np.inf), np.maximum(to_low, to_high))
+                np.maximum(enter, near, out=enter)
+                np.minimum(leave, far, out=leave)
+        enter[enter > leave] = np.inf
+        np.minimum.at(hits, ray, enter)
+        return hits
@@ -0,0 +1,266 @@
+import math
+
+import numpy as np
+
+from wall import Wall
+
+# Log-odds added for a beam passing through a cell and for a beam ending in it
+LOG_ODDS_FREE = -0.4
+LOG_ODDS_OCCUPIED = 0.85
+LOG_ODDS_LIMIT = 5.0  # Cell values are clamped to +-this, so the map can change its mind
+OCCUPIED_THRESHOLD = 0.7  # Probability above which a cell counts as a wall
+
+
+class OccupancyMap:
+    """
+    Log-odds occupancy grid built online from LiDAR scans.
+
+    Every scan lowers the log-odds of the cells its beams pass through and
+    raises those of the cells where they end on something. All beams of a
+    scan are rasterized together with NumPy: sample points are laid along
+    every beam up to its range, and each cell touched is updated once per
+    scan. The grid is stored as square tiles that are only allocated when a
+    beam first reaches them, so memory follows the explored area rather than
+    the size of the world. Cells never observed have log-odds 0 (probability
+    0.5) and count as unknown.
+    """
+
+    def __init__(self, bounds: tuple, resolution: float = 10.0, tile_size: int = 64) -> None:
+        """
+        Initialize the OccupancyMap.
+
+        Args:
+            bounds (tuple): (left, top, right, bottom) of the world.
+            resolution (float, optional): Side of a cell in world units. Defaults to 10.
+            tile_size (int, optional): Side of a tile in cells. Defaults to 64.
+        """
+        self.bounds = tuple(bounds)
+        self.resolution = resolution
+        self.tile_size = tile_size
+        left, top, right, bottom = self.bounds
+        self.columns = max(1, math.ceil((right - left) / resolution))
+        self.rows = max(1, math.ceil((bottom - top) / resolution))
+        self.tile_columns = -(-self.columns // tile_size)
+        self.tiles = {}  # Log-odds (float32) of each allocated tile, by tile_row * tile_columns + tile_column
+        self.scans = 0
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the allocated tiles."""
+        return sum(tile.nbytes for tile in self.tiles.values())
+
+    def cell(self, x: float, y: float) -> tuple[int, int]:
+        """Row and column of the cell of a position, clamped to the grid."""
+        left, top, _, _ = self.bounds
+        column = min(max(int((x - left) // self.resolution), 0), self.columns - 1)
+        row = min(max(int((y - top) // self.resolution), 0), self.rows - 1)
+        return row, column
+
+    def update_from_agent(self, agent, max_range: float | None = None) -> np.ndarray:
+        """Add the agent's latest scan, taken from its current pose, and return the cells it updated."""
+        return self.update(agent.x, agent.y, agent.direction, agent.lidar_angles, agent.lidar_ranges,
+                    agent.lidar_max_range, max_range)
+
+    def update(
+        self,
+        x: float,
+        y: float,
+        direction: float,
+        angles,
+        ranges,
+        lidar_max_range: float,
+        max_range: float | None = None,
+    ) -> np.ndarray:
+        """
+        Add one scan.
+
+        Args:
+            x (float): X-coordinate of the scan; beams start at the truncated position, as in Agent.scan.
+            y (float): Y-coordinate of the scan.
+            direction (float): Heading in degrees.
+            angles (array-like): Beam angles relative to the heading, in degrees.
+            ranges (array-like): Range of each beam.
+            lidar_max_range (float): Range reported by beams that hit nothing.
+            max_range (float, optional): Only map this far from the agent. Defaults to the whole beam.
+
+        Returns:
+            np.ndarray: Flat indices (row * columns + column) of the cells the scan updated.
+        """
+        ranges = np.asarray(ranges, dtype=np.float64)
+        if not len(ranges):
+            return np.empty(0, dtype=np.intp)
+        radians = np.radians(direction + np.asarray(angles, dtype=np.float64))
+        hit = ranges < lidar_max_range
+        if max_range is not None:
+            hit &= ranges <= max_range
+            ranges = np.minimum(ranges, max_range)
+
+        # Free samples every half cell along each beam, stopping short of where it ended
+        step = self.resolution / 2
+        margin = self.resolution / 4
+        counts = np.maximum(np.ceil((ranges - margin) / step).astype(np.intp), 0)
+        beam = np.repeat(np.arange(len(ranges)), counts)
+        distance = (np.arange(len(beam)) - np.repeat(np.cumsum(counts) - counts, counts)) * step
+        num_free = len(beam)
+        # Occupied just past the end of each beam that hit something, i.e. inside the obstacle
+        hit_beams = np.flatnonzero(hit)
+        beam = np.concatenate([beam, hit_beams])
+        distance = np.concatenate([distance, ranges[hit_beams] + margin])
+
+        origin_x, origin_y = int(x), int(y)
+        sample_x = origin_x + distance * np.cos(radians[beam])
+        sample_y = origin_y - distance * np.sin(radians[beam])
+        left, top, _, _ = self.bounds
+        columns = np.floor((sample_x - left) / self.resolution).astype(np.intp)
+        rows = np.floor((sample_y - top) / self.resolution).astype(np.intp)
+        inside = (columns >= 0) & (columns < self.columns) & (rows >= 0) & (rows < self.rows)
+        cells = rows * self.columns + columns
+
+        # Every cell is updated once per scan, and a cell hit by any beam counts as occupied
+        occupied = np.unique(cells[num_free:][inside[num_free:]])
+        free = np.unique(cells[:num_free][inside[:num_free]])
+        free = free[~np.isin(free, occupied, assume_unique=True)]
+        cells = np.concatenate([free, occupied])
+        values = np.concatenate([
+            np.full(len(free), LOG_ODDS_FREE, dtype=np.float32),
+            np.full(len(occupied), LOG_ODDS_OCCUPIED, dtype=np.float32),
+        ])
+        self._add(cells // self.columns, cells % self.columns, values)
+        self.scans += 1
+        return cells
+
+    def _add(self, rows: np.ndarray, columns: np.ndarray, values: np.ndarray) -> None:
+        # Apply updates tile by tile; the cells are unique, so plain indexing adds once each
+        size = self.tile_size
+        keys = (rows // size) * self.tile_columns + columns // size
+        order = np.argsort(keys, kind="stable")
+        keys, rows, columns, values = keys[order], rows[order] % size, columns[order] % size, values[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else []
+        ends = np.r_[starts[1:], len(keys)] if len(keys) else []
+        for start, end in zip(starts, ends):
+            key = int(keys[start])
+            tile = self.tiles.get(key)
+            if tile is None:
+                tile = self.tiles[key] = np.zeros((size, size), dtype=np.float32)
+            tile_rows, tile_columns = rows[start:end], columns[start:end]
+            tile[tile_rows, tile_columns] = np.clip(
+                tile[tile_rows, tile_columns] + values[start:end], -LOG_ODDS_LIMIT, LOG_ODDS_LIMIT
+            )
+
+    def values(self, rows: np.ndarray, columns: np.ndarray) -> np.ndarray:
+        """Log-odds of the given cells, read from their tiles; cells of tiles never allocated are 0."""
+        size = self.tile_size
+        keys = (rows // size) * self.tile_columns + columns // size
+        values = np.zeros(len(keys), dtype=np.float32)
+        for key in np.unique(keys).tolist():
+            tile = self.tiles.get(key)
+            if tile is not None:
+                in_tile = keys == key
+                values[in_tile] = tile[rows[in_tile] % size, columns[in_tile] % size]
+        return values
+
+    def is_frontier(self, cells: np.ndarray) -> np.ndarray:
+        """
+        Which of the given cells are frontier cells: seen empty more than occupied, and next to a cell never observed.
+
+        Only the cell and its four neighbours are read, so the frontier can be
+        kept up to date by checking the cells a scan changed and their neighbours.
+
+        Args:
+            cells (np.ndarray): Flat cell indices, row * columns + column.
+
+        Returns:
+            np.ndarray: Boolean mask, shape of cells.
+        """
+        rows, columns = np.divmod(cells, self.columns)
+        free = self.values(rows, columns) < 0
+        next_rows = (rows + np.array([[-1], [1], [0], [0]])).ravel()
+        next_columns = (columns + np.array([[0], [0], [-1], [1]])).ravel()
+        # Beyond the edge of the world there is nothing to explore
+        inside = (next_rows >= 0) & (next_rows < self.rows) & (next_columns >= 0) & (next_columns < self.columns)
+        unknown = np.zeros(len(next_rows), dtype=bool)
+        unknown[inside] = self.values(next_rows[inside], next_columns[inside]) == 0
+        return free & unknown.reshape(4, -1).any(axis=0)
+
+    def coverage(self) -> float:
+        """Percentage of the cells of the world that have been observed."""
+        observed = sum(np.count_nonzero(tile) for tile in self.tiles.values())
+        return 100.0 * observed / (self.rows * self.columns)
+
+    def log_odds(self) -> np.ndarray:
+        """Log-odds of every cell as one array, shape (rows, columns); unknown cells are 0."""
+        size = self.tile_size
+        grid = np.zeros((-(-self.rows // size) * size, self.tile_columns * size), dtype=np.float32)
+        for key, tile in self.tiles.items():
+            tile_row, tile_column = divmod(key, self.tile_columns)
+            grid[tile_row * size : (tile_row + 1) * size, tile_column * size : (tile_column + 1) * size] = tile
+        return grid[: self.rows, : self.columns]
+
+    def probabilities(self) -> np.ndarray:
+        """Probability that each cell is occupied, shape (rows, columns)."""
+        return 1 / (1 + np.exp(-self.log_odds()))
+
+    def occupied(self, threshold: float = OCCUPIED_THRESHOLD) -> np.ndarray:
+        """Boolean mask of the cells believed to be walls, shape (rows, columns)."""
+        return self.log_odds() > math.log(threshold / (1 - threshold))
+
+    def inflate(self, radius: float, occupied: np.ndarray | None = None) -> np.ndarray:
+        """
+        Mask of the cells whose centre is within radius of an occupied cell, for planning a body's centre.
+
+        Args:
+            radius (float): Clearance to keep, e.g. body radius plus a buffer.
+            occupied (np.ndarray, optional): Occupied mask to inflate. Defaults to self.occupied().
+
+        Returns:
+            np.ndarray: Boolean mask, shape (rows, columns).
+        """
+        if occupied is None:
+            occupied = self.occupied()
+        reach = int(radius // self.resolution) + 1
+        blocked = occupied.copy()
+        rows, columns = occupied.shape
+        for row_offset in range(-reach, reach + 1):
+            for column_offset in range(-reach, reach + 1):
+                # Distance from a cell centre to the closest point of the cell at this offset
+                gap = math.hypot(max(abs(row_offset) - 0.5, 0), max(abs(column_offset) - 0.5, 0))
+                if gap * self.resolution >= radius:
+                    continue
+                target = blocked[
+                    max(0, row_offset) : rows + min(0, row_offset),
+                    max(0, column_offset) : columns + min(0, column_offset),
+                ]
+                target |= occupied[
+                    max(0, -row_offset) : rows + min(0, -row_offset),
+                    max(0, -column_offset) : columns + min(0, -column_offset),
+                ]
+        return blocked
+
+    def rects(self, threshold: float = OCCUPIED_THRESHOLD) -> np.ndarray:
+        """
+        Occupied cells as wall rectangles, merging runs of cells along each row.
+
+        Returns:
+            np.ndarray: Rectangles (left, top, right, bottom), shape (K, 4).
+        """
+        occupied = self.occupied(threshold)
+        padded = np.zeros((self.rows, self.columns + 2), dtype=np.int8)
+        padded[:, 1:-1] = occupied
+        change = np.diff(padded, axis=1)
+        # Starts and ends come in the same row-major order, so they pair up
+        rows, starts = np.nonzero(change == 1)
+        _, ends = np.nonzero(change == -1)
+        left, top, _, _ = self.bounds
+        return np.column_stack([
+            left + starts * self.resolution,
+            top + rows * self.resolution,
+            left + ends * self.resolution,
+            top + (rows + 1) * self.resolution,
+        ]).astype(np.float64)
+
+    def walls(self, threshold: float = OCCUPIED_THRESHOLD) -> list:
+        """Occupied cells as Wall objects, for code such as ControllerAStar that plans around walls."""
+        return [
+            Wall(round(left), round(top), round(right - left), round(bottom - top))
+            for left, top, right, bottom in self.rects(threshold)
+        ]
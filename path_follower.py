@@ -0,0 +1,196 @@
+import bisect
+import math
+
+
+class PurePursuit:
+    """
+    Pure-pursuit path follower for an agent that drives along its heading.
+
+    Each tick the agent steers along the arc to the point `lookahead` further
+    along the path than the point of the path closest to it. Where that arc
+    is too tight to turn at angular_speed at full speed, the agent slows down.
+    The path is tracked continuously as a polyline, so sparse waypoints work
+    as well as dense ones. Further segments are only searched once the
+    lookahead reaches past the current one, and steering works with dot and
+    cross products rather than angles, so a tick costs a few multiplications
+    and one sine and cosine of the heading. The distance from the agent to
+    the path, the cross-track error, is kept for every tick.
+    """
+
+    def __init__(self, agent, lookahead: float = 30.0, goal_tolerance: float = 2.0) -> None:
+        """
+        Initialize the PurePursuit follower.
+
+        Args:
+            agent (Agent): The agent to steer.
+            lookahead (float, optional): Distance along the path to steer towards. Defaults to 30.
+            goal_tolerance (float, optional): Distance from the end of the path that counts as
+                arrived. Defaults to 2.
+        """
+        self.agent = agent
+        self.lookahead = lookahead
+        self.goal_tolerance = goal_tolerance
+        self.points = []
+        self.lengths = []  # Distance along the path to each point
+        self.segments = []  # (x, y, unit dx, unit dy, length) of each segment
+        self.segment = 0  # Segment with the point of the path closest to the agent
+        self.progress = 0.0  # Distance along the path to that point
+        self.reach = lookahead  # Lookahead in use, shortened after bumping into something
+        self.cross_track_error = 0.0
+        self.error_sum = 0.0
+        self.error_max = 0.0
+        self.ticks = 0
+
+    def set_path(self, path: list, start: tuple) -> None:
+        """
+        Follow a new path.
+
+        Args:
+            path (list): Waypoints (x, y), dense or sparse.
+            start (tuple): Where the agent joins the path, normally its position.
+        """
+        points = [start, *path]
+        lengths = [0.0]
+        segments = []
+        for (x1, y1), (x2, y2) in zip(points, points[1:]):
+            dx, dy = x2 - x1, y2 - y1
+            length = math.hypot(dx, dy)
+            lengths.append(lengths[-1] + length)
+            segments.append((x1, y1, dx / length, dy / length, length) if length else (x1, y1, 0.0, 0.0, 0.0))
+        self.points = points
+        self.lengths = lengths
+        self.segments = segments
+        self.segment = 0
+        self.progress = 0.0
+        self.reach = self.lookahead
+
+    def reset_errors(self) -> None:
+        """Start a new cross-track error summary, e.g. for a new goal."""
+        self.error_sum = 0.0
+        self.error_max = 0.0
+        self.ticks = 0
+
+    def errors(self) -> dict:
+        """Mean and largest cross-track error since reset_errors()."""
+        return {
+            "mean_cross_track_error": self.error_sum / self.ticks if self.ticks else 0.0,
+            "max_cross_track_error": self.error_max,
+        }
+
+    def track(self) -> None:
+        """Find the point of the path closest to the agent, searching ahead of the last one."""
+        x, y = self.agent.x, self.agent.y
+        segments, lengths = self.segments, self.lengths
+        # The closest point cannot have moved further than the agent could see and go,
+        # so later segments are only searched once that reaches past the current one
+        limit = self.progress + self.reach + self.agent.linear_speed
+        best = math.inf
+        index = self.segment
+        while index < len(segments) and lengths[index] <= limit:
+            x1, y1, unit_x, unit_y, length = segments[index]
+            offset_x, offset_y = x - x1, y - y1
+            along = offset_x * unit_x + offset_y * unit_y
+            if along <= 0:
+                along, distance = 0.0, math.hypot(offset_x, offset_y)
+            elif along >= length:
+                along, distance = length, math.hypot(offset_x - unit_x * length, offset_y - unit_y * length)
+            else:
+                # Beside the segment, the distance is the cross product with its direction
+                distance = abs(offset_x * unit_y - offset_y * unit_x)
+            if distance < best:
+                best = distance
+                closest = index
+                closest_along = along
+            index += 1
+
+        if best == math.inf:
+            end_x, end_y = self.points[-1]
+            error = math.hypot(end_x - x, end_y - y)
+        else:
+            error = best
+            self.segment = closest
+            progress = lengths[closest] + closest_along
+            if progress > self.progress:
+                self.progress = progress
+        self.cross_track_error = error
+        self.error_sum += error
+        if error > self.error_max:
+            self.error_max = error
+        self.ticks += 1
+
+    def point_at(self, distance: float) -> tuple:
+        """The point of the path at a distance along it, clamped to its end."""
+        points, lengths = self.points, self.lengths
+        if distance >= lengths[-1]:
+            return points[-1]
+        index = self.segment
+        if lengths[index + 1] <= distance:
+            index = min(bisect.bisect_right(lengths, distance, index) - 1, len(points) - 2)
+        x1, y1, unit_x, unit_y, _ = self.segments[index]
+        along = distance - lengths[index]
+        return x1 + unit_x * along, y1 + unit_y * along
+
+    def step(self) -> bool:
+        """
+        Steer and move the agent for one tick.
+
+        Returns:
+            bool: True once the agent has reached the end of the path.
+        """
+        if len(self.points) < 2:
+            return True
+        agent = self.agent
+        self.track()
+        x, y = agent.x, agent.y
+        end_x, end_y = self.points[-1]
+        to_end = (end_x - x) ** 2 + (end_y - y) ** 2  # Squared, as are the distances below
+        if to_end <= self.goal_tolerance * self.goal_tolerance:
+            return True
+
+        target_x, target_y = self.point_at(self.progress + self.reach)
+        dx, dy = target_x - x, target_y - y
+        # The target in the agent's frame: ahead along the heading and to its left,
+        # anticlockwise on screen like the agent's direction
+        heading = math.radians(agent.direction)
+        cos, sin = math.cos(heading), math.sin(heading)
+        ahead = cos * dx - sin * dy
+        left = -sin * dx - cos * dy
+        if ahead < 0 or not (ahead or left):
+            # Target behind the agent, turn on the spot
+            error = math.degrees(math.atan2(left, ahead))
+            agent.direction = (agent.direction + max(-agent.angular_speed, min(agent.angular_speed, error))) % 360
+            return False
+
+        # The arc through the target, driven only as fast as it can be turned
+        curvature = 2 * left / (dx * dx + dy * dy)
+        speed = agent.linear_speed
+        if to_end < speed * speed:
+            speed = math.sqrt(to_end)
+        if curvature:
+            speed = min(speed, math.radians(agent.angular_speed) / abs(curvature))
+        turn = math.degrees(speed * curvature)
+
+        # Half the turn before and half after the move follows the arc's chord
+        agent.direction = (agent.direction + turn / 2) % 360
+        agent.try_move(move_forward=True, distance=speed)
+        agent.direction = (agent.direction + turn / 2) % 360
+
+        if agent.bump_sensor:
+            # Cutting a corner into a wall, hold on to the path more tightly
+            self.reach = max(1.0, self.reach / 2)
+        else:
+            self.reach = min(self.lookahead, self.reach + speed)
+        return False
+
+    def get_state(self):
+        # Path lists are replaced by set_path, never changed in place
+        return (
+            self.points, self.lengths, self.segments, self.segment, self.progress, self.reach,
+            self.cross_track_error, self.error_sum, self.error_max, self.ticks,
+        )
+
+    def set_state(self, state):
+        (
+            self.points, self.lengths, self.segments, self.segment, self.progress, self.reach,
+            self.cross_track_error, self.error_sum, self.error_max, self.ticks,
+        ) = state
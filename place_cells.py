@@ -0,0 +1,220 @@
+import numpy as np
+
+from coverage_grid import ArenaGrid
+
+
+class PlaceCellPopulation:
+    """
+    Population of place cells with Gaussian firing fields.
+
+    Every cell fires at peak_rate at its field centre, falling off as a
+    Gaussian of the distance from it. Rates for all cells are computed at once
+    with NumPy, for a single pose or a batch of poses from many agents.
+    """
+
+    def __init__(
+        self,
+        centers,
+        widths=50.0,
+        peak_rate: float = 20.0,
+        lidar_weights=None,
+        lidar_max_range: float = 2000.0,
+    ) -> None:
+        """
+        Initialize the PlaceCellPopulation.
+
+        Args:
+            centers (array-like): Field centres, shape (N, 2), in world coordinates.
+            widths (float or array-like, optional): Standard deviation of each field, scalar or shape (N,). Defaults to 50.
+            peak_rate (float, optional): Firing rate at a field centre in Hz. Defaults to 20.
+            lidar_weights (array-like, optional): Weights from LiDAR beams to cells, shape (N, beams),
+                adding a sensory drive to the rates. Defaults to None for purely spatial firing.
+            lidar_max_range (float, optional): Range used to normalize LiDAR readings. Defaults to 2000.
+        """
+        self.centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+        self.widths = np.broadcast_to(
+            np.asarray(widths, dtype=np.float64), (len(self.centers),)
+        ).copy()
+        self.peak_rate = peak_rate
+        self.lidar_weights = None if lidar_weights is None else np.asarray(lidar_weights, dtype=np.float64)
+        self.lidar_max_range = lidar_max_range
+
+        # Terms reused by every evaluation
+        self._inverse_variance = 1.0 / (2.0 * self.widths**2)
+        self._center_norms = np.einsum("ij,ij->i", self.centers, self.centers)
+
+    @classmethod
+    def random(cls, num_cells: int, bounds: tuple, widths=50.0, rng=None, **kwargs):
+        """
+        Create a population with field centres scattered uniformly over the world.
+
+        Args:
+            num_cells (int): Number of cells.
+            bounds (tuple): (left, top, right, bottom) of the world.
+            widths (float or array-like, optional): Field widths. Defaults to 50.
+            rng (np.random.Generator, optional): Random generator. Defaults to a fresh one.
+
+        Returns:
+            PlaceCellPopulation: The new population.
+        """
+        rng = np.random.default_rng() if rng is None else rng
+        left, top, right, bottom = bounds
+        centers = rng.uniform((left, top), (right, bottom), size=(num_cells, 2))
+        return cls(centers, widths, **kwargs)
+
+    @classmethod
+    def grid(cls, bounds: tuple, spacing: float, widths=None, **kwargs):
+        """
+        Create a population with field centres on a regular grid.
+
+        Args:
+            bounds (tuple): (left, top, right, bottom) of the world.
+            spacing (float): Distance between neighbouring centres.
+            widths (float or array-like, optional): Field widths. Defaults to half the spacing.
+
+        Returns:
+            PlaceCellPopulation: The new population.
+        """
+        left, top, right, bottom = bounds
+        xs = np.arange(left + spacing / 2, right, spacing)
+        ys = np.arange(top + spacing / 2, bottom, spacing)
+        grid_x, grid_y = np.meshgrid(xs, ys)
+        centers = np.column_stack([grid_x.ravel(), grid_y.ravel()])
+        return cls(centers, spacing / 2 if widths is None else widths, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.centers)
+
+    def rates(self, positions, lidar=None) -> np.ndarray:
+        """
+        Compute the firing rates of every cell for a batch of positions.
+
+        Args:
+            positions (array-like): Positions, shape (M, 2).
+            lidar (array-like, optional): LiDAR ranges for each position, shape (M, beams).
+                Only used if the population has lidar_weights.
+
+        Returns:
+            np.ndarray: Firing rates in Hz, shape (M, N).
+        """
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        # Squared distances as |p|^2 + |c|^2 - 2 p.c, which turns the bulk of the
+        # work into one matrix product instead of an (M, N, 2) difference array
+        squared = (
+            np.einsum("ij,ij->i", positions, positions)[:, None]
+            + self._center_norms[None, :]
+            - 2.0 * positions @ self.centers.T
+        )
+        np.maximum(squared, 0.0, out=squared)  # Rounding can make it slightly negative
+        squared *= -self._inverse_variance
+        rates = np.exp(squared, out=squared)
+        rates *= self.peak_rate
+
+        if lidar is not None and self.lidar_weights is not None:
+            normalized = np.asarray(lidar, dtype=np.float64).reshape(len(positions), -1) / self.lidar_max_range
+            rates += normalized @ self.lidar_weights.T
+            np.maximum(rates, 0.0, out=rates)
+        return rates
+
+    def rates_at(self, x: float, y: float, lidar=None) -> np.ndarray:
+        """
+        Compute the firing rates of every cell at one position.
+
+        Args:
+            x (float): X-coordinate.
+            y (float): Y-coordinate.
+            lidar (array-like, optional): LiDAR ranges at this position.
+
+        Returns:
+            np.ndarray: Firing rates in Hz, shape (N,).
+        """
+        return self.rates(((x, y),), None if lidar is None else (lidar,))[0]
+
+    def decode(self, rates) -> np.ndarray:
+        """
+        Estimate positions from population activity as the rate-weighted mean of field centres.
+
+        Args:
+            rates (array-like): Firing rates, shape (N,) or (M, N).
+
+        Returns:
+            np.ndarray: Estimated positions, shape (2,) or (M, 2).
+        """
+        rates = np.asarray(rates, dtype=np.float64)
+        total = rates.sum(axis=-1, keepdims=True)
+        return (rates @ self.centers) / np.where(total > 0, total, 1.0)
+
+
+class RateMap:
+    """
+    Online estimate of each cell's firing rate as a function of position.
+
+    The arena is divided into square bins. Every update adds the time spent in
+    a bin and the spikes expected there, so the map is refined step by step
+    without keeping the trajectory, and rate_map() divides one by the other.
+    """
+
+    def __init__(self, num_cells: int, bounds: tuple, bin_size: float = 20.0) -> None:
+        """
+        Initialize the RateMap.
+
+        Args:
+            num_cells (int): Number of cells in the population.
+            bounds (tuple): (left, top, right, bottom) of the world.
+            bin_size (float, optional): Side of a square bin in world units. Defaults to 20.
+        """
+        self.grid = ArenaGrid(bounds, bin_size)
+        self.num_cells = num_cells
+        self.occupancy = np.zeros(self.grid.size)
+        self.rate_sums = np.zeros((self.grid.size, num_cells))
+
+    def add(self, x: float, y: float, rates, dt: float = 1.0) -> None:
+        """
+        Add one step at a position.
+
+        Args:
+            x (float): X-coordinate.
+            y (float): Y-coordinate.
+            rates (array-like): Firing rates of every cell, shape (N,).
+            dt (float, optional): Time spent at the position. Defaults to 1.
+        """
+        index = self.grid.bin_index(x, y)
+        self.occupancy[index] += dt
+        self.rate_sums[index] += np.asarray(rates) * dt
+
+    def add_batch(self, positions, rates, dt: float = 1.0) -> None:
+        """
+        Add many steps at once, e.g. a chunk of a recording or one step of many agents.
+
+        Args:
+            positions (array-like): Positions, shape (M, 2).
+            rates (array-like): Firing rates at each position, shape (M, N).
+            dt (float, optional): Time spent at each position. Defaults to 1.
+        """
+        indices = self.grid.bin_indices(positions)
+        self.occupancy += np.bincount(indices, minlength=len(self.occupancy)) * dt
+        np.add.at(self.rate_sums, indices, np.asarray(rates) * dt)
+
+    def merge(self, other: "RateMap") -> None:
+        """Add in the accumulated data of another RateMap over the same grid."""
+        if not self.grid.same_as(other.grid) or other.num_cells != self.num_cells:
+            raise ValueError("Rate maps must have the same grid and number of cells to merge")
+        self.occupancy += other.occupancy
+        self.rate_sums += other.rate_sums
+
+    def rate_map(self, cell: int | None = None) -> np.ndarray:
+        """
+        Get the mean firing rate in each bin.
+
+        Args:
+            cell (int, optional): Only return the map of this cell.
+
+        Returns:
+            np.ndarray: Rates of shape (N, rows, columns), or (rows, columns) for one cell.
+                Bins that were never visited are NaN.
+        """
+        sums = self.rate_sums if cell is None else self.rate_sums[:, cell : cell + 1]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rates = sums / self.occupancy[:, None]
+        rates = rates.T.reshape(-1, self.grid.rows, self.grid.columns)
+        return rates[0] if cell is not None else rates
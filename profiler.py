@@ -0,0 +1,199 @@
+import csv
+import json
+import time
+from collections import deque
+
+
+class _NullScope:
+    """Context manager that does nothing, used for every scope while profiling is off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SCOPE = _NullScope()
+
+
+class _TimingScope:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Profiler:
+    """
+    Lightweight named timing scopes and counters for the simulator's hot paths.
+
+    While disabled, scope() hands back a shared no-op context manager and callers
+    guard counters with `if PROFILER.enabled:`, so instrumentation costs a branch.
+    While enabled, the most recent samples of each scope are kept in rolling
+    windows for percentiles, and counters are kept as totals and per-second rates.
+    """
+
+    def __init__(self, window: int = 300) -> None:
+        """
+        Initialize the Profiler.
+
+        Args:
+            window (int, optional): Number of recent samples kept per scope. Defaults to 300.
+        """
+        self.enabled = False
+        self.window = window
+        self.samples: dict[str, deque] = {}
+        self.totals: dict[str, float] = {}
+        self.calls: dict[str, int] = {}
+        self.counters: dict[str, int] = {}
+        self.rates: dict[str, float] = {}
+        self._rate_start = time.perf_counter()
+        self._rate_counts: dict[str, int] = {}
+
+    def scope(self, name: str):
+        """
+        Time a block of code under a name.
+
+        Args:
+            name (str): Name of the phase, e.g. "sim.scan".
+
+        Returns:
+            A context manager that records the block's duration when enabled.
+        """
+        if not self.enabled:
+            return _NULL_SCOPE
+        return _TimingScope(self, name)
+
+    def add_time(self, name: str, seconds: float) -> None:
+        """Record one timing sample for a scope."""
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=self.window)
+            self.totals[name] = 0.0
+            self.calls[name] = 0
+        samples.append(seconds)
+        self.totals[name] += seconds
+        self.calls[name] += 1
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Add to a named counter, e.g. rays cast or nodes expanded."""
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def update_rates(self) -> None:
+        """Refresh the per-second counter rates, at most once a second."""
+        now = time.perf_counter()
+        elapsed = now - self._rate_start
+        if elapsed < 1.0:
+            return
+        counters = dict(self.counters)
+        self.rates = {
+            name: (total - self._rate_counts.get(name, 0)) / elapsed
+            for name, total in counters.items()
+        }
+        self._rate_counts = counters
+        self._rate_start = now
+
+    def reset(self) -> None:
+        """Discard all samples and counters."""
+        self.samples.clear()
+        self.totals.clear()
+        self.calls.clear()
+        self.counters.clear()
+        self.rates.clear()
+        self._rate_counts.clear()
+        self._rate_start = time.perf_counter()
+
+    @staticmethod
+    def _percentile(ordered: list, fraction: float) -> float:
+        index = min(len(ordered) - 1, int(fraction * len(ordered)))
+        return ordered[index]
+
+    def percentiles(self, name: str) -> tuple[float, float, float]:
+        """
+        Get the rolling 50th, 95th and 99th percentile durations of a scope.
+
+        Returns:
+            tuple: (p50, p95, p99) in seconds, zeros if there are no samples.
+        """
+        samples = self.samples.get(name)
+        if not samples:
+            return 0.0, 0.0, 0.0
+        ordered = sorted(samples)
+        return (
+            self._percentile(ordered, 0.50),
+            self._percentile(ordered, 0.95),
+            self._percentile(ordered, 0.99),
+        )
+
+    def summary(self) -> dict:
+        """
+        Summarize every scope and counter.
+
+        Returns:
+            dict: {"scopes": {name: stats}, "counters": {name: stats}} with times in milliseconds.
+        """
+        scopes = {}
+        for name in sorted(self.samples):
+            p50, p95, p99 = self.percentiles(name)
+            calls = self.calls[name]
+            scopes[name] = {
+                "calls": calls,
+                "total_ms": self.totals[name] * 1000,
+                "mean_ms": self.totals[name] * 1000 / calls if calls else 0.0,
+                "p50_ms": p50 * 1000,
+                "p95_ms": p95 * 1000,
+                "p99_ms": p99 * 1000,
+            }
+        counters = {
+            name: {"total": total, "per_second": self.rates.get(name, 0.0)}
+            for name, total in sorted(self.counters.items())
+        }
+        return {"scopes": scopes, "counters": counters}
+
+    def overlay_lines(self) -> list[str]:
+        """Format the summary as short lines for the on-screen overlay."""
+        summary = self.summary()
+        lines = ["scope: p50 / p95 / p99 ms"]
+        for name, stats in summary["scopes"].items():
+            lines.append(
+                f"{name}: {stats['p50_ms']:.2f} / {stats['p95_ms']:.2f} / {stats['p99_ms']:.2f}"
+            )
+        for name, stats in summary["counters"].items():
+            lines.append(f"{name}: {stats['per_second']:,.0f}/s")
+        return lines
+
+    def export_json(self, filename: str) -> None:
+        """Write the summary to a JSON file."""
+        with open(filename, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def export_csv(self, filename: str) -> None:
+        """Write the summary to a CSV file with one row per scope or counter."""
+        summary = self.summary()
+        with open(filename, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(
+                ["kind", "name", "calls", "total_ms", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "total", "per_second"]
+            )
+            for name, stats in summary["scopes"].items():
+                writer.writerow(
+                    ["scope", name, stats["calls"], stats["total_ms"], stats["mean_ms"],
+                     stats["p50_ms"], stats["p95_ms"], stats["p99_ms"], "", ""]
+                )
+            for name, stats in summary["counters"].items():
+                writer.writerow(
+                    ["counter", name, "", "", "", "", "", "", stats["total"], stats["per_second"]]
+                )
+
+
+# Shared instance used by the instrumented modules
+PROFILER = Profiler()
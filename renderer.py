@@ -0,0 +1,269 @@
+import math
+
+import numpy as np
+import pygame
+from constants import BLACK, BLUE, GRAY, PURPLE, WHITE
+from profiler import PROFILER
+
+
+class SceneRenderer:
+    """
+    Draws the simulator window using a cached static layer and dirty rects.
+
+    The arena, walls, buttons and text are pre-rendered into a background
+    surface that is only rebuilt when the world, camera or UI changes. Each
+    frame only the agent, its LiDAR, the text inputs and changed text are
+    redrawn, and just those areas are pushed with pygame.display.update.
+    """
+
+    LINE_HEIGHT = 20
+
+    def __init__(self, screen: pygame.Surface, camera) -> None:
+        """
+        Initialize the SceneRenderer.
+
+        Args:
+            screen (pygame.Surface): The display surface.
+            camera (Camera): View used to draw the world.
+        """
+        self.screen = screen
+        self.camera = camera
+        self.background = pygame.Surface(screen.get_size()).convert()
+        self.world_dirty = True
+        self.ui_dirty = True
+        self.camera_key = None
+        self.drawn_text = None
+        self.text_rect = pygame.Rect(0, 0, 0, 0)
+        self.dynamic_rects: list[pygame.Rect] = []
+        self.heatmap = None  # (surface, bounds, bin_size) drawn under the walls
+
+    def invalidate_world(self) -> None:
+        """Mark the arena and walls as changed, e.g. after loading a world."""
+        self.world_dirty = True
+
+    def invalidate_ui(self) -> None:
+        """Mark the buttons and text as changed."""
+        self.ui_dirty = True
+
+    def set_heatmap(self, surface: pygame.Surface | None, bounds: tuple = None, bin_size: float = None) -> None:
+        """
+        Show a heatmap over the arena, or remove it.
+
+        Args:
+            surface (pygame.Surface): One pixel per bin, e.g. from render_heatmap(), or None to remove it.
+            bounds (tuple, optional): (left, top, right, bottom) of the world area the bins cover.
+            bin_size (float, optional): Side of a bin in world units.
+        """
+        self.heatmap = None if surface is None else (surface, bounds, bin_size)
+        self.world_dirty = True
+
+    def _draw_heatmap(self) -> None:
+        surface, (left, top, _, _), bin_size = self.heatmap
+        columns, rows = surface.get_size()
+
+        # Only scale up the bins in view, so zooming in never builds a huge surface
+        view_left, view_top, view_right, view_bottom = self.camera.visible_world_rect()
+        first_column = min(max(int((view_left - left) // bin_size), 0), columns)
+        first_row = min(max(int((view_top - top) // bin_size), 0), rows)
+        last_column = min(max(int(-(-(view_right - left) // bin_size)), 0), columns)
+        last_row = min(max(int(-(-(view_bottom - top) // bin_size)), 0), rows)
+        if last_column <= first_column or last_row <= first_row:
+            return
+
+        visible = surface.subsurface(
+            (first_column, first_row, last_column - first_column, last_row - first_row)
+        )
+        world_rect = pygame.Rect(
+            left + first_column * bin_size,
+            top + first_row * bin_size,
+            (last_column - first_column) * bin_size,
+            (last_row - first_row) * bin_size,
+        )
+        screen_rect = self.camera.world_rect_to_screen(world_rect)
+        self.background.blit(pygame.transform.scale(visible, screen_rect.size), screen_rect)
+
+    def _draw_world(self, wall_index) -> None:
+        camera = self.camera
+        self.background.set_clip(camera.viewport)
+        self.background.fill(WHITE)
+
+        # Draw the world bounds as the navigation area
+        left, top, right, bottom = camera.bounds
+        arena_rect = pygame.Rect(left, top, right - left, bottom - top)
+        pygame.draw.rect(self.background, GRAY, camera.world_rect_to_screen(arena_rect))
+        if self.heatmap:
+            self._draw_heatmap()
+
+        # Draw only the walls inside the visible part of the world
+        for wall in wall_index.query(*camera.visible_world_rect()):
+            wall.draw(self.background, camera=camera)
+        self.background.set_clip(None)
+
+    def _draw_ui(self, buttons) -> None:
+        self.background.set_clip(None)
+        self.background.fill(WHITE)
+        for button in buttons:
+            button.draw(self.background)
+
+    def _draw_text(self, text_surfaces, text_origin) -> pygame.Rect:
+        x, y = text_origin
+        width = max((surface.get_width() for surface in text_surfaces), default=0)
+        # Cover both the old and the new block so shorter lines don't leave residue
+        rect = pygame.Rect(x, y, width, self.LINE_HEIGHT * len(text_surfaces))
+        if self.text_rect.width:
+            rect.union_ip(self.text_rect)
+        self.background.fill(WHITE, rect)
+        for surface in text_surfaces:
+            self.background.blit(surface, (x, y))
+            y += self.LINE_HEIGHT
+        self.text_rect = rect
+        self.drawn_text = list(text_surfaces)
+        return rect
+
+    def render(
+        self,
+        wall_index,
+        agent,
+        buttons,
+        text_inputs,
+        text_surfaces,
+        text_origin,
+        path=(),
+        overlay=None,
+        others=(),
+    ) -> None:
+        """
+        Draw one frame and push the changed areas to the display.
+
+        Args:
+            wall_index (SpatialHash): Walls indexed by position.
+            agent (Agent): The agent to draw.
+            buttons (list): Buttons making up the UI chrome.
+            text_inputs (list): TextInput fields, redrawn every frame.
+            text_surfaces (list): Rendered lines of the text block.
+            text_origin (tuple): Screen position of the first line of the text block.
+            path (sequence, optional): World-space waypoints of the current plan to draw.
+            overlay (pygame.Surface, optional): Drawn over the top-left of the viewport, e.g. profiler stats.
+            others (sequence, optional): (x, y, direction, body_radius) of other agents to draw.
+        """
+        camera = self.camera
+        screen = self.screen
+        dirty = []
+
+        camera_key = (camera.offset_x, camera.offset_y, camera.zoom, camera.bounds)
+        if camera_key != self.camera_key:
+            self.camera_key = camera_key
+            self.world_dirty = True
+
+        full_redraw = self.ui_dirty
+        with PROFILER.scope("render.static"):
+            if self.ui_dirty:
+                self._draw_ui(buttons)
+                self.text_rect = pygame.Rect(0, 0, 0, 0)
+                self._draw_text(text_surfaces, text_origin)
+                self.world_dirty = True
+                self.ui_dirty = False
+            elif self.drawn_text != text_surfaces:
+                dirty.append(self._draw_text(text_surfaces, text_origin))
+
+            if self.world_dirty:
+                self._draw_world(wall_index)
+                self.world_dirty = False
+                dirty.append(camera.viewport)
+
+        with PROFILER.scope("render.dynamic"):
+            # Restore the static layer wherever something was drawn last frame
+            if full_redraw:
+                screen.blit(self.background, (0, 0))
+            else:
+                for rect in dirty:
+                    screen.blit(self.background, rect, rect)
+                for rect in self.dynamic_rects:
+                    screen.blit(self.background, rect, rect)
+                    dirty.append(rect)
+
+            # Draw the things that move every frame
+            dynamic_rects = []
+            screen.set_clip(camera.viewport)
+            drawn = agent.draw(screen, camera)
+            for pose in others:
+                drawn.union_ip(self._draw_other_agent(*pose))
+            if len(path) > 1:
+                points = [camera.world_to_screen(x, y) for x, y in path]
+                drawn.union_ip(pygame.draw.lines(screen, BLUE, False, points, 1))
+            drawn = drawn.clip(camera.viewport)
+            if drawn.width and drawn.height:
+                dynamic_rects.append(drawn)
+            if overlay:
+                dynamic_rects.append(screen.blit(overlay, camera.viewport.topleft))
+            screen.set_clip(None)
+
+            for text_input in text_inputs:
+                text_input.update()
+                text_input.draw(screen)
+                dynamic_rects.append(text_input.rect.inflate(2, 2))
+
+        self.dynamic_rects = dynamic_rects
+        with PROFILER.scope("render.present"):
+            if full_redraw:
+                pygame.display.flip()
+            else:
+                pygame.display.update(dirty + dynamic_rects)
+
+    def _draw_other_agent(self, x: float, y: float, direction: float, body_radius: float) -> pygame.Rect:
+        # Agents other than the primary one are drawn in purple with a black heading line
+        camera = self.camera
+        end_x = x + body_radius * math.cos(math.radians(direction))
+        end_y = y - body_radius * math.sin(math.radians(direction))
+        center = camera.world_to_screen(x, y)
+        body = pygame.draw.circle(self.screen, PURPLE, center, max(1, camera.scale(body_radius)))
+        end = camera.world_to_screen(end_x, end_y)
+        return body.union(pygame.draw.line(self.screen, BLACK, center, end, 2))
+
+    @staticmethod
+    def render_heatmap(values: np.ndarray, alpha: int = 170) -> pygame.Surface:
+        """
+        Colour a grid of values from blue (low) to red (high) on a log scale.
+
+        Args:
+            values (np.ndarray): Non-negative values, shape (rows, columns). Zero and NaN bins are left transparent.
+            alpha (int, optional): Opacity of the coloured bins. Defaults to 170.
+
+        Returns:
+            pygame.Surface: One pixel per bin.
+        """
+        values = np.nan_to_num(np.asarray(values, dtype=np.float64))
+        scaled = np.log1p(np.maximum(values, 0.0))
+        peak = scaled.max()
+        if peak > 0:
+            scaled /= peak
+        rgba = np.zeros(values.shape + (4,), dtype=np.uint8)
+        rgba[..., 0] = 255 * scaled
+        rgba[..., 1] = 64 * (1 - np.abs(2 * scaled - 1))
+        rgba[..., 2] = 255 * (1 - scaled)
+        rgba[..., 3] = np.where(values > 0, alpha, 0)
+        rows, columns = values.shape
+        return pygame.image.frombuffer(rgba.tobytes(), (columns, rows), "RGBA").copy()
+
+    @staticmethod
+    def render_overlay(lines: list[str], font: pygame.font.Font) -> pygame.Surface:
+        """
+        Render lines of text onto a translucent panel for drawing over the world.
+
+        Args:
+            lines (list[str]): The lines to show.
+            font (pygame.font.Font): Font used for the text.
+
+        Returns:
+            pygame.Surface: The rendered panel.
+        """
+        rendered = [font.render(line, True, BLACK) for line in lines]
+        width = max((surface.get_width() for surface in rendered), default=0) + 10
+        height = len(rendered) * font.get_linesize() + 10
+        panel = pygame.Surface((width, height), pygame.SRCALPHA)
+        panel.fill((255, 255, 255, 200))
+        y = 5
+        for surface in rendered:
+            panel.blit(surface, (5, y))
+            y += font.get_linesize()
+        return panel
@@ -0,0 +1,247 @@
+"""
+Random-access playback and determinism checks for trajectory recordings.
+
+Usage:
+    python replay.py verify recordings/run_<timestamp>.traj
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from agent import Agent
+from controller_astar import ControllerAStar
+from simulation import MOVE_KEYS, Simulation
+from trajectory import TrajectoryReader
+from world import load_world
+
+
+class Replay:
+    """
+    Plays back a memory-mapped recording at any speed, forward or backward.
+
+    Only the frames that are shown are read from disk, so scrubbing through
+    hours of trajectory needs no more memory than a short run. Jumping to the
+    next or previous bump or goal arrival uses the recording's sparse event index.
+    """
+
+    def __init__(self, filename: str) -> None:
+        """
+        Open a recording for playback, paused on its first frame.
+
+        Args:
+            filename (str): File written by a TrajectoryRecorder.
+        """
+        self.reader = TrajectoryReader(filename)
+        self.records = self.reader.records
+        if len(self.records) == 0:
+            raise ValueError(f"{filename} has no recorded steps")
+        self.position = 0.0  # Fractional frame index, so slow playback still advances
+        self.speed = 1.0  # Multiple of real time, negative to play backward
+        self.paused = True
+        self._events = {}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def frame_index(self) -> int:
+        return int(self.position)
+
+    @property
+    def metadata(self) -> dict:
+        return self.reader.metadata
+
+    def frame(self):
+        """Get the record of the current frame."""
+        return self.records[self.frame_index]
+
+    @property
+    def time(self) -> float:
+        """Simulated time of the current frame in seconds."""
+        return float(self.frame()["time"])
+
+    def seek_frame(self, index: int) -> None:
+        """Jump to a frame index, clamped to the recording."""
+        self.position = float(min(max(index, 0), len(self.records) - 1))
+
+    def seek_time(self, seconds: float) -> None:
+        """Jump to the first frame at or after a simulated time."""
+        self.seek_frame(int(np.searchsorted(self.records["time"], seconds)))
+
+    def seek_step(self, step: int) -> None:
+        """Jump to the frame of a simulation step."""
+        self.seek_frame(int(np.searchsorted(self.records["step"], step)))
+
+    def advance(self, seconds: float) -> None:
+        """
+        Move playback forward by an amount of real time.
+
+        Args:
+            seconds (float): Real seconds since the last call.
+        """
+        if self.paused:
+            return
+        self.position += seconds * self.speed / self.reader.time_step
+        last = len(self.records) - 1
+        if not 0 <= self.position <= last:
+            # Stop at either end of the recording
+            self.position = min(max(self.position, 0.0), float(last))
+            self.paused = True
+
+    def step_frames(self, frames: int) -> None:
+        """Move by a number of frames, e.g. 1 or -1 while paused."""
+        self.seek_frame(self.frame_index + frames)
+
+    def event_steps(self, name: str) -> np.ndarray:
+        """Steps at which an event ("bump" or "goal") happened."""
+        if name not in self._events:
+            self._events[name] = self.reader.events(name)
+        return self._events[name]
+
+    def next_event(self, name: str) -> bool:
+        """
+        Jump to the next frame where an event happened.
+
+        Args:
+            name (str): Event name, "bump" or "goal".
+
+        Returns:
+            bool: False if there is no later event.
+        """
+        steps = self.event_steps(name)
+        current = int(self.frame()["step"])
+        index = np.searchsorted(steps, current, side="right")
+        if index >= len(steps):
+            return False
+        self.seek_step(int(steps[index]))
+        return True
+
+    def previous_event(self, name: str) -> bool:
+        """Jump to the previous frame where an event happened, False if there is none."""
+        steps = self.event_steps(name)
+        current = int(self.frame()["step"])
+        index = np.searchsorted(steps, current, side="left") - 1
+        if index < 0:
+            return False
+        self.seek_step(int(steps[index]))
+        return True
+
+    def apply_to(self, agent) -> None:
+        """
+        Copy the current frame's pose and sensor readings onto an agent used for drawing.
+
+        Args:
+            agent (Agent): The agent to update.
+        """
+        record = self.frame()
+        agent.x = float(record["x"])
+        agent.y = float(record["y"])
+        agent.direction = float(record["direction"])
+        agent.bump_sensor = bool(record["bump"])
+        agent.lidar_ranges = record["lidar"].tolist()
+
+
+def resimulate(reader: TrajectoryReader, controller_class=ControllerAStar) -> Simulation:
+    """
+    Build a simulation in the state a recording started from.
+
+    Args:
+        reader (TrajectoryReader): The recording.
+        controller_class (optional): Controller used for the recording. Defaults to ControllerAStar.
+
+    Returns:
+        Simulation: Ready to be stepped in lockstep with the recording.
+    """
+    metadata = reader.metadata
+    initial = metadata["initial"]
+    walls, _, _ = load_world(metadata["world"])
+    agent = Agent(
+        initial["x"],
+        initial["y"],
+        initial["direction"],
+        walls,
+        num_lidar_beams=reader.num_beams,
+        body_radius=metadata["body_radius"],
+        bounds=tuple(metadata["bounds"]),
+    )
+    simulation = Simulation(
+        agent,
+        controller_class(agent, walls),
+        walls,
+        reader.time_step,
+        **metadata.get("rates", {}),
+        seed=metadata.get("seed"),
+    )
+    simulation.restore_initial_state(initial)
+    return simulation
+
+
+def verify_determinism(filename: str, controller_class=ControllerAStar, tolerance: float = 0.0):
+    """
+    Re-simulate a recording step by step and compare it with what was recorded.
+
+    The recorded user commands (goals, controller toggles and movement keys)
+    are applied at the same steps as in the original run.
+
+    Args:
+        filename (str): The recording to check.
+        controller_class (optional): Controller used for the recording. Defaults to ControllerAStar.
+        tolerance (float, optional): Largest allowed difference in pose or LiDAR range. Defaults to 0.
+
+    Returns:
+        int | None: The first step that differs, or None if the whole run was reproduced.
+    """
+    reader = TrajectoryReader(filename)
+    simulation = resimulate(reader, controller_class)
+    commands = reader.commands
+    next_command = 0
+    keys = {key: False for key in MOVE_KEYS}
+
+    for record in reader.records:
+        while next_command < len(commands) and commands[next_command][0] <= simulation.steps:
+            _, name, args = commands[next_command]
+            next_command += 1
+            if name == "keys":
+                keys = dict(zip(MOVE_KEYS, args[0]))
+            elif name == "goal":
+                simulation.apply_command(name, tuple(args[0]))
+            else:
+                simulation.apply_command(name, *args)
+
+        simulation.step(keys)
+        agent = simulation.agent
+        pose = np.array([agent.x, agent.y, agent.direction])
+        recorded_pose = np.array([record["x"], record["y"], record["direction"]])
+        lidar = np.asarray(agent.lidar_ranges, dtype=np.float32)
+        if (
+            simulation.steps != record["step"]
+            or agent.bump_sensor != bool(record["bump"])
+            or lidar.shape != record["lidar"].shape
+            or not np.allclose(pose, recorded_pose, rtol=0, atol=tolerance)
+            or not np.allclose(lidar, record["lidar"], rtol=0, atol=tolerance)
+        ):
+            return int(record["step"])
+    return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    verify = subparsers.add_parser("verify", help="re-simulate a recording and check it is reproduced exactly")
+    verify.add_argument("recording")
+    verify.add_argument("--tolerance", type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.command == "verify":
+        step = verify_determinism(args.recording, tolerance=args.tolerance)
+        if step is not None:
+            print(f"Diverged at step {step}")
+            return 1
+        print("Recording reproduced exactly")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
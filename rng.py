@@ -0,0 +1,39 @@
+"""
+Seeded random streams for stochastic components.
+
+Every random component takes its own NumPy Generator, derived from a root
+seed and a key naming the component, e.g. (agent index,) or (shard index,).
+Streams for different keys are statistically independent, and a stream does
+not depend on which other streams were created or in what order, so a run
+gives bit-identical results whether its parts run serially or in parallel.
+"""
+
+import numpy as np
+
+
+def root_seed(seed: int | None = None) -> int:
+    """
+    Resolve a root seed.
+
+    Args:
+        seed (int, optional): The seed. Defaults to fresh entropy from the OS.
+
+    Returns:
+        int: The seed, to be recorded so the run can be repeated.
+    """
+    return np.random.SeedSequence(seed).entropy
+
+
+def stream(seed: int, *key: int) -> np.random.Generator:
+    """
+    Get the random stream of one component.
+
+    Args:
+        seed (int): Root seed of the run.
+        *key (int): Identifies the component, e.g. its index; the same as the
+            position of SeedSequence(seed).spawn()'s children.
+
+    Returns:
+        np.random.Generator: The component's generator.
+    """
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=key))
@@ -0,0 +1,201 @@
+import math
+import time
+from fractions import Fraction
+
+
+class FrameScheduler:
+    """
+    Fixed-timestep scheduler that decouples simulation ticks from rendered frames.
+
+    With a positive sim rate the simulation is kept in step with real time by
+    accumulating elapsed time and running however many fixed ticks are due.
+    With a sim rate of 0 (max speed) it either runs a fixed number of ticks per
+    frame or as many as fit in the frame budget, so the simulation is no longer
+    limited by how fast pygame can draw.
+    """
+
+    MAX_FRAME_TIME = 0.25  # Don't try to catch up on more than this much real time
+
+    def __init__(
+        self,
+        sim_rate: int = 60,
+        render_rate: int = 60,
+        steps_per_frame: int = 0,
+        max_steps_per_frame: int = 100000,
+    ) -> None:
+        """
+        Initialize the FrameScheduler.
+
+        Args:
+            sim_rate (int, optional): Simulation ticks per real second, 0 for max speed. Defaults to 60.
+            render_rate (int, optional): Maximum rendered frames per second. Defaults to 60.
+            steps_per_frame (int, optional): Ticks per frame at max speed, 0 to fill the frame budget. Defaults to 0.
+            max_steps_per_frame (int, optional): Upper limit on ticks run in one frame. Defaults to 100000.
+        """
+        self.sim_rate = sim_rate
+        self.render_rate = render_rate
+        self.steps_per_frame = steps_per_frame
+        self.max_steps_per_frame = max_steps_per_frame
+        self.accumulator = 0.0
+        self.last_time = None
+
+        # Rolling counters for the HUD, reset once per second
+        self.sim_steps_per_second = 0.0
+        self.render_fps = 0.0
+        self._window_start = time.perf_counter()
+        self._window_steps = 0
+        self._window_frames = 0
+
+    @property
+    def frame_budget(self) -> float:
+        """Real seconds of each frame given to the simulation at max speed."""
+        # Leave a share of the frame for event handling and drawing
+        return 0.8 / self.render_rate if self.render_rate > 0 else 1 / 60
+
+    def advance(self, step) -> int:
+        """
+        Run the simulation ticks due for this frame.
+
+        Args:
+            step (callable): Called with no arguments once per tick.
+
+        Returns:
+            int: The number of ticks run.
+        """
+        now = time.perf_counter()
+        elapsed = 0.0 if self.last_time is None else now - self.last_time
+        self.last_time = now
+        steps = 0
+
+        if self.sim_rate > 0:
+            self.accumulator += min(elapsed, self.MAX_FRAME_TIME)
+            tick = 1 / self.sim_rate
+            due = min(int(self.accumulator / tick), self.max_steps_per_frame)
+            for _ in range(due):
+                step()
+            self.accumulator -= due * tick
+            if due == self.max_steps_per_frame:
+                # Drop the backlog instead of spiralling further behind
+                self.accumulator = 0.0
+            steps = due
+        elif self.steps_per_frame > 0:
+            for _ in range(self.steps_per_frame):
+                step()
+            steps = self.steps_per_frame
+        else:
+            deadline = now + self.frame_budget
+            while steps < self.max_steps_per_frame:
+                step()
+                steps += 1
+                if time.perf_counter() >= deadline:
+                    break
+
+        self._window_steps += steps
+        return steps
+
+    def frame_rendered(self) -> None:
+        """Record that a frame was drawn and refresh the rate counters."""
+        self._window_frames += 1
+        now = time.perf_counter()
+        window = now - self._window_start
+        if window >= 1.0:
+            self.sim_steps_per_second = self._window_steps / window
+            self.render_fps = self._window_frames / window
+            self._window_start = now
+            self._window_steps = 0
+            self._window_frames = 0
+
+
+class ScheduledTask:
+    """A callback run by a RateSchedule at its own rate."""
+
+    __slots__ = ("name", "callback", "rate", "ratio", "period")
+
+    def __init__(self, name: str, callback, rate, base_rate: Fraction) -> None:
+        self.name = name
+        self.callback = callback
+        self.set_rate(rate, base_rate)
+
+    def set_rate(self, rate, base_rate: Fraction) -> None:
+        self.rate = rate
+        # Runs per base tick, kept exact so the schedule never drifts
+        self.ratio = Fraction(1) if rate is None else Fraction(rate).limit_denominator(1000000) / base_rate
+        if self.ratio <= 0:
+            raise ValueError(f"Rate of {self.name!r} must be positive, got {rate}")
+        # Whole number of ticks between runs, for the common case of a rate dividing the base rate
+        self.period = self.ratio.denominator if self.ratio.numerator == 1 else None
+
+    def due(self, step: int) -> int:
+        """Number of times the task runs on a tick."""
+        if self.period is not None:
+            return 1 if step % self.period == 0 else 0
+        return math.ceil((step + 1) * self.ratio) - math.ceil(step * self.ratio)
+
+
+class RateSchedule:
+    """
+    Runs the components of a simulation tick at their own rates in simulated time.
+
+    The simulation ticks at base_rate; a task with a lower rate runs only on
+    the ticks where it is due (a 10 Hz scan on every sixth tick of a 60 Hz
+    simulation, starting with the first), and a task with a higher rate runs
+    several times on some ticks. Whether a task is due depends only on the
+    tick number, and tasks due on the same tick run in the order they were
+    added, so runs are deterministic.
+    """
+
+    def __init__(self, base_rate: float) -> None:
+        """
+        Initialize the RateSchedule.
+
+        Args:
+            base_rate (float): Ticks per simulated second.
+        """
+        self.base_rate = Fraction(base_rate).limit_denominator(1000000)
+        self.tasks: list[ScheduledTask] = []
+
+    def add(self, name: str, callback, rate: float | None = None) -> ScheduledTask:
+        """
+        Add a task after the existing ones.
+
+        Args:
+            name (str): Unique name of the task.
+            callback (callable): Called with no arguments each time the task runs.
+            rate (float, optional): Runs per simulated second. Defaults to None, every tick.
+
+        Returns:
+            ScheduledTask: The new task.
+        """
+        if any(task.name == name for task in self.tasks):
+            raise ValueError(f"A task named {name!r} is already scheduled")
+        task = ScheduledTask(name, callback, rate, self.base_rate)
+        self.tasks.append(task)
+        return task
+
+    def task(self, name: str) -> ScheduledTask:
+        for task in self.tasks:
+            if task.name == name:
+                return task
+        raise KeyError(name)
+
+    def set_rate(self, name: str, rate: float | None) -> None:
+        """Change the rate of a task, None to run it every tick."""
+        self.task(name).set_rate(rate, self.base_rate)
+
+    def remove(self, name: str) -> None:
+        self.tasks.remove(self.task(name))
+
+    def rates(self) -> dict:
+        """Rate of every task by name, None for every tick."""
+        return {task.name: task.rate for task in self.tasks}
+
+    def run(self, step: int) -> None:
+        """
+        Run the tasks due on a tick.
+
+        Args:
+            step (int): Number of the tick, counting from 0.
+        """
+        for task in self.tasks:
+            for _ in range(task.due(step)):
+                task.callback()
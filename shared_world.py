@@ -0,0 +1,250 @@
+import math
+import sys
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from lidar import wall_rects, wall_segments
+from wall import Wall
+from world import load_world
+
+ALIGNMENT = 64
+MAX_GRID_CELLS = 2000  # Largest number of grid cells across the world by default
+MAX_DISTANCE = 1000.0  # Distance field values are capped here, so each wall only updates a window
+
+# Worlds this process has attached to, by shared memory name
+_attached: dict = {}
+
+
+class SharedWorld:
+    """
+    World geometry and derived grids published once in shared memory for worker processes.
+
+    The creating process lays out the wall rectangles, wall and boundary
+    segments, an occupancy grid and a distance field in one
+    multiprocessing.shared_memory block. Workers attach by name with the
+    picklable `info` dict and get read-only NumPy views, so they skip parsing
+    the world and building grids, and the arrays exist once in RAM however
+    many workers there are.
+    """
+
+    def __init__(self, memory: shared_memory.SharedMemory, info: dict, owner: bool) -> None:
+        self.memory = memory
+        self.info = info
+        self.owner = owner
+        self.bounds = tuple(info["bounds"])
+        self.resolution = info["resolution"]
+        self.arrays = {}
+        for key, (offset, shape, dtype) in info["layout"].items():
+            array = np.ndarray(tuple(shape), dtype=np.dtype(dtype), buffer=memory.buf, offset=offset)
+            if not owner:
+                array.flags.writeable = False
+            self.arrays[key] = array
+
+    @classmethod
+    def create(
+        cls, walls: list, bounds: tuple, resolution: float | None = None, max_distance: float = MAX_DISTANCE
+    ) -> "SharedWorld":
+        """
+        Publish a world into a new shared memory block.
+
+        Args:
+            walls (list): Wall objects.
+            bounds (tuple): (left, top, right, bottom) of the world.
+            resolution (float, optional): Side of a grid cell in world units. Defaults to
+                10, or coarser so the grids are at most MAX_GRID_CELLS across.
+            max_distance (float, optional): Cap of the distance field. Defaults to MAX_DISTANCE.
+
+        Returns:
+            SharedWorld: The owning handle; call unlink() when the workers are done.
+        """
+        left, top, right, bottom = bounds
+        if resolution is None:
+            resolution = max(10.0, max(right - left, bottom - top) / MAX_GRID_CELLS)
+        rects = wall_rects(walls)
+        arrays = {
+            "rects": rects,
+            "segments": wall_segments(walls, bounds),
+        }
+        arrays["occupancy"], arrays["distance"] = build_grids(rects, bounds, resolution, max_distance)
+
+        # One block holding every array at an aligned offset
+        layout = {}
+        size = 0
+        for key, array in arrays.items():
+            layout[key] = (size, array.shape, array.dtype.str)
+            size += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+        memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        info = {
+            "name": memory.name,
+            "bounds": list(bounds),
+            "resolution": resolution,
+            "max_distance": max_distance,
+            "layout": layout,
+        }
+        world = cls(memory, info, owner=True)
+        for key, array in arrays.items():
+            world.arrays[key][...] = array
+        return world
+
+    @classmethod
+    def from_file(cls, filename: str, resolution: float | None = None) -> "SharedWorld":
+        """Publish a world loaded from a world JSON file."""
+        walls, _, bounds = load_world(filename)
+        return cls.create(walls, bounds, resolution)
+
+    @classmethod
+    def attach(cls, info: dict) -> "SharedWorld":
+        """
+        Attach to a published world, once per process.
+
+        Args:
+            info (dict): The publishing SharedWorld's info.
+
+        Returns:
+            SharedWorld: Read-only views of the shared arrays.
+        """
+        world = _attached.get(info["name"])
+        if world is None:
+            world = _attached[info["name"]] = cls(attach_shared_memory(info["name"]), info, owner=False)
+        return world
+
+    @property
+    def rects(self) -> np.ndarray:
+        """Wall rectangles (left, top, right, bottom), shape (W, 4)."""
+        return self.arrays["rects"]
+
+    @property
+    def segments(self) -> np.ndarray:
+        """Wall edges and world boundary as segments (x1, y1, x2, y2), shape (E, 4)."""
+        return self.arrays["segments"]
+
+    @property
+    def occupancy(self) -> np.ndarray:
+        """1 for grid cells overlapped by a wall, shape (rows, columns)."""
+        return self.arrays["occupancy"]
+
+    @property
+    def distance(self) -> np.ndarray:
+        """Distance from each grid cell centre to the nearest wall or boundary, capped at max_distance."""
+        return self.arrays["distance"]
+
+    def walls(self) -> list:
+        """Build Wall objects, for code such as Agent that needs them."""
+        return [
+            Wall(int(left), int(top), int(right - left), int(bottom - top))
+            for left, top, right, bottom in self.rects
+        ]
+
+    def cell_indices(self, positions) -> tuple[np.ndarray, np.ndarray]:
+        """Row and column of the grid cell of each position, clamped to the grid."""
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        left, top, _, _ = self.bounds
+        rows, columns = self.distance.shape
+        column = np.clip(((positions[:, 0] - left) // self.resolution).astype(np.intp), 0, columns - 1)
+        row = np.clip(((positions[:, 1] - top) // self.resolution).astype(np.intp), 0, rows - 1)
+        return row, column
+
+    def clearance(self, positions) -> np.ndarray:
+        """
+        Look up the distance to the nearest obstacle for many positions.
+
+        Accurate to about one grid cell; use lidar.free_positions with
+        self.rects where exact collision checks are needed.
+
+        Returns:
+            np.ndarray: Distances, shape (M,).
+        """
+        return self.distance[self.cell_indices(positions)]
+
+    def close(self) -> None:
+        """Release this process's views of the block."""
+        self.arrays.clear()
+        if _attached.get(self.info["name"]) is self:
+            del _attached[self.info["name"]]
+        self.memory.close()
+
+    def unlink(self) -> None:
+        """Close and remove the block; only the creating process should do this."""
+        self.close()
+        if self.owner:
+            self.memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.owner:
+            self.unlink()
+        else:
+            self.close()
+        return False
+
+
+def attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """
+    Open an existing shared memory block without taking part in its cleanup.
+
+    Only the creator may remove a block, but before Python 3.13 attaching
+    registers it with the resource tracker, which then unlinks it when this
+    process exits. Unregistering afterwards is not enough, as worker processes
+    share their parent's tracker, so registration is skipped instead.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def build_grids(
+    rects: np.ndarray, bounds: tuple, resolution: float, max_distance: float = MAX_DISTANCE
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Rasterize walls into an occupancy grid and a distance field.
+
+    Args:
+        rects (np.ndarray): Wall rectangles (left, top, right, bottom), shape (W, 4).
+        bounds (tuple): (left, top, right, bottom) of the world.
+        resolution (float): Side of a grid cell in world units.
+        max_distance (float, optional): Cap of the distance field. Defaults to MAX_DISTANCE.
+
+    Returns:
+        tuple: Occupancy (uint8) and distance (float32) grids, shape (rows, columns).
+    """
+    left, top, right, bottom = bounds
+    columns = max(1, math.ceil((right - left) / resolution))
+    rows = max(1, math.ceil((bottom - top) / resolution))
+    xs = left + (np.arange(columns) + 0.5) * resolution
+    ys = top + (np.arange(rows) + 0.5) * resolution
+
+    occupancy = np.zeros((rows, columns), dtype=np.uint8)
+    # Distance to the world boundary, then lowered by every wall
+    squared = np.minimum(
+        np.minimum(ys - top, bottom - ys)[:, None] ** 2,
+        np.minimum(xs - left, right - xs)[None, :] ** 2,
+    )
+    np.minimum(squared, max_distance**2, out=squared)
+
+    def cell_range(low, high, origin, count):
+        return max(0, int((low - origin) // resolution)), min(count, math.ceil((high - origin) / resolution))
+
+    for wall_left, wall_top, wall_right, wall_bottom in rects:
+        first_row, last_row = cell_range(wall_top, wall_bottom, top, rows)
+        first_column, last_column = cell_range(wall_left, wall_right, left, columns)
+        occupancy[first_row:last_row, first_column:last_column] = 1
+
+        # Only cells within max_distance of the wall can get closer to it
+        first_row, last_row = cell_range(wall_top - max_distance, wall_bottom + max_distance, top, rows)
+        first_column, last_column = cell_range(wall_left - max_distance, wall_right + max_distance, left, columns)
+        window_xs = xs[first_column:last_column]
+        window_ys = ys[first_row:last_row]
+        # The distance to a rectangle separates into x and y parts
+        dx = np.maximum(np.maximum(wall_left - window_xs, window_xs - wall_right), 0.0)
+        dy = np.maximum(np.maximum(wall_top - window_ys, window_ys - wall_bottom), 0.0)
+        window = squared[first_row:last_row, first_column:last_column]
+        np.minimum(window, dy[:, None] ** 2 + dx[None, :] ** 2, out=window)
+    return occupancy, np.sqrt(squared).astype(np.float32)
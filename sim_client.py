@@ -0,0 +1,284 @@
+"""
+Client for driving a simulation served by sim_server.py from another process.
+
+Usage:
+    with SimClient("/tmp/sim.sock") as client:
+        client.open("worlds/test1.json")
+        observation = client.step(keys=(False, False, True, False))
+        print(observation["x"], observation["y"], observation["lidar"][:4])
+
+    python sim_client.py /tmp/sim.sock worlds/test1.json --steps 1000
+        measures the round trip of step requests.
+"""
+
+import argparse
+import json
+import socket
+import struct
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from shared_world import attach_shared_memory
+from trajectory import step_dtype
+
+# Every message is a length prefix followed by a JSON object
+MESSAGE_HEADER = struct.Struct("<I")
+RING_HEADER_SIZE = 64  # Written count (u8), padded so the slots start aligned
+
+
+def encode_message(message: dict) -> bytes:
+    """Frame a message for the socket."""
+    payload = json.dumps(message, separators=(",", ":")).encode()
+    return MESSAGE_HEADER.pack(len(payload)) + payload
+
+
+class ObservationRing:
+    """
+    Ring buffer of observations in shared memory.
+
+    The server writes one record per simulation step (step, time, pose, bump,
+    event flags and LiDAR ranges, laid out as trajectory.step_dtype) into the
+    next of `capacity` slots, and clients copy the slots they need straight
+    out of shared memory, so sensor arrays never pass through the socket. A
+    slot is overwritten `capacity` steps after it was written.
+    """
+
+    def __init__(self, memory: shared_memory.SharedMemory, num_beams: int, capacity: int, owner: bool) -> None:
+        self.memory = memory
+        self.num_beams = num_beams
+        self.capacity = capacity
+        self.owner = owner
+        self.written = np.ndarray((1,), dtype="<u8", buffer=memory.buf)
+        self.slots = np.ndarray((capacity,), dtype=step_dtype(num_beams), buffer=memory.buf, offset=RING_HEADER_SIZE)
+        if not owner:
+            self.slots.flags.writeable = False
+
+    @classmethod
+    def create(cls, num_beams: int, capacity: int = 1024) -> "ObservationRing":
+        """
+        Allocate a ring in a new shared memory block.
+
+        Args:
+            num_beams (int): LiDAR beams per observation.
+            capacity (int, optional): Number of slots. Defaults to 1024.
+
+        Returns:
+            ObservationRing: The owning ring; call unlink() when done.
+        """
+        size = RING_HEADER_SIZE + capacity * step_dtype(num_beams).itemsize
+        ring = cls(shared_memory.SharedMemory(create=True, size=size), num_beams, capacity, owner=True)
+        ring.written[0] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, info: dict) -> "ObservationRing":
+        """Attach read-only to a ring described by its info."""
+        return cls(attach_shared_memory(info["name"]), info["num_beams"], info["capacity"], owner=False)
+
+    @property
+    def info(self) -> dict:
+        """Picklable description for attaching from another process."""
+        return {"name": self.memory.name, "num_beams": self.num_beams, "capacity": self.capacity}
+
+    @property
+    def count(self) -> int:
+        """Number of observations written so far."""
+        return int(self.written[0])
+
+    def append(self, observation: tuple) -> int:
+        """
+        Write an observation to the next slot and publish it.
+
+        Args:
+            observation (tuple): Values of the step_dtype fields, in order.
+
+        Returns:
+            int: Its index, counting from the first observation.
+        """
+        index = self.count
+        self.slots[index % self.capacity] = observation
+        # Counted only once the slot is complete
+        self.written[0] = index + 1
+        return index
+
+    def read(self, index: int) -> np.ndarray:
+        """
+        Get an observation by index, as a copy of its slot.
+
+        Copies stay valid after the slot is overwritten and after the ring is closed.
+
+        Raises:
+            IndexError: If the observation was not written yet or has been overwritten.
+        """
+        count = self.count
+        if not count - self.capacity <= index < count:
+            raise IndexError(f"Observation {index} is not in the ring (written {count}, capacity {self.capacity})")
+        return self.slots[index % self.capacity].copy()
+
+    def read_range(self, start: int, stop: int) -> np.ndarray:
+        """Copy observations start to stop - 1, e.g. every step of a multi-step request."""
+        count = self.count
+        if not (count - self.capacity <= start and stop <= count):
+            raise IndexError(f"Observations {start}-{stop} are not in the ring")
+        return self.slots[np.arange(start, stop) % self.capacity]
+
+    def close(self) -> None:
+        # Observations are handed out as copies, so nothing else views the block
+        del self.written, self.slots
+        self.memory.close()
+
+    def unlink(self) -> None:
+        """Close and remove the block; only the creating process should do this."""
+        self.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+class SimClient:
+    """
+    Blocking client for one simulation session on a sim_server.
+
+    Commands go over a Unix domain socket as small JSON messages, and
+    observations are read straight from the session's shared ObservationRing.
+    Each client has its own session, with its own world and agent, on the server.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Connect to a server.
+
+        Args:
+            path (str): Path of the server's Unix socket.
+        """
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(path)
+        self.reader = self.socket.makefile("rb")
+        self.ring = None
+        self.session = None
+
+    def request(self, op: str, **fields) -> dict:
+        """
+        Send a request and wait for its reply.
+
+        Raises:
+            RuntimeError: If the server reports an error.
+        """
+        self.socket.sendall(encode_message({"op": op, **fields}))
+        (length,) = MESSAGE_HEADER.unpack(self.reader.read(MESSAGE_HEADER.size))
+        reply = json.loads(self.reader.read(length))
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        return reply
+
+    def open(
+        self,
+        world: str,
+        num_beams: int = 360,
+        capacity: int = 1024,
+        time_step: float = 1 / 60,
+        sensor_rate: float | None = None,
+        control_rate: float | None = None,
+        seed: int | None = None,
+    ) -> dict:
+        """
+        Start a session on a world file and attach to its observation ring.
+
+        Args:
+            world (str): World JSON file, as seen by the server.
+            num_beams (int, optional): LiDAR beams per observation. Defaults to 360.
+            capacity (int, optional): Observations kept in the ring. Defaults to 1024.
+            time_step (float, optional): Simulated seconds per step. Defaults to 1/60.
+            sensor_rate (float, optional): LiDAR scans per simulated second. Defaults to every step.
+            control_rate (float, optional): Controller updates per simulated second. Defaults to every step.
+            seed (int, optional): Root seed of the session's random streams. Defaults to fresh entropy.
+
+        Returns:
+            dict: Session details: bounds, body_radius, rates, seed and the ring's info.
+        """
+        if self.ring is not None:
+            self.ring.close()
+        self.session = self.request(
+            "open",
+            world=world,
+            num_beams=num_beams,
+            capacity=capacity,
+            time_step=time_step,
+            sensor_rate=sensor_rate,
+            control_rate=control_rate,
+            seed=seed,
+        )
+        self.ring = ObservationRing.attach(self.session["ring"])
+        return self.session
+
+    def step(self, keys=(False, False, False, False), count: int = 1) -> np.ndarray:
+        """
+        Advance the simulation.
+
+        Args:
+            keys (tuple, optional): Movement keys held (left, right, up, down). Defaults to none.
+            count (int, optional): Steps to run. Defaults to 1.
+
+        Returns:
+            np.ndarray: The last observation, copied out of the ring.
+        """
+        reply = self.request("step", keys=[bool(key) for key in keys], count=count)
+        return self.ring.read(reply["index"])
+
+    def command(self, name: str, *args) -> None:
+        """Apply a simulation command, "goal" with (x, y) or "running" with a bool."""
+        self.request("command", name=name, args=list(args))
+
+    def reset(self, x: float, y: float, direction: float) -> np.ndarray:
+        """Move the agent to a pose and return a fresh observation from it."""
+        reply = self.request("reset", x=x, y=y, direction=direction)
+        return self.ring.read(reply["index"])
+
+    def close(self) -> None:
+        """End the session and disconnect."""
+        try:
+            if self.session is not None:
+                self.request("close")
+        finally:
+            if self.ring is not None:
+                self.ring.close()
+                self.ring = None
+            self.reader.close()
+            self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("socket", help="path of the server's Unix socket")
+    parser.add_argument("world", help="world JSON file")
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--beams", type=int, default=360)
+    args = parser.parse_args()
+
+    with SimClient(args.socket) as client:
+        client.open(args.world, num_beams=args.beams)
+        # Requests that do not step show the cost of the bridge itself
+        started = time.perf_counter()
+        for _ in range(args.steps):
+            client.command("running", False)
+        command_time = (time.perf_counter() - started) / args.steps
+        started = time.perf_counter()
+        for _ in range(args.steps):
+            observation = client.step(keys=(True, False, True, False))
+        step_time = (time.perf_counter() - started) / args.steps
+        print(f"command round trip {command_time * 1e6:.1f} us, step round trip {step_time * 1e6:.1f} us")
+        print(f"last observation: step {observation['step']}, pose ({observation['x']:.1f}, {observation['y']:.1f})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+import atexit
+import logging
+import sys
+import threading
+from collections import deque
+
+# Every simulator logger lives under this name so it can be configured as one tree
+ROOT_LOGGER = "sim"
+
+DEFAULT_FORMAT = "%(asctime)s %(levelname)-7s %(name)s step=%(step)s %(message)s"
+
+
+class LogContext:
+    """Simulation state stamped onto every record, updated by Simulation.step."""
+
+    def __init__(self) -> None:
+        self.step = 0
+
+
+CONTEXT = LogContext()
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Get the logger of a simulator module.
+
+    Args:
+        name (str): Short module name, e.g. "agent" or "astar".
+
+    Returns:
+        logging.Logger: The logger "sim.<name>".
+    """
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def event(logger: logging.Logger, level: int, message: str, **fields) -> None:
+    """
+    Log a structured event.
+
+    In hot paths, guard the call with `if logger.isEnabledFor(level):` so the
+    fields are not even built while the level is disabled.
+
+    Args:
+        logger (logging.Logger): Logger to log to.
+        level (int): Logging level, e.g. logging.DEBUG.
+        message (str): Short description of the event, e.g. "movement blocked".
+        **fields: Structured data such as pose=(x, y) or reason="wall".
+    """
+    logger.log(level, message, extra={"fields": fields})
+
+
+class StructuredFormatter(logging.Formatter):
+    """Formats a record and appends its structured fields as key=value pairs."""
+
+    def __init__(self, fmt: str = DEFAULT_FORMAT) -> None:
+        super().__init__(fmt)
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not hasattr(record, "step"):
+            record.step = CONTEXT.step
+        text = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            text += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return text
+
+
+class RingBufferHandler(logging.Handler):
+    """
+    Keeps records in a bounded in-memory ring buffer instead of writing them.
+
+    Appending to the buffer never blocks on I/O. When the buffer is full the
+    oldest records are dropped and counted, so a flood of messages costs
+    memory bounded by the capacity rather than stalling the simulation.
+    """
+
+    def __init__(self, capacity: int = 10000) -> None:
+        super().__init__()
+        self.records: deque = deque(maxlen=capacity)
+        self.dropped = 0
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        # deque.append is atomic, so the handler lock is not needed
+        if not self.filter(record):
+            return False
+        self.emit(record)
+        return True
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # Capture the step now, the record is only formatted later
+        record.step = CONTEXT.step
+        if len(self.records) == self.records.maxlen:
+            self.dropped += 1
+        self.records.append(record)
+
+    def drain(self) -> list:
+        """Remove and return every buffered record, oldest first."""
+        records = []
+        popleft = self.records.popleft
+        while True:
+            try:
+                records.append(popleft())
+            except IndexError:
+                return records
+
+
+class LogFlusher(threading.Thread):
+    """Background thread that writes buffered records out in batches."""
+
+    def __init__(self, buffer: RingBufferHandler, streams: list, interval: float = 0.2) -> None:
+        """
+        Initialize the LogFlusher.
+
+        Args:
+            buffer (RingBufferHandler): Buffer to drain.
+            streams (list): Text streams to write the formatted batches to.
+            interval (float, optional): Seconds between flushes. Defaults to 0.2.
+        """
+        super().__init__(daemon=True)
+        self.buffer = buffer
+        self.streams = streams
+        self.interval = interval
+        self.formatter = StructuredFormatter()
+        self.stopped = threading.Event()
+        self.reported_dropped = 0
+
+    def flush(self) -> None:
+        """Write out everything buffered so far."""
+        records = self.buffer.drain()
+        lines = [self.formatter.format(record) for record in records]
+        dropped = self.buffer.dropped
+        if dropped > self.reported_dropped:
+            lines.append(f"... {dropped - self.reported_dropped} log records dropped, buffer full")
+            self.reported_dropped = dropped
+        if not lines:
+            return
+        text = "\n".join(lines) + "\n"
+        for stream in self.streams:
+            stream.write(text)
+            stream.flush()
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            self.flush()
+        self.flush()
+
+    def stop(self) -> None:
+        """Stop the thread after a final flush."""
+        self.stopped.set()
+        if self.is_alive():
+            self.join()
+        else:
+            self.flush()
+
+
+_flusher = None
+
+
+def parse_levels(spec: str) -> dict:
+    """
+    Parse per-module levels from a string such as "INFO,astar=DEBUG,agent=WARNING".
+
+    An entry without a module name sets the level of every simulator logger.
+
+    Returns:
+        dict: Module names to level names, "" for the root simulator logger.
+    """
+    levels = {}
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, _, level = entry.rpartition("=")
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure(
+    level: str = "WARNING",
+    levels: dict | None = None,
+    filename: str | None = None,
+    stream=sys.stderr,
+    capacity: int = 10000,
+    flush_interval: float = 0.2,
+) -> None:
+    """
+    Route simulator logging through a ring buffer flushed by a background thread.
+
+    Calling it again replaces the previous configuration.
+
+    Args:
+        level (str, optional): Level of every simulator logger. Defaults to "WARNING".
+        levels (dict, optional): Per-module levels, e.g. {"astar": "DEBUG"}, overriding level.
+        filename (str, optional): Also append the log to this file.
+        stream (optional): Stream to write the log to, None for no stream. Defaults to stderr.
+        capacity (int, optional): Records kept before the oldest are dropped. Defaults to 10000.
+        flush_interval (float, optional): Seconds between flushes. Defaults to 0.2.
+    """
+    global _flusher
+    shutdown()
+
+    root = logging.getLogger(ROOT_LOGGER)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.propagate = False
+    root.setLevel(level.upper())
+    for name, module_level in (levels or {}).items():
+        logger = root if name == "" else get_logger(name)
+        logger.setLevel(module_level)
+
+    buffer = RingBufferHandler(capacity)
+    root.addHandler(buffer)
+
+    streams = [stream] if stream is not None else []
+    if filename:
+        streams.append(open(filename, "a"))
+    _flusher = LogFlusher(buffer, streams, flush_interval)
+    _flusher.start()
+
+
+def shutdown() -> None:
+    """Flush whatever is still buffered and stop the background thread."""
+    global _flusher
+    if _flusher is None:
+        return
+    _flusher.stop()
+    for stream in _flusher.streams:
+        if stream not in (sys.stdout, sys.stderr):
+            stream.close()
+    _flusher = None
+
+
+atexit.register(shutdown)
@@ -0,0 +1,299 @@
+"""
+Headless simulation server for driving agents from other processes.
+
+Usage:
+    python sim_server.py /tmp/sim.sock
+
+Clients (see sim_client.py) connect over a Unix domain socket and each get a
+session with their own world, agent and simulation. Requests and replies are
+small length-prefixed JSON messages; observations are written to a
+shared-memory ObservationRing per session, so LiDAR arrays are never
+serialized. Sessions are served concurrently on one asyncio event loop.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import sys
+
+from agent import Agent
+from controller_astar import ControllerAStar
+from sim_client import MESSAGE_HEADER, ObservationRing, encode_message
+import sim_logging
+from sim_logging import event, get_logger
+from simulation import MOVE_KEYS, Simulation
+from trajectory import EVENT_BUMP, EVENT_GOAL_REACHED
+from world import load_world
+
+log = get_logger("server")
+
+# Sessions are numbered in their log records, which all share one step context
+SESSION_IDS = itertools.count(1)
+
+
+class Session:
+    """
+    One client's simulation: its world, agent, A* controller and observation ring.
+
+    The agent can be moved with the movement keys sent with each step, or by
+    giving the controller a goal and turning it on, as in main.
+    """
+
+    def __init__(
+        self,
+        world: str,
+        num_beams: int = 360,
+        capacity: int = 1024,
+        time_step: float = 1 / 60,
+        sensor_rate: float | None = None,
+        control_rate: float | None = None,
+        seed: int | None = None,
+    ) -> None:
+        """
+        Initialize the Session.
+
+        Args:
+            world (str): World JSON file.
+            num_beams (int, optional): LiDAR beams per observation. Defaults to 360.
+            capacity (int, optional): Observations kept in the ring. Defaults to 1024.
+            time_step (float, optional): Simulated seconds per step. Defaults to 1/60.
+            sensor_rate (float, optional): LiDAR scans per simulated second. Defaults to every step.
+            control_rate (float, optional): Controller updates per simulated second. Defaults to every step.
+            seed (int, optional): Root seed of the simulation's random streams. Defaults to fresh entropy.
+        """
+        walls, agent_data, bounds = load_world(world)
+        left, top, right, bottom = bounds
+        agent_data = agent_data or {"x": (left + right) / 2, "y": (top + bottom) / 2, "direction": 0}
+        agent = Agent(
+            agent_data["x"],
+            agent_data["y"],
+            agent_data["direction"],
+            walls,
+            num_lidar_beams=num_beams,
+            body_radius=agent_data.get("radius", 20),
+            bounds=bounds,
+        )
+        self.id = next(SESSION_IDS)
+        self.world = world
+        self.simulation = Simulation(
+            agent, ControllerAStar(agent, walls), walls, time_step, sensor_rate, control_rate, seed
+        )
+        self.ring = ObservationRing.create(num_beams, capacity)
+        self._last_bump = False
+        self._last_goals = 0
+
+        # The first observation is taken where the agent starts
+        agent.scan()
+        self.observe()
+
+    def enter(self) -> None:
+        """Stamp log records with this session's step, before the session logs anything."""
+        sim_logging.CONTEXT.step = self.simulation.steps
+
+    def observe(self) -> int:
+        """
+        Write the simulation's current state to the ring.
+
+        Returns:
+            int: Index of the observation.
+        """
+        simulation = self.simulation
+        agent = simulation.agent
+        events = 0
+        if agent.bump_sensor and not self._last_bump:
+            events |= EVENT_BUMP
+        self._last_bump = agent.bump_sensor
+        goals = simulation.controller.goals_reached
+        if goals != self._last_goals:
+            events |= EVENT_GOAL_REACHED
+            self._last_goals = goals
+        return self.ring.append(
+            (
+                simulation.steps,
+                simulation.time,
+                agent.x,
+                agent.y,
+                agent.direction,
+                agent.bump_sensor,
+                events,
+                agent.lidar_ranges,
+            )
+        )
+
+    async def handle(self, request: dict) -> dict:
+        """
+        Carry out one request.
+
+        A step request with a large count yields to the event loop after every
+        step, so other sessions are served in between.
+
+        Args:
+            request (dict): The request, with its "op" and arguments.
+
+        Returns:
+            dict: The reply.
+
+        Raises:
+            ValueError: If the request is unknown or a step count is below 1.
+        """
+        op = request["op"]
+        simulation = self.simulation
+        self.enter()
+        if op == "step":
+            count = request.get("count", 1)
+            if not isinstance(count, int) or count < 1:
+                raise ValueError(f"Step count must be a positive integer, got {count!r}")
+            keys = dict(zip(MOVE_KEYS, request.get("keys", (False,) * len(MOVE_KEYS))))
+            for step in range(count):
+                if step:
+                    await asyncio.sleep(0)
+                simulation.step(keys)
+                index = self.observe()
+            return {"step": simulation.steps, "index": index}
+        if op == "command":
+            args = request.get("args", [])
+            if request["name"] == "goal":
+                args = [tuple(args[0])]
+            simulation.apply_command(request["name"], *args)
+            return {}
+        if op == "reset":
+            agent = simulation.agent
+            agent.x, agent.y, agent.direction = request["x"], request["y"], request["direction"]
+            agent.bump_sensor = False
+            agent.scan()
+            return {"step": simulation.steps, "index": self.observe()}
+        raise ValueError(f"Unknown request {op!r}")
+
+    def describe(self) -> dict:
+        """Details a client needs about the session."""
+        agent = self.simulation.agent
+        return {
+            "world": self.world,
+            "bounds": list(agent.bounds),
+            "body_radius": agent.body_radius,
+            "time_step": self.simulation.time_step,
+            **self.simulation.rates(),
+            "seed": self.simulation.seed,
+            "ring": self.ring.info,
+        }
+
+    def close(self) -> None:
+        self.ring.unlink()
+
+
+class SimServer:
+    """Accepts client connections on a Unix domain socket and serves one Session per connection."""
+
+    def __init__(self, path: str) -> None:
+        """
+        Initialize the SimServer.
+
+        Args:
+            path (str): Path of the Unix socket to listen on; a stale socket file there is replaced.
+        """
+        self.path = path
+        self.sessions = set()
+
+    async def serve(self) -> None:
+        """Serve clients until cancelled."""
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        server = await asyncio.start_unix_server(self.handle_client, path=self.path)
+        event(log, logging.INFO, "listening", path=self.path)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for session in list(self.sessions):
+                session.close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        session = None
+        try:
+            while True:
+                try:
+                    (length,) = MESSAGE_HEADER.unpack(await reader.readexactly(MESSAGE_HEADER.size))
+                    request = json.loads(await reader.readexactly(length))
+                except asyncio.IncompleteReadError:
+                    return  # Client disconnected
+
+                op = request.get("op")
+                try:
+                    if op == "open":
+                        if session is not None:
+                            self.end_session(session)
+                        session = Session(
+                            request["world"],
+                            num_beams=request.get("num_beams", 360),
+                            capacity=request.get("capacity", 1024),
+                            time_step=request.get("time_step", 1 / 60),
+                            sensor_rate=request.get("sensor_rate"),
+                            control_rate=request.get("control_rate"),
+                            seed=request.get("seed"),
+                        )
+                        self.sessions.add(session)
+                        session.enter()
+                        event(
+                            log,
+                            logging.INFO,
+                            "session opened",
+                            session=session.id,
+                            world=session.world,
+                            sessions=len(self.sessions),
+                        )
+                        reply = session.describe()
+                    elif op == "close":
+                        writer.write(encode_message({}))
+                        await writer.drain()
+                        return
+                    elif session is None:
+                        reply = {"error": "No session, send an open request first"}
+                    else:
+                        reply = await session.handle(request)
+                except Exception as e:
+                    if session is not None:
+                        session.enter()
+                    event(
+                        log,
+                        logging.WARNING,
+                        "request failed",
+                        session=session.id if session is not None else None,
+                        op=op,
+                        error=repr(e),
+                    )
+                    reply = {"error": f"{type(e).__name__}: {e}"}
+                writer.write(encode_message(reply))
+                await writer.drain()
+        finally:
+            if session is not None:
+                self.end_session(session)
+            writer.close()
+
+    def end_session(self, session: Session) -> None:
+        self.sessions.discard(session)
+        session.close()
+        session.enter()
+        event(log, logging.INFO, "session closed", session=session.id, world=session.world, sessions=len(self.sessions))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("socket", help="path of the Unix socket to listen on")
+    args = parser.parse_args()
+    # Levels come from SIM_LOG as in main, sessions are logged by default
+    levels = sim_logging.parse_levels(os.environ.get("SIM_LOG", ""))
+    sim_logging.configure(levels.pop("", "WARNING"), {"server": "INFO", **levels}, os.environ.get("SIM_LOG_FILE"))
+    try:
+        asyncio.run(SimServer(args.socket).serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+from array import array
+
+# Agent attributes stored per agent in SimState.poses, in order
+POSE_FIELDS = ("x", "y", "direction", "bump_sensor")
+
+
+class SimState:
+    """
+    Compact copy of everything that changes while a Simulation runs.
+
+    Agent poses are packed into one flat array of doubles, and controller
+    state into small tuples from each controller's get_state(). Walls, bounds
+    and other world geometry never change during a run, so they are shared
+    with the simulation instead of copied. LiDAR readings and planned paths
+    are shared too: the simulator replaces those lists rather than changing
+    them, so a later step never alters a snapshot.
+
+    Accumulators that only observe the run, such as a recorder, coverage grid
+    or rate map, are not part of the state.
+
+    Random controllers keep their generator's state in their controller state.
+    Whether it is restored is chosen when the snapshot is taken.
+    """
+
+    __slots__ = ("step", "poses", "lidar", "controllers", "include_rng")
+
+    def __init__(self, step: int, poses: array, lidar: tuple, controllers: tuple, include_rng: bool = True) -> None:
+        self.step = step
+        self.poses = poses
+        self.lidar = lidar
+        self.controllers = controllers
+        self.include_rng = include_rng  # Whether controllers' random generators are restored
+
+    @classmethod
+    def capture(cls, simulation, include_rng: bool = True) -> "SimState":
+        """
+        Take a snapshot of a simulation.
+
+        Args:
+            simulation (Simulation): The simulation.
+            include_rng (bool, optional): Restore the random generators of controllers such as
+                ControllerRandom with the rest of their state, so branches replay the same draws.
+                If False, each branch draws on from where the generators are, so branches
+                differ. Defaults to True.
+
+        Returns:
+            SimState: The snapshot.
+        """
+        agents = simulation.agents
+        poses = array("d")
+        for agent in agents:
+            poses.extend((agent.x, agent.y, agent.direction, agent.bump_sensor))
+        return cls(
+            simulation.steps,
+            poses,
+            tuple(agent.lidar_ranges for agent in agents),
+            tuple(controller.get_state() for controller in simulation.controllers),
+            include_rng,
+        )
+
+    def apply(self, simulation) -> None:
+        """
+        Put a simulation back into this state.
+
+        Raises:
+            ValueError: If the simulation has a different number of agents than when captured.
+        """
+        agents = simulation.agents
+        if len(agents) != len(self.lidar):
+            raise ValueError(f"State has {len(self.lidar)} agents, the simulation has {len(agents)}")
+        simulation.steps = self.step
+        poses = self.poses
+        width = len(POSE_FIELDS)
+        for index, agent in enumerate(agents):
+            offset = index * width
+            agent.x = poses[offset]
+            agent.y = poses[offset + 1]
+            agent.direction = poses[offset + 2]
+            agent.bump_sensor = bool(poses[offset + 3])
+            agent.lidar_ranges = self.lidar[index]
+        for controller, state in zip(simulation.controllers, self.controllers):
+            generator = None if self.include_rng else getattr(controller, "rng", None)
+            kept = generator.bit_generator.state if generator is not None else None
+            controller.set_state(state)
+            if kept is not None:
+                # Keep drawing from where the generator is instead of repeating the snapshot's draws
+                generator.bit_generator.state = kept
@@ -0,0 +1,172 @@
+import queue
+import threading
+import time
+from typing import NamedTuple
+
+
+class SimSnapshot(NamedTuple):
+    """Immutable copy of the simulation state published for the render loop."""
+
+    step: int
+    x: float
+    y: float
+    direction: float
+    body_radius: float
+    bump_sensor: bool
+    lidar_ranges: tuple
+    path: tuple
+    controller_running: bool
+    planning_progress: float | None
+    sim_steps_per_second: float
+    others: tuple = ()  # (x, y, direction, body_radius) of every agent but the primary one
+
+    def apply_to(self, agent) -> None:
+        """
+        Copy the published pose and sensor readings onto an agent used for drawing.
+
+        Args:
+            agent (Agent): The agent to update, normally one that is only drawn.
+        """
+        agent.x = self.x
+        agent.y = self.y
+        agent.direction = self.direction
+        agent.body_radius = self.body_radius
+        agent.bump_sensor = self.bump_sensor
+        agent.lidar_ranges = self.lidar_ranges
+
+
+class DoubleBuffer:
+    """
+    Two-slot buffer for handing snapshots from one writer to one reader.
+
+    The writer fills the back slot and then flips which slot is the front, so
+    the reader always gets a complete snapshot without taking a lock.
+    """
+
+    def __init__(self, initial=None) -> None:
+        self.slots = [initial, initial]
+        self.front = 0
+
+    def publish(self, item) -> None:
+        """Write an item to the back slot and make it the front."""
+        back = 1 - self.front
+        self.slots[back] = item
+        self.front = back
+
+    def read(self):
+        """Get the most recently published item."""
+        return self.slots[self.front]
+
+
+class SimulationWorker(threading.Thread):
+    """
+    Runs a Simulation on a background thread so planning and scans never block the UI.
+
+    Input from the UI is forwarded through a command queue and applied on the
+    worker thread between ticks. After each batch of ticks the worker publishes
+    a SimSnapshot into a DoubleBuffer that the render loop reads.
+    """
+
+    def __init__(self, simulation, scheduler) -> None:
+        """
+        Initialize the SimulationWorker.
+
+        Args:
+            simulation (Simulation): The simulation to run. It must only be touched from this worker once started.
+            scheduler (FrameScheduler): Decides how many ticks to run per published snapshot.
+        """
+        super().__init__(daemon=True)
+        self.simulation = simulation
+        self.scheduler = scheduler
+        self.commands: queue.Queue = queue.Queue()
+        self.snapshots = DoubleBuffer()
+        self.keys = None
+        self.stopped = threading.Event()
+        self.publish()
+
+    def submit(self, command, *args) -> None:
+        """
+        Queue a command to run on the worker thread before the next tick.
+
+        Args:
+            command (callable): Called as command(simulation, *args).
+        """
+        self.commands.put((command, args))
+
+    def set_keys(self, keys) -> None:
+        """Forward the current keyboard state for manual control."""
+        self.submit(lambda simulation: setattr(self, "keys", keys))
+
+    def set_rates(self, sim_rate: int, steps_per_frame: int) -> None:
+        """Forward new sim rate and steps-per-frame settings to the scheduler."""
+
+        def apply_rates(simulation):
+            self.scheduler.sim_rate = sim_rate
+            self.scheduler.steps_per_frame = steps_per_frame
+
+        self.submit(apply_rates)
+
+    def latest(self) -> SimSnapshot:
+        """Get the most recent snapshot without blocking the simulation."""
+        return self.snapshots.read()
+
+    def stop(self) -> None:
+        """Stop the worker and wait for it to finish its current batch."""
+        self.stopped.set()
+        if self.is_alive():
+            self.join()
+
+    def publish(self) -> None:
+        simulation = self.simulation
+        agent = simulation.agent
+        controller = simulation.controller
+        planning_progress = getattr(controller, "planning_progress", None)
+        self.snapshots.publish(
+            SimSnapshot(
+                step=simulation.steps,
+                x=agent.x,
+                y=agent.y,
+                direction=agent.direction,
+                body_radius=agent.body_radius,
+                bump_sensor=agent.bump_sensor,
+                lidar_ranges=tuple(agent.lidar_ranges),
+                path=tuple(getattr(controller, "path", ())),
+                controller_running=controller.running,
+                planning_progress=planning_progress() if planning_progress else None,
+                sim_steps_per_second=self.scheduler.sim_steps_per_second,
+                others=tuple(
+                    (other.x, other.y, other.direction, other.body_radius)
+                    for other in simulation.agents[1:]
+                ),
+            )
+        )
+
+    def _drain_commands(self) -> bool:
+        handled = False
+        while True:
+            try:
+                command, args = self.commands.get_nowait()
+            except queue.Empty:
+                return handled
+            command(self.simulation, *args)
+            handled = True
+
+    def _step(self) -> None:
+        self.simulation.step(self.keys)
+
+    def run(self) -> None:
+        scheduler = self.scheduler
+        while not self.stopped.is_set():
+            handled = self._drain_commands()
+            steps = scheduler.advance(self._step)
+            # Each published batch counts as one frame of the worker loop
+            scheduler.frame_rendered()
+            if steps or handled:
+                self.publish()
+
+            if scheduler.sim_rate > 0:
+                # Sleep until the next tick is due
+                time.sleep(max(0.0, 1 / scheduler.sim_rate - scheduler.accumulator))
+            else:
+                # Give the render thread a chance to run
+                time.sleep(0)
@@ -0,0 +1,375 @@
+import pygame
+
+from agent import Agent
+from controller_random import ControllerRandom
+from profiler import PROFILER
+import rng
+from scheduler import RateSchedule
+from sim_logging import CONTEXT
+from sim_state import SimState
+from spatial_hash import AgentIndex
+from trajectory import TrajectoryRecorder
+
+# Keys that move the agent, in the order they are recorded
+MOVE_KEYS = (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN)
+
+
+class Simulation:
+    """
+    Advances the agents and their controllers one fixed simulation tick at a time.
+
+    Keeping the stepping logic out of the render loop lets callers run any
+    number of ticks per rendered frame, or run headless with no window at all.
+    The first agent is the primary one, moved by the keyboard, recorded and
+    shown in the UI; further agents added with add_agent() share its world.
+
+    Each tick runs the tasks of self.schedule that are due: "keys" (manual
+    movement) every tick, then "scan" and "control" at their own rates, so
+    sensing and decisions can run slower than the physics. More tasks, such as
+    model inference, can be added to the schedule with their own rates.
+    """
+
+    def __init__(
+        self,
+        agent,
+        controller,
+        walls: list,
+        time_step: float = 1 / 60,
+        sensor_rate: float | None = None,
+        control_rate: float | None = None,
+        seed: int | None = None,
+    ) -> None:
+        """
+        Initialize the Simulation.
+
+        Args:
+            agent (Agent): The agent being simulated.
+            controller: Controller driving the agent.
+            walls (list): List of Wall objects in the environment.
+            time_step (float, optional): Simulated seconds per tick. Defaults to 1/60.
+            sensor_rate (float, optional): LiDAR scans per simulated second. Defaults to every tick.
+            control_rate (float, optional): Controller updates per simulated second. Defaults to every tick.
+            seed (int, optional): Root seed of the agents' random streams. Defaults to fresh entropy.
+        """
+        self.agents = [agent]
+        self.controllers = [controller]
+        self.agent_index = None  # AgentIndex, once there is more than one agent
+        self.walls = walls
+        self.time_step = time_step
+        self.seed = rng.root_seed(seed)  # Stored with recordings, so runs can be repeated
+        self.steps = 0
+        self.recorder = None  # Optional TrajectoryRecorder fed every step
+        self.coverage = None  # Optional CoverageGrid fed every step
+        self._recorded_keys = None
+        self._keys = None
+
+        self.schedule = RateSchedule(1 / time_step)
+        self.schedule.add("keys", self._move_by_keys)
+        self.schedule.add("scan", self._scan, sensor_rate)
+        self.schedule.add("control", self._control, control_rate)
+
+    @property
+    def agent(self):
+        """The primary agent."""
+        return self.agents[0]
+
+    @property
+    def controller(self):
+        """The primary agent's controller."""
+        return self.controllers[0]
+
+    def add_agent(self, agent, controller) -> None:
+        """
+        Add an agent with its own controller to the world.
+
+        From the second agent on, agents collide with each other and show up
+        in each other's LiDAR, through an AgentIndex rebuilt every tick.
+
+        Args:
+            agent (Agent): The new agent, sharing the world's walls and bounds.
+            controller: Controller driving the new agent.
+
+        Raises:
+            RuntimeError: While recording, as an arbitrary agent could not be re-simulated;
+                add random walkers with apply_command("add_agent", ...) instead.
+        """
+        if self.recorder is not None:
+            raise RuntimeError("Cannot add an arbitrary agent while recording, use the add_agent command")
+        self._add_agent(agent, controller)
+
+    def add_random_agent(
+        self, x: float, y: float, direction: float, stream: int, num_beams: int = 36, body_radius: float | None = None
+    ) -> ControllerRandom:
+        """
+        Add a randomly walking agent, as main does when `a` is pressed.
+
+        Everything about the walker is given by its arguments, so the
+        add_agent command that calls this can be re-simulated.
+
+        Args:
+            x (float): X-coordinate of the new agent.
+            y (float): Y-coordinate of the new agent.
+            direction (float): Heading in degrees, a multiple of 45.
+            stream (int): Index of the agent_rng() stream its controller draws from.
+            num_beams (int, optional): LiDAR beams of the new agent. Defaults to 36.
+            body_radius (float, optional): Radius of its body. Defaults to the primary agent's.
+
+        Returns:
+            ControllerRandom: The new agent's controller, already running.
+        """
+        primary = self.agent
+        agent = Agent(
+            x,
+            y,
+            direction,
+            self.walls,
+            num_lidar_beams=num_beams,
+            body_radius=primary.body_radius if body_radius is None else body_radius,
+            bounds=primary.bounds,
+        )
+        controller = ControllerRandom(None, agent, self.agent_rng(stream))
+        controller.running = True
+        self._add_agent(agent, controller)
+        return controller
+
+    def _add_agent(self, agent, controller) -> None:
+        self.agents.append(agent)
+        self.controllers.append(controller)
+        if self.agent_index is None:
+            self.agent_index = AgentIndex()
+        for each in self.agents:
+            each.agent_index = self.agent_index
+        self.agent_index.rebuild(self.agents)
+
+    def agent_rng(self, index: int):
+        """
+        Random stream of the agent with the given index and its controller.
+
+        Returns:
+            np.random.Generator: The same stream for the same seed and index, whatever
+                other agents there are.
+        """
+        return rng.stream(self.seed, index)
+
+    @property
+    def time(self) -> float:
+        """Simulated time in seconds."""
+        return self.steps * self.time_step
+
+    def step(self, keys=None) -> None:
+        """
+        Advance the simulation by one tick.
+
+        Args:
+            keys (pygame.key.ScancodeWrapper, optional): Keyboard state for manual control.
+        """
+        # Stamp log records from this tick with its step number
+        CONTEXT.step = self.steps
+
+        # Agents find each other through a hash of this tick's positions, allowing
+        # for a move by the keys and one per run of the controllers this tick,
+        # which is more than one at a control rate above the tick rate
+        if self.agent_index is not None:
+            moves = 1 + self.schedule.task("control").due(self.steps)
+            self.agent_index.rebuild(self.agents, moves)
+
+        self._keys = keys
+        self.schedule.run(self.steps)
+        self.steps += 1
+
+        if self.recorder is not None:
+            self.recorder.record(self)
+        if self.coverage is not None:
+            for key, agent in enumerate(self.agents):
+                self.coverage.add_agent(agent, self.time_step, key)
+
+    def _move_by_keys(self) -> None:
+        # Handle agent's movement
+        keys = self._keys
+        if keys is not None:
+            if self.recorder is not None:
+                self._record_keys(keys)
+            self.agent.handle_move_keys(keys)
+
+    def _scan(self) -> None:
+        # Agents scan the environment, always in the order they were added
+        with PROFILER.scope("sim.scan"):
+            for agent in self.agents:
+                agent.scan()
+
+    def _control(self) -> None:
+        # Every controller does its work, in the same order
+        with PROFILER.scope("sim.controller"):
+            for controller in self.controllers:
+                controller.update()
+
+    def rates(self) -> dict:
+        """Sensor and control rates, as stored with recordings."""
+        rates = self.schedule.rates()
+        return {"sensor_rate": rates["scan"], "control_rate": rates["control"]}
+
+    def apply_command(self, name: str, *args) -> None:
+        """
+        Apply a user command, recording it so the run can be re-simulated.
+
+        Args:
+            name (str): "goal" to send the controller a goal (x, y), "running"
+                to turn the controller on or off, or "add_agent" to add a random
+                walker with the arguments of add_random_agent().
+        """
+        if name == "goal":
+            self.controller.handle_input(args[0])
+        elif name == "running":
+            self.controller.running = args[0]
+        elif name == "add_agent":
+            self.add_random_agent(*args)
+        else:
+            raise ValueError(f"Unknown command {name!r}")
+        if self.recorder is not None:
+            self.recorder.add_command(self.steps, name, *args)
+
+    def _record_keys(self, keys) -> None:
+        # Only changes of the movement keys are recorded
+        state = [bool(keys[key]) for key in MOVE_KEYS]
+        if state != self._recorded_keys:
+            self._recorded_keys = state
+            self.recorder.add_command(self.steps, "keys", state)
+
+    def snapshot(self, include_rng: bool = True) -> SimState:
+        """
+        Capture the state of every agent and controller, to branch rollouts from.
+
+        Unlike initial_state(), this is exact, including a search in progress,
+        and cheap enough to take every step: world geometry is shared, not copied.
+
+        Args:
+            include_rng (bool, optional): Restore the controllers' random generators too, so
+                branches make the same random choices. Defaults to True.
+
+        Returns:
+            SimState: The snapshot, which stays valid however often it is restored.
+        """
+        return SimState.capture(self, include_rng)
+
+    def restore(self, state: SimState) -> None:
+        """
+        Return to a snapshot taken by snapshot().
+
+        Recording and coverage are not rewound; stop recording before branching.
+        """
+        state.apply(self)
+
+    def initial_state(self) -> dict:
+        """
+        State needed to re-simulate a recording from the current step.
+
+        Further agents are stored as random walkers, the only kind that
+        add_agent commands create, with the state of their controllers.
+        Every agent's last scan is stored too, as at a sensor rate below the
+        tick rate the first recorded steps may come before the next scan.
+        """
+        agent = self.agent
+        controller = self.controller
+        goal = getattr(controller, "goal", None)
+        return {
+            "step": self.steps,
+            "x": agent.x,
+            "y": agent.y,
+            "direction": agent.direction,
+            "bump_sensor": agent.bump_sensor,
+            "lidar_ranges": list(agent.lidar_ranges),
+            "controller_running": controller.running,
+            "goal": list(goal) if goal is not None else None,
+            "path_following": getattr(controller, "path_following", None),
+            "agents": [
+                {
+                    "x": other.x,
+                    "y": other.y,
+                    "direction": other.direction,
+                    "bump_sensor": other.bump_sensor,
+                    "lidar_ranges": list(other.lidar_ranges),
+                    "num_beams": len(other.lidar_angles),
+                    "body_radius": other.body_radius,
+                    "controller": list(other_controller.get_state()),
+                }
+                for other, other_controller in zip(self.agents[1:], self.controllers[1:])
+            ],
+        }
+
+    def restore_initial_state(self, state: dict) -> None:
+        """
+        Put the simulation in the state captured by initial_state().
+
+        A goal in progress is planned again from the current pose, which is
+        also what start_recording() does, so both runs follow the same path.
+        Further agents the simulation does not have yet are added.
+        """
+        agent = self.agent
+        self.steps = state["step"]
+        agent.x = state["x"]
+        agent.y = state["y"]
+        agent.direction = state["direction"]
+        agent.bump_sensor = state["bump_sensor"]
+        if "lidar_ranges" in state:
+            # Recordings from before the rates were stored started on a scan
+            agent.lidar_ranges = list(state["lidar_ranges"])
+        if hasattr(self.controller, "path_following"):
+            # Recordings from before path following was selectable stepped through waypoints
+            self.controller.path_following = state.get("path_following") or "waypoints"
+        if state["goal"] is not None:
+            self.controller.handle_input(tuple(state["goal"]))
+        self.controller.running = state["controller_running"]
+
+        for index, other in enumerate(state.get("agents", []), start=1):
+            if index == len(self.agents):
+                self.add_random_agent(
+                    other["x"], other["y"], other["direction"], index, other["num_beams"], other["body_radius"]
+                )
+            agent = self.agents[index]
+            agent.x, agent.y, agent.direction = other["x"], other["y"], other["direction"]
+            agent.bump_sensor = other["bump_sensor"]
+            if "lidar_ranges" in other:
+                agent.lidar_ranges = list(other["lidar_ranges"])
+            self.controllers[index].set_state(tuple(other["controller"]))
+
+    def start_recording(self, filename: str, metadata: dict | None = None) -> TrajectoryRecorder:
+        """
+        Record every following step to a trajectory file.
+
+        Args:
+            filename (str): File to record to.
+            metadata (dict, optional): Extra information stored in the header, e.g. the world file.
+
+        Returns:
+            TrajectoryRecorder: The recorder, also kept as self.recorder.
+        """
+        state = self.initial_state()
+        self.recorder = TrajectoryRecorder(
+            filename,
+            num_beams=len(self.agent.lidar_angles),
+            time_step=self.time_step,
+            metadata={
+                **(metadata or {}),
+                "body_radius": self.agent.body_radius,
+                "bounds": list(self.agent.bounds),
+                "rates": self.rates(),
+                "seed": self.seed,
+                "initial": state,
+            },
+        )
+        self._recorded_keys = None
+        self.restore_initial_state(state)
+        return self.recorder
+
+    def stop_recording(self) -> TrajectoryRecorder | None:
+        """
+        Stop recording and close the file.
+
+        Returns:
+            TrajectoryRecorder: The closed recorder, or None if nothing was being recorded.
+        """
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.close()
+            self.recorder = None
+        return recorder
@@ -0,0 +1,157 @@
+import math
+
+
+class SpatialHash:
+    """
+    Uniform grid that buckets items by the cells their bounding boxes overlap.
+
+    Used to answer "what is near this rectangle" queries without touching every
+    item in the world, so the cost of a query depends on local density rather
+    than on the total number of items.
+    """
+
+    def __init__(self, cell_size: float = 256) -> None:
+        """
+        Initialize the SpatialHash.
+
+        Args:
+            cell_size (float, optional): Side length of a grid cell in world units. Defaults to 256.
+        """
+        self.cell_size = cell_size
+        self.cells: dict[tuple[int, int], list] = {}
+        self.item_cells: dict[int, list[tuple[int, int]]] = {}
+
+    def _cell_range(self, left, top, right, bottom):
+        size = self.cell_size
+        return (
+            math.floor(left / size),
+            math.floor(top / size),
+            math.floor(right / size),
+            math.floor(bottom / size),
+        )
+
+    def insert(self, item, left: float, top: float, right: float, bottom: float) -> None:
+        """
+        Insert an item covering the box (left, top, right, bottom).
+
+        Args:
+            item: The object to store. Items are tracked by identity.
+            left (float): Left edge of the item's bounding box.
+            top (float): Top edge of the item's bounding box.
+            right (float): Right edge of the item's bounding box.
+            bottom (float): Bottom edge of the item's bounding box.
+        """
+        min_cx, min_cy, max_cx, max_cy = self._cell_range(left, top, right, bottom)
+        keys = []
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                key = (cx, cy)
+                self.cells.setdefault(key, []).append(item)
+                keys.append(key)
+        self.item_cells[id(item)] = keys
+
+    def insert_rect(self, item, rect) -> None:
+        """Insert an item using a pygame.Rect-like bounding box."""
+        self.insert(item, rect.left, rect.top, rect.right, rect.bottom)
+
+    def remove(self, item) -> None:
+        """Remove an item if present."""
+        keys = self.item_cells.pop(id(item), None)
+        if keys is None:
+            return
+        for key in keys:
+            bucket = self.cells[key]
+            bucket.remove(item)
+            if not bucket:
+                del self.cells[key]
+
+    def update_rect(self, item, rect) -> None:
+        """Re-index an item whose bounding box has changed."""
+        self.remove(item)
+        self.insert_rect(item, rect)
+
+    def clear(self) -> None:
+        """Remove every item."""
+        self.cells.clear()
+        self.item_cells.clear()
+
+    def query(self, left: float, top: float, right: float, bottom: float) -> list:
+        """
+        Return the items whose cells overlap the box (left, top, right, bottom).
+
+        The result is a superset of the items actually intersecting the box;
+        callers that need exact overlap should test the returned items.
+
+        Returns:
+            list: Each matching item once.
+        """
+        min_cx, min_cy, max_cx, max_cy = self._cell_range(left, top, right, bottom)
+        found = []
+        seen = set()
+        cells = self.cells
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                bucket = cells.get((cx, cy))
+                if not bucket:
+                    continue
+                for item in bucket:
+                    if id(item) not in seen:
+                        seen.add(id(item))
+                        found.append(item)
+        return found
+
+    @classmethod
+    def from_walls(cls, walls: list, cell_size: float = 256) -> "SpatialHash":
+        """Build a hash over a list of Wall objects keyed by their rects."""
+        index = cls(cell_size)
+        for wall in walls:
+            index.insert_rect(wall, wall.rect)
+        return index
+
+
+class AgentIndex(SpatialHash):
+    """
+    SpatialHash of the agents sharing a world, rebuilt once per simulation tick.
+
+    Agents keep moving during the tick after the index is built, so queries
+    are widened by the furthest any agent can move before the next rebuild. Candidates are
+    returned as the live agent objects, so callers test their current positions.
+    """
+
+    def __init__(self, cell_size: float = 128) -> None:
+        super().__init__(cell_size)
+        self.margin = 0.0
+
+    def rebuild(self, agents: list, moves: int = 2) -> None:
+        """
+        Index every agent's body at its current position.
+
+        Args:
+            agents (list): The agents sharing the world.
+            moves (int, optional): Most moves an agent makes before the next rebuild.
+                Defaults to 2, one by the keys and one by its controller.
+        """
+        self.clear()
+        margin = 0.0
+        for agent in agents:
+            radius = agent.body_radius
+            self.insert(agent, agent.x - radius, agent.y - radius, agent.x + radius, agent.y + radius)
+            margin = max(margin, moves * abs(agent.linear_speed))
+        self.margin = margin
+
+    def near(self, agent, left: float, top: float, right: float, bottom: float) -> list:
+        """
+        Get the other agents whose bodies may overlap the box (left, top, right, bottom).
+
+        Args:
+            agent: The agent asking, left out of the result.
+
+        Returns:
+            list: Candidate agents; callers should test the exact overlap.
+        """
+        margin = self.margin
+        return [
+            other
+            for other in self.query(left - margin, top - margin, right + margin, bottom + margin)
+            if other is not agent
+        ]
@@ -0,0 +1,315 @@
+import json
+import os
+import queue
+import struct
+import threading
+
+import numpy as np
+
+# Event flags stored with each recorded step
+EVENT_BUMP = 1  # The bump sensor was triggered this step
+EVENT_GOAL_REACHED = 2  # The controller reached its goal this step
+
+EVENT_NAMES = {"bump": EVENT_BUMP, "goal": EVENT_GOAL_REACHED}
+
+MAGIC = b"SIMTRAJ1"
+INDEX_MAGIC = b"TRAJIDX1"
+ALIGNMENT = 64
+
+# Header: magic, then the length of the JSON header that follows
+_PREFIX = struct.Struct("<8sQ")
+# Trailer: length of the JSON index that precedes it, then the index magic
+_TRAILER = struct.Struct("<Q8s")
+
+
+def step_dtype(num_beams: int) -> np.dtype:
+    """
+    Get the record layout of one simulation step.
+
+    Args:
+        num_beams (int): Number of LiDAR beams recorded per step.
+
+    Returns:
+        np.dtype: Structured dtype with step, time, pose, heading, bump, events and lidar fields.
+    """
+    return np.dtype(
+        [
+            ("step", "<u8"),
+            ("time", "<f8"),
+            ("x", "<f8"),
+            ("y", "<f8"),
+            ("direction", "<f8"),
+            ("bump", "u1"),
+            ("events", "u1"),
+            ("lidar", "<f4", (num_beams,)),
+        ]
+    )
+
+
+class TrajectoryRecorder:
+    """
+    Records every simulation step to a chunked binary file.
+
+    Steps are appended to a preallocated NumPy structured-array chunk. Full
+    chunks are handed to a writer thread and recycled once written, so memory
+    stays bounded by a few chunks however long the run is, and the simulation
+    never waits on disk unless the writer falls that many chunks behind.
+
+    File layout, all little-endian:
+        magic (8 bytes), header length (u8), JSON header padded to 64 bytes,
+        records back to back as one contiguous array that can be memory-mapped,
+        JSON index of chunks, event steps and user commands, index length (u8), index magic.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        num_beams: int,
+        time_step: float,
+        chunk_size: int = 4096,
+        max_pending_chunks: int = 4,
+        metadata: dict | None = None,
+    ) -> None:
+        """
+        Initialize the TrajectoryRecorder and start its writer thread.
+
+        Args:
+            filename (str): File to write the recording to.
+            num_beams (int): Number of LiDAR beams per step.
+            time_step (float): Simulated seconds per step.
+            chunk_size (int, optional): Steps per chunk. Defaults to 4096.
+            max_pending_chunks (int, optional): Full chunks allowed to wait for the writer. Defaults to 4.
+            metadata (dict, optional): Extra JSON-serializable information stored in the header.
+        """
+        self.filename = filename
+        self.dtype = step_dtype(num_beams)
+        self.num_beams = num_beams
+        self.chunk_size = chunk_size
+        self.recorded = 0
+        self.closed = False
+
+        self.file = open(filename, "wb")
+        header = json.dumps(
+            {
+                "version": 1,
+                "dtype": self.dtype.descr,
+                "num_beams": num_beams,
+                "time_step": time_step,
+                "chunk_size": chunk_size,
+                "metadata": metadata or {},
+            }
+        ).encode()
+        # Pad so the records start on an aligned offset
+        padded = -(-(_PREFIX.size + len(header)) // ALIGNMENT) * ALIGNMENT
+        header += b" " * (padded - _PREFIX.size - len(header))
+        self.file.write(_PREFIX.pack(MAGIC, len(header)))
+        self.file.write(header)
+        self.data_offset = padded
+
+        # Chunks cycle between the recorder and the writer thread
+        self.free_chunks: queue.Queue = queue.Queue()
+        for _ in range(max_pending_chunks + 1):
+            self.free_chunks.put(np.zeros(chunk_size, dtype=self.dtype))
+        self.full_chunks: queue.Queue = queue.Queue()
+        self.chunk = self.free_chunks.get()
+        self.count = 0
+
+        self.chunks = []  # (first step, number of steps, byte offset) per written chunk
+        self.events = {name: [] for name in EVENT_NAMES}
+        self.commands = []  # (step, name, args) of user commands, for re-simulation
+        self._last_bump = False
+        self._last_goals = 0
+
+        self.writer = threading.Thread(target=self._write_chunks, daemon=True)
+        self.writer.start()
+
+    def record(self, simulation) -> None:
+        """
+        Append the current state of a simulation as one step.
+
+        Args:
+            simulation (Simulation): Simulation that has just completed a step.
+        """
+        agent = simulation.agent
+        events = 0
+        bump = agent.bump_sensor
+        if bump and not self._last_bump:
+            events |= EVENT_BUMP
+        self._last_bump = bump
+        goals = getattr(simulation.controller, "goals_reached", 0)
+        if goals != self._last_goals:
+            events |= EVENT_GOAL_REACHED
+            self._last_goals = goals
+
+        lidar = agent.lidar_ranges
+        if len(lidar) != self.num_beams:
+            lidar = np.nan  # Not scanned yet
+        self.chunk[self.count] = (
+            simulation.steps,
+            simulation.time,
+            agent.x,
+            agent.y,
+            agent.direction,
+            bump,
+            events,
+            lidar,
+        )
+        self.count += 1
+        self.recorded += 1
+        if self.count == self.chunk_size:
+            self._hand_off()
+
+    def add_command(self, step: int, name: str, *args) -> None:
+        """
+        Note a user command applied before a step, e.g. a new goal or a key press.
+
+        Args:
+            step (int): Step count of the simulation when the command was applied.
+            name (str): Command name.
+            *args: JSON-serializable command arguments.
+        """
+        self.commands.append((step, name, list(args)))
+
+    def _hand_off(self) -> None:
+        self.full_chunks.put((self.chunk, self.count))
+        self.chunk = self.free_chunks.get()  # Blocks only if the writer is far behind
+        self.count = 0
+
+    def _write_chunks(self) -> None:
+        offset = self.data_offset
+        while True:
+            item = self.full_chunks.get()
+            if item is None:
+                return
+            chunk, count = item
+            records = chunk[:count]
+            records.tofile(self.file)
+            first_step = int(records["step"][0])
+            self.chunks.append((first_step, count, offset))
+            offset += records.nbytes
+
+            # Keep a sparse index of the steps where events happened
+            for name, flag in EVENT_NAMES.items():
+                (hits,) = np.nonzero(records["events"] & flag)
+                self.events[name].extend(int(step) for step in records["step"][hits])
+            self.free_chunks.put(chunk)
+
+    def close(self) -> None:
+        """Write out the last partial chunk and the index, then close the file."""
+        if self.closed:
+            return
+        self.closed = True
+        if self.count:
+            self.full_chunks.put((self.chunk, self.count))
+        self.full_chunks.put(None)
+        self.writer.join()
+
+        index = json.dumps(
+            {
+                "records": self.recorded,
+                "chunks": self.chunks,
+                "events": self.events,
+                "commands": self.commands,
+            }
+        ).encode()
+        self.file.write(index)
+        self.file.write(_TRAILER.pack(len(index), INDEX_MAGIC))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class TrajectoryReader:
+    """
+    Memory-maps a recording so any step can be read without loading the whole run.
+
+    Recordings that were not closed cleanly, e.g. after a crash, are still
+    readable up to the last complete record, but have no chunk or event index.
+    """
+
+    def __init__(self, filename: str) -> None:
+        """
+        Open a recording.
+
+        Args:
+            filename (str): File written by a TrajectoryRecorder.
+        """
+        self.filename = filename
+        with open(filename, "rb") as f:
+            magic, header_length = _PREFIX.unpack(f.read(_PREFIX.size))
+            if magic != MAGIC:
+                raise ValueError(f"{filename} is not a trajectory recording")
+            self.header = json.loads(f.read(header_length))
+            self.data_offset = _PREFIX.size + header_length
+
+            dtype = np.dtype([tuple(field) for field in map(_field, self.header["dtype"])])
+            size = os.fstat(f.fileno()).st_size
+            self.index = self._read_index(f, size)
+
+        if self.index is not None:
+            count = self.index["records"]
+        else:
+            count = (size - self.data_offset) // dtype.itemsize
+        self.records = np.memmap(filename, dtype=dtype, mode="r", offset=self.data_offset, shape=(count,))
+
+    @staticmethod
+    def _read_index(f, size: int) -> dict | None:
+        if size < _TRAILER.size:
+            return None
+        f.seek(size - _TRAILER.size)
+        length, magic = _TRAILER.unpack(f.read(_TRAILER.size))
+        if magic != INDEX_MAGIC:
+            return None
+        f.seek(size - _TRAILER.size - length)
+        return json.loads(f.read(length))
+
+    @property
+    def num_beams(self) -> int:
+        return self.header["num_beams"]
+
+    @property
+    def time_step(self) -> float:
+        return self.header["time_step"]
+
+    @property
+    def metadata(self) -> dict:
+        return self.header["metadata"]
+
+    def events(self, name: str) -> np.ndarray:
+        """
+        Get the steps at which an event happened.
+
+        Args:
+            name (str): Event name, "bump" or "goal".
+
+        Returns:
+            np.ndarray: Sorted step numbers, scanned from the records if the file has no index.
+        """
+        if self.index is not None:
+            return np.asarray(self.index["events"][name], dtype=np.uint64)
+        hits = self.records["events"] & EVENT_NAMES[name]
+        return self.records["step"][np.nonzero(hits)[0]]
+
+    @property
+    def commands(self) -> list:
+        """User commands as (step, name, args), empty if the file has no index."""
+        if self.index is None:
+            return []
+        return [tuple(command) for command in self.index["commands"]]
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+
+def _field(descr):
+    # JSON turns the dtype description's tuples into lists
+    name, kind, *shape = descr
+    return (name, kind, tuple(shape[0])) if shape else (name, kind)
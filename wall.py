@@ -65,17 +65,19 @@ class Wall:
 
         return min_distance if min_distance != float("inf") else None
 
-    def draw(self, screen, draw_center=False):
-        pygame.draw.rect(screen, BROWN, self.rect)  # Fill the wall with brown
+    def draw(self, screen, draw_center=False, camera=None):
+        # Map the wall into screen space when drawing through a camera
+        rect = camera.world_rect_to_screen(self.rect) if camera else self.rect
+        pygame.draw.rect(screen, BROWN, rect)  # Fill the wall with brown
         edge_color = BLUE if self.selected else BLACK
-        pygame.draw.rect(screen, edge_color, self.rect, 2)  # Draw edges
+        pygame.draw.rect(screen, edge_color, rect, 2)  # Draw edges
         if self.selected:
-            self.draw_handles(screen)
+            self.draw_handles(screen, camera)
 
         # Draw X in center if specified
         if draw_center:
-            center_x = self.rect.x + self.rect.width // 2
-            center_y = self.rect.y + self.rect.height // 2
+            center_x = rect.x + rect.width // 2
+            center_y = rect.y + rect.height // 2
             size = 5
             pygame.draw.line(
                 screen,
@@ -90,13 +92,14 @@ class Wall:
                 (center_x + size, center_y - size),
             )
 
-    def draw_handles(self, screen):
-        handles = self.get_handles()
+    def draw_handles(self, screen, camera=None):
+        handles = self.get_handles(camera)
         for handle in handles:
             pygame.draw.rect(screen, GREEN, handle)
 
-    def get_handles(self):
-        x, y, w, h = self.rect
+    def get_handles(self, camera=None):
+        # With a camera the handles are in screen space so they keep a constant size
+        x, y, w, h = camera.world_rect_to_screen(self.rect) if camera else self.rect
         hs = self.HANDLE_SIZE
         return [
             pygame.Rect(x, y, hs, hs),  # Top-left
@@ -109,10 +112,10 @@ class Wall:
             pygame.Rect(x + w - hs, y + h // 2 - hs // 2, hs, hs),  # Right-center
         ]
 
-    def handle_resize(self, mouse_pos):
+    def handle_resize(self, mouse_pos, bounds=DEFAULT_WORLD_BOUNDS):
         if not self.resizing:
             return
-        x, y = mouse_pos
+        x, y = round(mouse_pos[0]), round(mouse_pos[1])
 
         # Store original rect for reverting if needed
         original_rect = self.rect.copy()
@@ -168,13 +171,14 @@ class Wall:
             if new_width >= MIN_SIZE:
                 self.rect.width = new_width
 
-        # Check if the new position/size is within boundaries
+        # Check if the new position/size is within the world bounds
+        left, top, right, bottom = bounds
         if (
-            self.rect.left < 0
-            or self.rect.right > 800  # Assuming RIGHT_BOUNDARY is 800
-            or self.rect.top < 0
-            or self.rect.bottom > 600
-        ):  # Assuming BOTTOM_BOUNDARY is 600
+            self.rect.left < left
+            or self.rect.right > right
+            or self.rect.top < top
+            or self.rect.bottom > bottom
+        ):
             # Revert changes if outside boundaries
             self.rect = original_rect
 
@@ -0,0 +1,82 @@
+import json
+from wall import Wall
+from constants import DEFAULT_WORLD_BOUNDS
+
+
+def bounds_from_dict(data) -> tuple:
+    """
+    Read world bounds from a world file entry.
+
+    Args:
+        data (dict | None): The "bounds" entry of a world file.
+
+    Returns:
+        tuple: (left, top, right, bottom), falling back to DEFAULT_WORLD_BOUNDS.
+    """
+    if not data:
+        return DEFAULT_WORLD_BOUNDS
+    return (
+        data.get("left", DEFAULT_WORLD_BOUNDS[0]),
+        data.get("top", DEFAULT_WORLD_BOUNDS[1]),
+        data.get("right", DEFAULT_WORLD_BOUNDS[2]),
+        data.get("bottom", DEFAULT_WORLD_BOUNDS[3]),
+    )
+
+
+def bounds_to_dict(bounds: tuple) -> dict:
+    """Convert (left, top, right, bottom) bounds to their world file entry."""
+    left, top, right, bottom = bounds
+    return {"left": left, "top": top, "right": right, "bottom": bottom}
+
+
+def load_world(filename: str) -> tuple[list, dict | None, tuple]:
+    """
+    Load a world file.
+
+    Args:
+        filename (str): Path to the .json world file.
+
+    Returns:
+        tuple: (walls, agent_data, bounds) where agent_data is the saved agent
+               dict or None when the world has no agent.
+    """
+    with open(filename, "r") as f:
+        world_data = json.load(f)
+
+    walls = [Wall.from_dict(wall_data["wall"]) for wall_data in world_data.get("walls", [])]
+
+    agent_data = None
+    if world_data.get("agent"):
+        agent_data = world_data["agent"]["agent"]
+
+    return walls, agent_data, bounds_from_dict(world_data.get("bounds"))
+
+
+def save_world(filename: str, walls: list, agent, bounds: tuple) -> None:
+    """
+    Save a world file.
+
+    Args:
+        filename (str): Path to the .json world file.
+        walls (list): List of Wall objects.
+        agent (Agent | None): The agent to save, if any.
+        bounds (tuple): (left, top, right, bottom) of the world.
+    """
+    world_data = {
+        "walls": [{"wall": wall.to_dict()} for wall in walls],
+        "agent": (
+            {
+                "agent": {
+                    "x": agent.x,
+                    "y": agent.y,
+                    "direction": agent.direction,
+                    "radius": agent.body_radius,
+                }
+            }
+            if agent
+            else None
+        ),
+        "bounds": bounds_to_dict(bounds),
+    }
+    with open(filename, "w") as f:
+        json.dump(world_data, f)